@@ -0,0 +1,98 @@
+"""Benchmark de arranque de los puntos de entrada.
+
+Mide, en procesos nuevos y sin credenciales (modo offline), cuánto tarda en
+importarse cada entry point: main.py, el bot central y el poster. Importar ya
+no debe abrir conexiones a Supabase, Gemini ni Telegram.
+
+Uso:
+    python bench_startup.py [--runs 5] [--importtime]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent
+SRC_DIR = BASE_DIR / "src"
+
+ENTRY_POINTS = {
+    "main.py": "import main",
+    "bot_central": "import project.bot_central",
+    "poster": "import project.poster",
+}
+
+# Credenciales vacías: el arranque debe funcionar sin red ni .env
+OFFLINE_ENV = {
+    "SUPABASE_ANON_KEY": "",
+    "GEMINI_API_KEY": "",
+    "TELEGRAM_TOKEN": "",
+}
+
+
+def _env() -> dict:
+    env = os.environ.copy()
+    env.update(OFFLINE_ENV)
+    env["PYTHONPATH"] = os.pathsep.join([str(BASE_DIR), str(SRC_DIR), env.get("PYTHONPATH", "")])
+    return env
+
+
+def time_import(statement: str, runs: int) -> dict:
+    """Ejecuta `statement` en `runs` procesos nuevos y devuelve tiempos en ms."""
+    code = (
+        "import time; t = time.perf_counter(); "
+        f"{statement}; "
+        "print((time.perf_counter() - t) * 1000)"
+    )
+    samples = []
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-c", code], env=_env(), cwd=str(BASE_DIR), capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            return {"error": (result.stderr.strip().splitlines() or ["?"])[-1]}
+        samples.append(float(result.stdout.strip().splitlines()[-1]))
+    return {
+        "median_ms": round(statistics.median(samples), 1),
+        "min_ms": round(min(samples), 1),
+        "max_ms": round(max(samples), 1),
+    }
+
+
+def top_imports(statement: str, limit: int = 10) -> list:
+    """Módulos más costosos según `python -X importtime` (acumulado, µs)."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        env=_env(), cwd=str(BASE_DIR), capture_output=True, text=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = [p.strip() for p in line[len("import time:"):].split("|")]
+        if len(parts) == 3 and parts[1].isdigit():
+            rows.append((int(parts[1]), parts[2]))
+    return sorted(rows, reverse=True)[:limit]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Mide el tiempo de arranque de los entry points.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--importtime", action="store_true", help="Muestra los imports más lentos.")
+    args = parser.parse_args()
+
+    for name, statement in ENTRY_POINTS.items():
+        stats = time_import(statement, args.runs)
+        if "error" in stats:
+            print(f"❌ {name:<12} {stats['error']}")
+            continue
+        print(f"⏱️  {name:<12} mediana {stats['median_ms']:>8} ms  (min {stats['min_ms']}, max {stats['max_ms']})")
+        if args.importtime:
+            for cumulative_us, module in top_imports(statement):
+                print(f"      {cumulative_us / 1000:>8.1f} ms  {module}")
+
+
+if __name__ == "__main__":
+    main()
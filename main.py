@@ -1,57 +1,200 @@
+"""Supervisor de servicios: bot central y N posters.
+
+- Reinicia cualquier proceso que termine, con espera exponencial
+  (``RESTART_BACKOFF`` → ``RESTART_BACKOFF_MAX``); si el proceso aguantó
+  ``RESTART_STABLE_SECONDS`` la espera vuelve a empezar.
+- Lanza ``--posters`` posters, cada uno con su shard (``POSTER_SHARD=i/N``):
+  un modelo siempre cae en el mismo poster (crc32 del nombre).
+- Cada ``STATS_INTERVAL`` segundos muestra CPU y RSS de cada proceso (psutil
+  si está instalado; si no, /proc).
+- Ctrl+C o SIGTERM: envía SIGTERM a los procesos y espera hasta
+  ``SHUTDOWN_GRACE`` segundos para que terminen las subidas en curso.
+
+Uso:
+    python main.py [--posters 4] [--no-bot]
+"""
+
+import argparse
+import os
+import signal
 import subprocess
 import time
 import sys
 from pathlib import Path
 
+try:
+    import psutil
+except ImportError:  # opcional: sin psutil se lee /proc
+    psutil = None
+
 BASE_DIR = Path(__file__).resolve().parent
 VENV_PYTHON = BASE_DIR / ".venv" / "bin" / "python3"
 BOT_MAIN = BASE_DIR / "src" / "project" / "bot_central.py"
 POSTER_MAIN = BASE_DIR / "src" / "project" / "poster.py"
 
-# Determinar qué python usar
-if VENV_PYTHON.exists() and not sys.executable.startswith(str(BASE_DIR / ".venv")):
-    print(f"⚠️  Recomiendo activar el entorno virtual:\n    source {BASE_DIR}/.venv/bin/activate\n")
-    python_exe = str(VENV_PYTHON)
-else:
-    python_exe = sys.executable
+POSTERS = int(os.getenv("POSTERS", "1"))
+RESTART_BACKOFF = float(os.getenv("RESTART_BACKOFF", "1"))
+RESTART_BACKOFF_MAX = float(os.getenv("RESTART_BACKOFF_MAX", "300"))
+RESTART_STABLE_SECONDS = float(os.getenv("RESTART_STABLE_SECONDS", "60"))
+STATS_INTERVAL = float(os.getenv("STATS_INTERVAL", "300"))
+SHUTDOWN_GRACE = float(os.getenv("SHUTDOWN_GRACE", "600"))
 
-print(f"🚀 Iniciando servicios con: {python_exe}")
+_CLK_TCK = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+_USAGE_ERRORS = (OSError, IndexError, ValueError) + ((psutil.Error,) if psutil is not None else ())
+_stopping = False
 
-processes = []
 
-try:
-    # Iniciar Bot Central
-    print("🤖 Iniciando Bot Central...")
-    p_bot = subprocess.Popen([python_exe, str(BOT_MAIN)])
-    processes.append(p_bot)
+class Child:
+    """Un proceso supervisado y su historial de reinicios."""
 
-    # Iniciar Poster Scheduler
-    print("📅 Iniciando Poster Scheduler...")
-    p_poster = subprocess.Popen([python_exe, str(POSTER_MAIN)])
-    processes.append(p_poster)
+    def __init__(self, name, cmd, env=None):
+        self.name = name
+        self.cmd = cmd
+        self.env = env or {}
+        self.proc = None
+        self.started_at = 0.0
+        self.next_start = 0.0
+        self.failures = 0
+        self.restarts = 0
+        self._cpu_prev = None  # (segundos de CPU, instante)
 
-    print("✅ Servicios iniciados. Presiona Ctrl+C para detener.")
-    
-    # Mantener vivo el proceso principal
-    while True:
-        time.sleep(1)
-        # Verificar si algún proceso murió
-        if p_bot.poll() is not None:
-            print("❌ Bot Central se detuvo inesperadamente.")
-            break
-        if p_poster.poll() is not None:
-            print("❌ Poster Scheduler se detuvo inesperadamente.")
-            break
-
-except KeyboardInterrupt:
+    def start(self):
+        env = {**os.environ, **self.env}
+        # Sesión propia: Ctrl+C en la terminal no llega a los hijos (ni a sus
+        # subidas de Playwright); el supervisor les envía SIGTERM ordenadamente.
+        self.proc = subprocess.Popen(self.cmd, env=env, start_new_session=True)
+        self.started_at = time.monotonic()
+        self._cpu_prev = None
+        print(f"▶️  {self.name} iniciado (pid {self.proc.pid})")
+
+    def alive(self):
+        return self.proc is not None and self.proc.poll() is None
+
+    def schedule_restart(self):
+        """Programa el reinicio con espera exponencial."""
+        if time.monotonic() - self.started_at >= RESTART_STABLE_SECONDS:
+            self.failures = 0
+        espera = min(RESTART_BACKOFF_MAX, RESTART_BACKOFF * (2 ** self.failures))
+        self.failures += 1
+        self.restarts += 1
+        self.next_start = time.monotonic() + espera
+        print(f"❌ {self.name} terminó (código {self.proc.returncode}); reinicio en {espera:.0f}s")
+        self.proc = None
+
+    def usage(self):
+        """(CPU % desde la última lectura, RSS en MB) o None si no se puede leer."""
+        if not self.alive():
+            return None
+        pid = self.proc.pid
+        try:
+            if psutil is not None:
+                p = psutil.Process(pid)
+                times = p.cpu_times()
+                cpu, rss = times.user + times.system, p.memory_info().rss
+            else:
+                with open(f"/proc/{pid}/stat") as f:
+                    campos = f.read().rsplit(")", 1)[1].split()
+                cpu = (int(campos[11]) + int(campos[12])) / _CLK_TCK  # utime + stime
+                with open(f"/proc/{pid}/statm") as f:
+                    rss = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except _USAGE_ERRORS:
+            return None
+        ahora = time.monotonic()
+        prev = self._cpu_prev or (0.0, self.started_at)
+        self._cpu_prev = (cpu, ahora)
+        porcentaje = 100.0 * (cpu - prev[0]) / max(ahora - prev[1], 1e-6)
+        return porcentaje, rss / (1024 * 1024)
+
+
+def _python_exe():
+    # Determinar qué python usar
+    if VENV_PYTHON.exists() and not sys.executable.startswith(str(BASE_DIR / ".venv")):
+        print(f"⚠️  Recomiendo activar el entorno virtual:\n    source {BASE_DIR}/.venv/bin/activate\n")
+        return str(VENV_PYTHON)
+    return sys.executable
+
+
+def build_children(python_exe, posters, bot=True):
+    children = []
+    if bot:
+        children.append(Child("Bot Central", [python_exe, str(BOT_MAIN)]))
+    for i in range(posters):
+        children.append(Child(
+            f"Poster {i + 1}/{posters}",
+            [python_exe, str(POSTER_MAIN)],
+            {"POSTER_SHARD": f"{i}/{posters}"},
+        ))
+    return children
+
+
+def report(children):
+    for child in children:
+        uso = child.usage()
+        if uso is None:
+            print(f"📊 {child.name}: detenido (reinicios: {child.restarts})")
+        else:
+            print(f"📊 {child.name}: CPU {uso[0]:.1f}% · RSS {uso[1]:.0f} MB · reinicios {child.restarts}")
+
+
+def shutdown(children):
+    """SIGTERM a todos y espera hasta SHUTDOWN_GRACE; luego SIGKILL."""
+    vivos = [c for c in children if c.alive()]
+    for child in vivos:
+        child.proc.terminate()
+    if vivos:
+        print(f"⏳ Esperando hasta {SHUTDOWN_GRACE:.0f}s a que terminen las subidas en curso...")
+    limite = time.monotonic() + SHUTDOWN_GRACE
+    for child in vivos:
+        try:
+            child.proc.wait(timeout=max(0, limite - time.monotonic()))
+        except subprocess.TimeoutExpired:
+            print(f"🔪 {child.name} no terminó a tiempo; se mata")
+            child.proc.kill()
+            child.proc.wait()
+
+
+def _on_signal(signum, frame):
+    global _stopping
+    if _stopping:
+        return
+    _stopping = True
     print("\n🛑 Deteniendo servicios...")
-finally:
-    for p in processes:
-        if p.poll() is None:
-            p.terminate()
-            try:
-                p.wait(timeout=5)
-            except subprocess.TimeoutExpired:
-                p.kill()
-    print("👋 Adiós.")
 
+
+def main():
+    parser = argparse.ArgumentParser(description="Supervisa el bot central y los posters.")
+    parser.add_argument("--posters", type=int, default=POSTERS, help="Número de posters (shards).")
+    parser.add_argument("--no-bot", action="store_true", help="Solo posters.")
+    args = parser.parse_args()
+
+    python_exe = _python_exe()
+    print(f"🚀 Iniciando servicios con: {python_exe}")
+    signal.signal(signal.SIGINT, _on_signal)
+    signal.signal(signal.SIGTERM, _on_signal)
+
+    children = build_children(python_exe, max(0, args.posters), bot=not args.no_bot)
+    for child in children:
+        child.start()
+    print("✅ Servicios iniciados. Presiona Ctrl+C para detener.")
+
+    proximo_reporte = time.monotonic() + STATS_INTERVAL
+    try:
+        while not _stopping:
+            time.sleep(1)
+            ahora = time.monotonic()
+            for child in children:
+                if child.proc is None:
+                    if ahora >= child.next_start and not _stopping:
+                        child.start()
+                elif child.proc.poll() is not None:
+                    child.schedule_restart()
+            if STATS_INTERVAL > 0 and ahora >= proximo_reporte:
+                report(children)
+                proximo_reporte = ahora + STATS_INTERVAL
+    finally:
+        shutdown(children)
+        print("👋 Adiós.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+"""Versión asíncrona de ``supabase_client`` para los event loops del bot y el poster.
+
+Cada función de ``supabase_client.BACKEND_API`` tiene aquí su contraparte con
+prefijo ``a`` (``get_model_config`` → ``aget_model_config``), con la misma
+firma y el mismo resultado, para poder solapar consultas con
+``asyncio.gather`` sin bloquear el loop:
+
+    configs = await asyncio.gather(*(aget_model_config(m) for m in modelos))
+
+Con Supabase se usa el cliente asíncrono (``acreate_client``), uno por event
+loop. Las funciones síncronas de ``supabase_client`` son envoltorios que
+ejecutan estas corrutinas en un loop de fondo propio (``run_sync``). Con
+``DB_BACKEND=sqlite`` es al revés: las funciones síncronas de
+``sqlite_backend`` se ejecutan en un hilo (``asyncio.to_thread``).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+import weakref
+from typing import AsyncIterator, Dict, List, Optional
+
+try:
+    from . import supabase_client as _sync
+except ImportError:
+    import supabase_client as _sync
+
+# Un cliente por event loop: el cliente HTTP asíncrono queda ligado a su loop
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, object]" = weakref.WeakKeyDictionary()
+
+# Loop de fondo de la API síncrona (se crea en el primer uso)
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+
+def _background_loop() -> asyncio.AbstractEventLoop:
+    global _loop
+    if _loop is None:
+        with _loop_lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="db-loop", daemon=True).start()
+                _loop = loop
+    return _loop
+
+
+def run_sync(coro):
+    """
+    Ejecuta una corrutina en el loop de fondo y espera su resultado.
+
+    Sirve desde cualquier hilo, también desde uno que ya tenga su propio loop
+    (lo bloquea mientras espera). Las excepciones de la corrutina se propagan.
+    """
+    loop = _background_loop()
+    try:
+        actual = asyncio.get_running_loop()
+    except RuntimeError:
+        actual = None
+    if actual is loop:
+        coro.close()
+        raise RuntimeError("run_sync desde el loop de la base de datos bloquearía: usa la versión async")
+    return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+
+async def aget_client():
+    """Devuelve el cliente asíncrono de Supabase del loop actual, creándolo en el primer uso."""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        if not _sync.SUPABASE_KEY:
+            raise ValueError("SUPABASE_ANON_KEY no está configurado en .env")
+        from supabase import acreate_client
+        client = await acreate_client(_sync.SUPABASE_URL, _sync.SUPABASE_KEY)
+        _clients[loop] = client
+    return client
+
+
+async def _afetch_all(build_query, page_size: int = _sync.PAGE_SIZE) -> List[Dict]:
+    """Como supabase_client._fetch_all, paginando con range()."""
+    rows: List[Dict] = []
+    start = 0
+    while True:
+        response = await build_query().range(start, start + page_size - 1).execute()
+        data = response.data or []
+        rows.extend(data)
+        if len(data) < page_size:
+            return rows
+        start += page_size
+
+
+async def _schedules():
+    return (await aget_client()).table(_sync.SCHEDULES_TABLE)
+
+
+# ---- Modelos ----
+
+async def awarm_model_registry() -> int:
+    client = await aget_client()
+    rows = await _afetch_all(lambda: client.table("modelos").select("*"))
+    for config in rows:
+        _sync._remember_model(config)
+    return len(rows)
+
+
+async def aget_model_config(modelo: str) -> Optional[Dict]:
+    with _sync._registry_lock:
+        cached = _sync._model_registry.get(modelo)
+    if cached and time.monotonic() - cached[1] < _sync.MODEL_REGISTRY_TTL:
+        return cached[0]
+    try:
+        response = await (await aget_client()).table("modelos").select("*").eq("modelo", modelo).execute()
+        if response.data:
+            _sync._remember_model(response.data[0])
+            return response.data[0]
+        return None
+    except Exception as e:
+        print(f"Error obteniendo config de {modelo}: {e}")
+        return None
+
+
+async def acreate_model_config(modelo: str, plataformas: str, hora_inicio: str = "12:00",
+                               ventana_horas: int = 5) -> bool:
+    data = {"modelo": modelo, "plataformas": plataformas, "hora_inicio": hora_inicio, "ventana_horas": ventana_horas}
+    try:
+        await (await aget_client()).table("modelos").insert(data).execute()
+        _sync._remember_model(data)
+        print(f"✅ Configuración de {modelo} creada en tabla 'modelos'")
+        return True
+    except Exception as e:
+        print(f"Error creando config de {modelo}: {e}")
+        return False
+
+
+async def atable_exists(table_name: str) -> bool:
+    try:
+        await (await aget_client()).table(table_name).select("*").limit(1).execute()
+        return True
+    except Exception:
+        return False
+
+
+async def aensure_model_exists(modelo: str, plataformas: str = "xxxfollow,myclub",
+                               hora_inicio: str = "12:00", ventana_horas: int = 5) -> bool:
+    if await aget_model_config(modelo):
+        return True
+    print(f"🆕 Modelo nuevo detectado: {modelo}")
+    return await acreate_model_config(modelo, plataformas, hora_inicio, ventana_horas)
+
+
+async def aget_all_models() -> List[str]:
+    try:
+        response = await (await aget_client()).table("modelos").select("modelo").execute()
+        return [item["modelo"] for item in response.data] if response.data else []
+    except Exception as e:
+        print(f"Error obteniendo modelos: {e}")
+        return []
+
+
+# ---- Schedules ----
+
+async def ainsert_schedule(modelo: str, video: str, caption: str, tags: str,
+                           plataforma: str, estado: str = "pendiente",
+                           scheduled_time: str = "") -> bool:
+    data = {"modelo": modelo, "video": video, "caption": caption, "tags": tags,
+            "plataforma": plataforma, "estado": estado, "scheduled_time": scheduled_time}
+    try:
+        await (await _schedules()).insert(data).execute()
+        print(f"✅ Schedule insertado para '{modelo}'")
+        return True
+    except Exception as e:
+        print(f"❌ Error insertando schedule en {modelo}: {e}")
+        return False
+
+
+async def ainsert_schedules(modelo: str, rows: List[Dict]) -> bool:
+    if not rows:
+        return True
+    try:
+        await (await _schedules()).insert([{**row, "modelo": modelo} for row in rows]).execute()
+        print(f"✅ {len(rows)} schedules insertados para '{modelo}'")
+        return True
+    except Exception as e:
+        print(f"❌ Error insertando schedules en {modelo}: {e}")
+        return False
+
+
+async def aupsert_schedules(modelo: str, rows: List[Dict]) -> bool:
+    if not rows:
+        return True
+    try:
+        await (await _schedules()).upsert(
+            [{**row, "modelo": modelo} for row in rows],
+            on_conflict="modelo,video,plataforma,scheduled_time",
+            ignore_duplicates=True,
+        ).execute()
+        print(f"✅ {len(rows)} schedules escritos para '{modelo}'")
+        return True
+    except Exception as e:
+        print(f"❌ Error escribiendo schedules de {modelo}: {e}")
+        return False
+
+
+async def aget_all_schedules(modelo: str, raise_errors: bool = False) -> List[Dict]:
+    try:
+        tabla = await _schedules()
+        return await _afetch_all(lambda: tabla.select("*").eq("modelo", modelo).order("id"))
+    except Exception as e:
+        if raise_errors:
+            raise
+        print(f"Error obteniendo schedules de {modelo}: {e}")
+        return []
+
+
+async def aget_pending_schedules(modelo: str, plataforma: Optional[str] = None) -> List[Dict]:
+    try:
+        tabla = await _schedules()
+
+        def build_query():
+            query = tabla.select("*").eq("modelo", modelo).eq("estado", "pendiente")
+            if plataforma:
+                query = query.eq("plataforma", plataforma)
+            return query.order("id")
+
+        return await _afetch_all(build_query)
+    except Exception as e:
+        print(f"Error obteniendo schedules pendientes de {modelo}: {e}")
+        return []
+
+
+async def aupdate_schedule_time(modelo: str, video: str, plataforma: str, scheduled_time: str) -> bool:
+    try:
+        await (await _schedules()).update({"scheduled_time": scheduled_time})\
+            .eq("modelo", modelo).eq("video", video).eq("plataforma", plataforma).execute()
+        return True
+    except Exception as e:
+        print(f"Error actualizando schedule: {e}")
+        return False
+
+
+async def aclaim_due_schedules(now_str: str, limit: int = 20, modelos: Optional[List[str]] = None,
+                               plataformas: Optional[List[str]] = None, lease_seconds: int = 10800) -> List[Dict]:
+    try:
+        response = await (await aget_client()).rpc(
+            "claim_due_schedules",
+            {"p_now": now_str, "p_limit": limit, "p_modelos": modelos, "p_plataformas": plataformas,
+             "p_lease_seconds": int(lease_seconds)},
+        ).execute()
+        return response.data or []
+    except Exception as e:
+        print(f"Error reclamando schedules: {e}")
+        return []
+
+
+async def aset_schedule_estado(schedule_id: int, estado: str, campos: Optional[Dict] = None) -> bool:
+    try:
+        await (await _schedules()).update({**(campos or {}), "estado": estado}).eq("id", schedule_id).execute()
+        return True
+    except Exception as e:
+        print(f"Error actualizando estado del schedule {schedule_id}: {e}")
+        return False
+
+
+async def _afinished_page(since: str, last_id: int, page_size: int) -> List[Dict]:
+    """Una página de iter_finished_schedules: filas terminadas desde `since` con id > last_id."""
+    response = await (await _schedules()).select("*")\
+        .gte("finished_at", since).gt("id", last_id).order("id").limit(page_size).execute()
+    return response.data or []
+
+
+async def aiter_finished_schedules(since: str, page_size: int = _sync.PAGE_SIZE) -> AsyncIterator[Dict]:
+    last_id = 0
+    while True:
+        data = await _afinished_page(since, last_id, page_size)
+        for row in data:
+            yield row
+        if len(data) < page_size:
+            return
+        last_id = data[-1]["id"]
+
+
+async def aupsert_model_profiles(rows: List[Dict]) -> bool:
+    if not rows:
+        return True
+    try:
+        await (await aget_client()).table("model_profiles").upsert(rows, on_conflict="model_slug").execute()
+        return True
+    except Exception as e:
+        print(f"❌ Error escribiendo perfiles de modelos: {e}")
+        return False
+
+
+def _threaded(name: str):
+    """Contraparte asíncrona de una función síncrona del backend, ejecutada en un hilo."""
+    func = getattr(_sync, name)
+
+    async def wrapper(*args, **kwargs):
+        return await asyncio.to_thread(func, *args, **kwargs)
+
+    wrapper.__name__ = wrapper.__qualname__ = "a" + name
+    wrapper.__doc__ = func.__doc__
+    return wrapper
+
+
+async def _athreaded_iter_finished(since: str, page_size: int = _sync.PAGE_SIZE) -> AsyncIterator[Dict]:
+    # Base local: se lee entera en un hilo y se recorre en el loop
+    for row in await asyncio.to_thread(lambda: list(_sync.iter_finished_schedules(since, page_size))):
+        yield row
+
+
+if _sync.DB_BACKEND != "supabase":
+    # SQLite (u otro backend local): mismas funciones, en un hilo para no bloquear el loop
+    globals().update({"a" + name: _threaded(name) for name in _sync.BACKEND_API
+                      if name != "iter_finished_schedules"})
+    aiter_finished_schedules = _athreaded_iter_finished
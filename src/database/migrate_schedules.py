@@ -0,0 +1,90 @@
+"""Copia los schedules de las tablas por modelo a la tabla única ``schedules``.
+
+Antes hay que aplicar ``migrations/001_schedules.sql``. El script es
+idempotente: una fila ya copiada (mismo modelo, video, plataforma y
+scheduled_time) no se vuelve a insertar, así que se puede ejecutar otra vez
+si se interrumpe. Las tablas antiguas no se borran; cuando todo esté
+verificado se pueden eliminar a mano con ``DROP TABLE <modelo>``.
+
+Uso:
+    python src/database/migrate_schedules.py [--modelo sofia] [--chunk 500] [--dry-run]
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from database.supabase_client import (
+    SCHEDULES_TABLE,
+    _fetch_all,
+    get_all_models,
+    get_all_schedules,
+    get_client,
+    insert_schedules,
+    table_exists,
+)
+
+COLUMNS = ("video", "caption", "tags", "plataforma", "estado", "scheduled_time")
+
+
+def _key(row: Dict) -> tuple:
+    return (row.get("video"), row.get("plataforma"), row.get("scheduled_time") or "")
+
+
+def migrate_model(modelo: str, chunk: int = 500, dry_run: bool = False) -> int:
+    """
+    Copia las filas de la tabla antigua de un modelo que falten en SCHEDULES_TABLE.
+
+    Returns:
+        Número de filas copiadas (o que se copiarían con dry_run)
+    """
+    if not table_exists(modelo):
+        print(f"ℹ️  {modelo}: sin tabla antigua, nada que copiar")
+        return 0
+
+    legacy = _fetch_all(lambda: get_client().table(modelo).select("*"))
+    # Si la lectura falla se aborta: un conjunto vacío volvería a copiar toda la tabla
+    existentes = {_key(r) for r in get_all_schedules(modelo, raise_errors=True)}
+    faltantes = [
+        {col: row.get(col) if row.get(col) is not None else "" for col in COLUMNS}
+        for row in legacy if _key(row) not in existentes
+    ]
+    print(f"📦 {modelo}: {len(legacy)} filas antiguas, {len(faltantes)} por copiar")
+    if dry_run or not faltantes:
+        return len(faltantes)
+
+    copiadas = 0
+    chunk = max(1, chunk)
+    for i in range(0, len(faltantes), chunk):
+        lote = faltantes[i:i + chunk]
+        if not insert_schedules(modelo, lote):
+            print(f"❌ {modelo}: falló el lote {i // chunk + 1}; vuelve a ejecutar para reanudar")
+            break
+        copiadas += len(lote)
+    return copiadas
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=f"Migra las tablas por modelo a '{SCHEDULES_TABLE}'.")
+    parser.add_argument("--modelo", action="append", help="Migrar solo este modelo (repetible).")
+    parser.add_argument("--chunk", type=int, default=500, help="Filas por inserción.")
+    parser.add_argument("--dry-run", action="store_true", help="Solo cuenta lo que se copiaría.")
+    args = parser.parse_args()
+
+    if not table_exists(SCHEDULES_TABLE):
+        print(f"❌ La tabla '{SCHEDULES_TABLE}' no existe: aplica primero migrations/001_schedules.sql")
+        sys.exit(1)
+
+    modelos: List[str] = args.modelo or get_all_models()
+    total = sum(migrate_model(m, args.chunk, args.dry_run) for m in modelos)
+    verbo = "se copiarían" if args.dry_run else "copiadas"
+    print(f"✅ {total} filas {verbo} en {len(modelos)} modelos")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+-- Tabla única de schedules para todos los modelos.
+-- Reemplaza las tablas por modelo que creaba create_model_table.js.
+-- Aplicar una vez (SQL editor de Supabase o `psql`) y luego copiar los datos:
+--     python src/database/migrate_schedules.py
+
+CREATE TABLE IF NOT EXISTS schedules (
+  id BIGSERIAL PRIMARY KEY,
+  modelo TEXT NOT NULL,
+  video TEXT NOT NULL,
+  caption TEXT NOT NULL DEFAULT '',
+  tags TEXT NOT NULL DEFAULT '',
+  plataforma TEXT NOT NULL,
+  estado TEXT NOT NULL DEFAULT 'pendiente',
+  scheduled_time VARCHAR NOT NULL DEFAULT '',
+  created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- Poster: pendientes cuya hora ya llegó, de todos los modelos
+CREATE INDEX IF NOT EXISTS schedules_estado_time ON schedules (estado, scheduled_time);
+-- Scheduler/bot: registros de un modelo y búsquedas por video
+CREATE INDEX IF NOT EXISTS schedules_modelo_video ON schedules (modelo, video);
+
+-- Reclamo atómico para el poster: varios procesos pueden llamarla a la vez
+-- sin tomar la misma fila (FOR UPDATE SKIP LOCKED).
+CREATE OR REPLACE FUNCTION claim_due_schedules(
+  p_now TEXT,
+  p_limit INT DEFAULT 20,
+  p_modelos TEXT[] DEFAULT NULL,
+  p_plataformas TEXT[] DEFAULT NULL
+)
+RETURNS SETOF schedules
+LANGUAGE sql
+AS $$
+  UPDATE schedules SET estado = 'procesando'
+  WHERE id IN (
+    SELECT id FROM schedules
+    WHERE estado = 'pendiente'
+      AND scheduled_time <> ''
+      AND scheduled_time <= p_now
+      AND (p_modelos IS NULL OR modelo = ANY (p_modelos))
+      AND (p_plataformas IS NULL OR lower(plataforma) = ANY (p_plataformas))
+    ORDER BY scheduled_time
+    LIMIT p_limit
+    FOR UPDATE SKIP LOCKED
+  )
+  RETURNING *;
+$$;
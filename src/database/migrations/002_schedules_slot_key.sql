@@ -0,0 +1,15 @@
+-- Clave idempotente para upsert_schedules: una fila por slot
+-- (modelo, video, plataforma, scheduled_time). Incluye scheduled_time porque un
+-- mismo video puede repetirse en la misma plataforma hasta MAX_SAME_VIDEO veces.
+
+-- Quitar duplicados exactos que pudo dejar el flujo antiguo (insert + update)
+DELETE FROM schedules a
+USING schedules b
+WHERE a.id > b.id
+  AND a.modelo = b.modelo
+  AND a.video = b.video
+  AND a.plataforma = b.plataforma
+  AND a.scheduled_time = b.scheduled_time;
+
+CREATE UNIQUE INDEX IF NOT EXISTS schedules_slot_key
+  ON schedules (modelo, video, plataforma, scheduled_time);
@@ -0,0 +1,13 @@
+-- Perfiles de modelos que encola create_models.py (supabase_queue/models.jsonl)
+-- y que escribe el drenador src/project/outbox.py, uno por model_slug.
+
+CREATE TABLE IF NOT EXISTS model_profiles (
+  model_slug TEXT PRIMARY KEY,
+  display_name TEXT,
+  profile_id TEXT,
+  target_url JSONB,
+  metadata JSONB,
+  channel_id TEXT,
+  telegram_username TEXT,
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
@@ -0,0 +1,5 @@
+-- trace_id: correlación de cada fila con las trazas de src/project/tracing.py
+-- (de la subida en Telegram a la publicación). Nulo en filas antiguas o importadas.
+-- claim_due_schedules devuelve SETOF schedules, así que ya incluye la columna.
+
+ALTER TABLE schedules ADD COLUMN IF NOT EXISTS trace_id TEXT;
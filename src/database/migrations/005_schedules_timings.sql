@@ -0,0 +1,37 @@
+-- Tiempos de publicación por fila para el informe de retraso del poster
+-- (src/project/poster_report.py):
+--   claimed_at  – el poster reclamó la fila (claim_due_schedules)
+--   started_at  – empezó la subida
+--   finished_at – terminó (publicado o fallido)
+
+ALTER TABLE schedules ADD COLUMN IF NOT EXISTS claimed_at TIMESTAMPTZ;
+ALTER TABLE schedules ADD COLUMN IF NOT EXISTS started_at TIMESTAMPTZ;
+ALTER TABLE schedules ADD COLUMN IF NOT EXISTS finished_at TIMESTAMPTZ;
+
+-- Lectura incremental del informe (filas terminadas desde una fecha)
+CREATE INDEX IF NOT EXISTS schedules_finished_at ON schedules (finished_at) WHERE finished_at IS NOT NULL;
+
+-- Igual que en 001, ahora marcando claimed_at
+CREATE OR REPLACE FUNCTION claim_due_schedules(
+  p_now TEXT,
+  p_limit INT DEFAULT 20,
+  p_modelos TEXT[] DEFAULT NULL,
+  p_plataformas TEXT[] DEFAULT NULL
+)
+RETURNS SETOF schedules
+LANGUAGE sql
+AS $$
+  UPDATE schedules SET estado = 'procesando', claimed_at = now()
+  WHERE id IN (
+    SELECT id FROM schedules
+    WHERE estado = 'pendiente'
+      AND scheduled_time <> ''
+      AND scheduled_time <= p_now
+      AND (p_modelos IS NULL OR modelo = ANY (p_modelos))
+      AND (p_plataformas IS NULL OR lower(plataforma) = ANY (p_plataformas))
+    ORDER BY scheduled_time
+    LIMIT p_limit
+    FOR UPDATE SKIP LOCKED
+  )
+  RETURNING *;
+$$;
@@ -0,0 +1,7 @@
+-- Duración y tamaño de cada subida, por fila, para el modelo de rendimiento
+-- por plataforma del planificador (src/project/scheduler.py):
+--   upload_seconds – segundos que tardó el worker de Playwright
+--   upload_bytes   – bytes del archivo subido (rendition u original)
+
+ALTER TABLE schedules ADD COLUMN IF NOT EXISTS upload_seconds DOUBLE PRECISION;
+ALTER TABLE schedules ADD COLUMN IF NOT EXISTS upload_bytes BIGINT;
@@ -0,0 +1,40 @@
+-- Lease del reclamo del poster: una fila que quedó en 'procesando' porque su
+-- poster murió (SIGKILL, caída del host) vuelve a reclamarse cuando su
+-- claimed_at tiene más de p_lease_seconds. El lease debe ser mayor que la
+-- subida más larga (CLAIM_LEASE_SECONDS en el poster, por defecto 3 h).
+
+-- Filas en 'procesando' reclamadas antes de 005 (sin claimed_at): su lease
+-- empieza ahora, así un poster viejo que todavía las está subiendo no las
+-- pierde al aplicar la migración (publicación doble)
+UPDATE schedules SET claimed_at = now() WHERE estado = 'procesando' AND claimed_at IS NULL;
+
+-- Cambia la firma (nuevo parámetro): se borra la de 005 para no dejar dos sobrecargas
+DROP FUNCTION IF EXISTS claim_due_schedules(TEXT, INT, TEXT[], TEXT[]);
+
+CREATE OR REPLACE FUNCTION claim_due_schedules(
+  p_now TEXT,
+  p_limit INT DEFAULT 20,
+  p_modelos TEXT[] DEFAULT NULL,
+  p_plataformas TEXT[] DEFAULT NULL,
+  p_lease_seconds INT DEFAULT 10800
+)
+RETURNS SETOF schedules
+LANGUAGE sql
+AS $$
+  UPDATE schedules SET estado = 'procesando', claimed_at = now()
+  WHERE id IN (
+    SELECT id FROM schedules
+    WHERE (
+        estado = 'pendiente'
+        OR (estado = 'procesando' AND claimed_at < now() - make_interval(secs => p_lease_seconds))
+      )
+      AND scheduled_time <> ''
+      AND scheduled_time <= p_now
+      AND (p_modelos IS NULL OR modelo = ANY (p_modelos))
+      AND (p_plataformas IS NULL OR lower(plataforma) = ANY (p_plataformas))
+    ORDER BY scheduled_time
+    LIMIT p_limit
+    FOR UPDATE SKIP LOCKED
+  )
+  RETURNING *;
+$$;
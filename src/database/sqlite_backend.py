@@ -0,0 +1,367 @@
+"""Backend SQLite con la misma API que ``supabase_client``.
+
+Se activa con ``DB_BACKEND=sqlite``: ``supabase_client`` reemplaza sus
+funciones por las de este módulo, así que ``scheduler``, ``poster``,
+``caption`` y el bot funcionan sin un proyecto de Supabase (pruebas,
+benchmarks, simulaciones o una instalación offline en una sola máquina).
+
+El esquema replica ``migrations/``: tabla ``modelos`` y tabla única
+``schedules`` con los mismos índices y la clave por slot. Usa WAL y el reclamo
+del poster es una transacción ``BEGIN IMMEDIATE`` (seguro entre procesos).
+
+Uso:
+    python src/database/sqlite_backend.py add-model sofia --plataformas kams,xxxfollow
+    python src/database/sqlite_backend.py stats
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+BASE_DIR = Path(__file__).resolve().parents[2]
+DB_PATH = Path(os.getenv("SQLITE_DB", str(BASE_DIR / ".runtime" / "trafico.sqlite3")))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS modelos (
+  modelo TEXT PRIMARY KEY,
+  plataformas TEXT NOT NULL,
+  hora_inicio TEXT NOT NULL DEFAULT '12:00',
+  ventana_horas INTEGER NOT NULL DEFAULT 5
+);
+CREATE TABLE IF NOT EXISTS schedules (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  modelo TEXT NOT NULL,
+  video TEXT NOT NULL,
+  caption TEXT NOT NULL DEFAULT '',
+  tags TEXT NOT NULL DEFAULT '',
+  plataforma TEXT NOT NULL,
+  estado TEXT NOT NULL DEFAULT 'pendiente',
+  scheduled_time TEXT NOT NULL DEFAULT '',
+  created_at TEXT NOT NULL DEFAULT (datetime('now')),
+  trace_id TEXT,
+  claimed_at TEXT,
+  started_at TEXT,
+  finished_at TEXT,
+  upload_seconds REAL,
+  upload_bytes INTEGER
+);
+CREATE INDEX IF NOT EXISTS schedules_estado_time ON schedules (estado, scheduled_time);
+CREATE INDEX IF NOT EXISTS schedules_modelo_video ON schedules (modelo, video);
+CREATE UNIQUE INDEX IF NOT EXISTS schedules_slot_key ON schedules (modelo, video, plataforma, scheduled_time);
+CREATE TABLE IF NOT EXISTS model_profiles (
+  model_slug TEXT PRIMARY KEY,
+  display_name TEXT,
+  profile_id TEXT,
+  target_url TEXT,
+  metadata TEXT,
+  channel_id TEXT,
+  telegram_username TEXT,
+  updated_at TEXT NOT NULL DEFAULT (datetime('now'))
+);
+"""
+
+SCHEDULE_COLUMNS = ("video", "caption", "tags", "plataforma", "estado", "scheduled_time", "trace_id")
+_SCHEDULE_DEFAULTS = {"estado": "pendiente", "trace_id": None}
+# Columnas que set_schedule_estado acepta en `campos`
+_SCHEDULE_UPDATABLE = ("claimed_at", "started_at", "finished_at", "upload_seconds", "upload_bytes")
+# Columnas agregadas por migraciones posteriores a 001 (ALTER en bases viejas)
+_ADDED_COLUMNS = (("trace_id", "TEXT"), ("claimed_at", "TEXT"), ("started_at", "TEXT"),
+                  ("finished_at", "TEXT"), ("upload_seconds", "REAL"), ("upload_bytes", "INTEGER"))
+_INSERT_SCHEDULE = (
+    f"INSERT INTO schedules (modelo, {', '.join(SCHEDULE_COLUMNS)}) "
+    f"VALUES ({', '.join('?' * (len(SCHEDULE_COLUMNS) + 1))})"
+)
+PROFILE_COLUMNS = ("model_slug", "display_name", "profile_id", "target_url", "metadata",
+                   "channel_id", "telegram_username")
+
+# Una conexión por hilo (sqlite3 no comparte conexiones entre hilos); el
+# esquema se aplica una sola vez por proceso.
+_local = threading.local()
+_schema_lock = threading.Lock()
+_schema_ready = False
+
+
+def _connect() -> sqlite3.Connection:
+    global _schema_ready
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        return conn
+    DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(DB_PATH), timeout=10, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    with _schema_lock:
+        if not _schema_ready:
+            conn.executescript(_SCHEMA)
+            # Bases creadas antes de migrations/004, 005 y 006
+            columnas = {r[1] for r in conn.execute("PRAGMA table_info(schedules)")}
+            for columna, tipo in _ADDED_COLUMNS:
+                if columna not in columnas:
+                    conn.execute(f"ALTER TABLE schedules ADD COLUMN {columna} {tipo}")
+            conn.execute("CREATE INDEX IF NOT EXISTS schedules_finished_at ON schedules (finished_at)")
+            # Como migrations/007: los 'procesando' sin claimed_at empiezan su lease ahora
+            conn.execute("UPDATE schedules SET claimed_at = ? WHERE estado = 'procesando' AND claimed_at IS NULL",
+                         (datetime.now(timezone.utc).isoformat(),))
+            _schema_ready = True
+    _local.conn = conn
+    return conn
+
+
+def _rows(cursor: sqlite3.Cursor) -> List[Dict]:
+    return [dict(r) for r in cursor.fetchall()]
+
+
+def _schedule_values(modelo: str, row: Dict) -> tuple:
+    return (modelo,) + tuple(
+        row.get(col) if row.get(col) is not None else _SCHEDULE_DEFAULTS.get(col, "")
+        for col in SCHEDULE_COLUMNS
+    )
+
+
+# ---- Modelos ----
+
+def warm_model_registry() -> int:
+    """Sin caché que calentar: devuelve cuántos modelos hay."""
+    return _connect().execute("SELECT COUNT(*) FROM modelos").fetchone()[0]
+
+
+def get_model_config(modelo: str) -> Optional[Dict]:
+    row = _connect().execute("SELECT * FROM modelos WHERE modelo = ?", (modelo,)).fetchone()
+    return dict(row) if row else None
+
+
+def create_model_config(modelo: str, plataformas: str, hora_inicio: str = "12:00", ventana_horas: int = 5) -> bool:
+    try:
+        _connect().execute(
+            "INSERT INTO modelos (modelo, plataformas, hora_inicio, ventana_horas) VALUES (?, ?, ?, ?)",
+            (modelo, plataformas, hora_inicio, ventana_horas),
+        )
+        print(f"✅ Configuración de {modelo} creada en tabla 'modelos'")
+        return True
+    except sqlite3.Error as e:
+        print(f"Error creando config de {modelo}: {e}")
+        return False
+
+
+def table_exists(table_name: str) -> bool:
+    row = _connect().execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table_name,)
+    ).fetchone()
+    return row is not None
+
+
+def ensure_model_exists(modelo: str, plataformas: str = "xxxfollow,myclub",
+                        hora_inicio: str = "12:00", ventana_horas: int = 5) -> bool:
+    if get_model_config(modelo):
+        return True
+    print(f"🆕 Modelo nuevo detectado: {modelo}")
+    return create_model_config(modelo, plataformas, hora_inicio, ventana_horas)
+
+
+def get_all_models() -> List[str]:
+    return [r[0] for r in _connect().execute("SELECT modelo FROM modelos ORDER BY modelo").fetchall()]
+
+
+# ---- Schedules ----
+
+def insert_schedule(modelo: str, video: str, caption: str, tags: str,
+                    plataforma: str, estado: str = "pendiente",
+                    scheduled_time: str = "") -> bool:
+    return insert_schedules(modelo, [{
+        "video": video, "caption": caption, "tags": tags,
+        "plataforma": plataforma, "estado": estado, "scheduled_time": scheduled_time,
+    }])
+
+
+def insert_schedules(modelo: str, rows: List[Dict]) -> bool:
+    if not rows:
+        return True
+    conn = _connect()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.executemany(
+            _INSERT_SCHEDULE,
+            [_schedule_values(modelo, r) for r in rows],
+        )
+        conn.execute("COMMIT")
+        return True
+    except sqlite3.Error as e:
+        conn.execute("ROLLBACK")
+        print(f"❌ Error insertando schedules en {modelo}: {e}")
+        return False
+
+
+def upsert_schedules(modelo: str, rows: List[Dict]) -> bool:
+    if not rows:
+        return True
+    conn = _connect()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.executemany(
+            _INSERT_SCHEDULE + " ON CONFLICT (modelo, video, plataforma, scheduled_time) DO NOTHING",
+            [_schedule_values(modelo, r) for r in rows],
+        )
+        conn.execute("COMMIT")
+        return True
+    except sqlite3.Error as e:
+        conn.execute("ROLLBACK")
+        print(f"❌ Error escribiendo schedules de {modelo}: {e}")
+        return False
+
+
+def get_all_schedules(modelo: str, raise_errors: bool = False) -> List[Dict]:
+    try:
+        return _rows(_connect().execute("SELECT * FROM schedules WHERE modelo = ? ORDER BY id", (modelo,)))
+    except sqlite3.Error as e:
+        if raise_errors:
+            raise
+        print(f"Error obteniendo schedules de {modelo}: {e}")
+        return []
+
+
+def get_pending_schedules(modelo: str, plataforma: Optional[str] = None) -> List[Dict]:
+    if plataforma:
+        return _rows(_connect().execute(
+            "SELECT * FROM schedules WHERE modelo = ? AND estado = 'pendiente' AND plataforma = ? ORDER BY id",
+            (modelo, plataforma),
+        ))
+    return _rows(_connect().execute(
+        "SELECT * FROM schedules WHERE modelo = ? AND estado = 'pendiente' ORDER BY id", (modelo,)
+    ))
+
+
+def update_schedule_time(modelo: str, video: str, plataforma: str, scheduled_time: str) -> bool:
+    try:
+        _connect().execute(
+            "UPDATE schedules SET scheduled_time = ? WHERE modelo = ? AND video = ? AND plataforma = ?",
+            (scheduled_time, modelo, video, plataforma),
+        )
+        return True
+    except sqlite3.Error as e:
+        print(f"Error actualizando schedule: {e}")
+        return False
+
+
+def claim_due_schedules(now_str: str, limit: int = 20, modelos: Optional[List[str]] = None,
+                        plataformas: Optional[List[str]] = None, lease_seconds: int = 10800) -> List[Dict]:
+    """Igual que la función SQL claim_due_schedules, en una transacción BEGIN IMMEDIATE."""
+    ahora = datetime.now(timezone.utc)
+    vencido = (ahora - timedelta(seconds=lease_seconds)).isoformat()
+    sql = ("SELECT * FROM schedules WHERE (estado = 'pendiente' OR (estado = 'procesando'"
+           " AND claimed_at < ?)) AND scheduled_time <> '' AND scheduled_time <= ?")
+    params: list = [vencido, now_str]
+    if modelos is not None:
+        sql += f" AND modelo IN ({','.join('?' * len(modelos))})"
+        params += list(modelos)
+    if plataformas is not None:
+        sql += f" AND lower(plataforma) IN ({','.join('?' * len(plataformas))})"
+        params += list(plataformas)
+    sql += " ORDER BY scheduled_time LIMIT ?"
+    params.append(limit)
+
+    conn = _connect()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        rows = _rows(conn.execute(sql, params))
+        claimed_at = ahora.isoformat()
+        conn.executemany(
+            "UPDATE schedules SET estado = 'procesando', claimed_at = ? WHERE id = ?",
+            [(claimed_at, r["id"]) for r in rows],
+        )
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    for r in rows:
+        r["estado"] = "procesando"
+        r["claimed_at"] = claimed_at
+    return rows
+
+
+def set_schedule_estado(schedule_id: int, estado: str, campos: Optional[Dict] = None) -> bool:
+    campos = {k: v for k, v in (campos or {}).items() if k in _SCHEDULE_UPDATABLE}
+    sets = "".join(f", {col} = ?" for col in campos)
+    try:
+        _connect().execute(f"UPDATE schedules SET estado = ?{sets} WHERE id = ?",
+                           (estado, *campos.values(), schedule_id))
+        return True
+    except sqlite3.Error as e:
+        print(f"Error actualizando estado del schedule {schedule_id}: {e}")
+        return False
+
+
+def iter_finished_schedules(since: str, page_size: int = 1000) -> Iterator[Dict]:
+    last_id = 0
+    while True:
+        data = _rows(_connect().execute(
+            "SELECT * FROM schedules WHERE finished_at >= ? AND id > ? ORDER BY id LIMIT ?",
+            (since, last_id, page_size),
+        ))
+        yield from data
+        if len(data) < page_size:
+            return
+        last_id = data[-1]["id"]
+
+
+# ---- Perfiles de modelos ----
+
+def upsert_model_profiles(rows: List[Dict]) -> bool:
+    if not rows:
+        return True
+    values = [
+        tuple(
+            json.dumps(r.get(col), ensure_ascii=False) if isinstance(r.get(col), (dict, list)) else r.get(col)
+            for col in PROFILE_COLUMNS
+        )
+        for r in rows
+    ]
+    updates = ", ".join(f"{col} = excluded.{col}" for col in PROFILE_COLUMNS[1:])
+    conn = _connect()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.executemany(
+            f"INSERT INTO model_profiles ({', '.join(PROFILE_COLUMNS)}) VALUES ({', '.join('?' * len(PROFILE_COLUMNS))}) "
+            f"ON CONFLICT (model_slug) DO UPDATE SET {updates}, updated_at = datetime('now')",
+            values,
+        )
+        conn.execute("COMMIT")
+        return True
+    except sqlite3.Error as e:
+        conn.execute("ROLLBACK")
+        print(f"❌ Error escribiendo perfiles de modelos: {e}")
+        return False
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=f"Base SQLite local ({DB_PATH}).")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    add = sub.add_parser("add-model", help="Registra un modelo.")
+    add.add_argument("modelo")
+    add.add_argument("--plataformas", default="xxxfollow,myclub")
+    add.add_argument("--hora-inicio", default="12:00")
+    add.add_argument("--ventana-horas", type=int, default=5)
+    sub.add_parser("stats", help="Schedules por modelo y estado.")
+    args = parser.parse_args()
+
+    if args.cmd == "add-model":
+        ensure_model_exists(args.modelo, args.plataformas, args.hora_inicio, args.ventana_horas)
+    elif args.cmd == "stats":
+        stats: Dict[str, Dict[str, int]] = {}
+        for modelo, estado, n in _connect().execute(
+            "SELECT modelo, estado, COUNT(*) FROM schedules GROUP BY modelo, estado ORDER BY modelo"
+        ):
+            stats.setdefault(modelo, {})[estado] = n
+        print(json.dumps({"db": str(DB_PATH), "modelos": get_all_models(), "schedules": stats},
+                         indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,44 +2,108 @@
 Cliente centralizado de Supabase para el proyecto Trafico.
 
 Maneja:
-- Conexión a Supabase
-- Creación dinámica de tablas para nuevos modelos
-- Operaciones CRUD en tablas de modelos y schedules
+- Conexión a Supabase (perezosa: el cliente se crea en el primer uso)
+- Configuración de modelos (tabla 'modelos'), con un registro en memoria
+  precargado al arrancar para no consultar la base en cada subida
+- Operaciones CRUD en la tabla compartida de schedules (una fila por
+  modelo/video/plataforma, columna ``modelo``)
+
+Las funciones de BACKEND_API son envoltorios síncronos de sus contrapartes en
+``async_client`` (``get_model_config`` → ``aget_model_config``): las ejecutan
+en un loop de fondo compartido. Desde un event loop conviene usar directamente
+las de ``async_client``.
+
+Con ``DB_BACKEND=sqlite`` las funciones de BACKEND_API se sustituyen por las de
+``sqlite_backend`` (misma firma), sin tocar a quien las importa.
 """
 
 import os
-from typing import List, Dict, Optional
-from supabase import create_client, Client
+import threading
+import time
+from typing import Iterator, List, Dict, Optional, TYPE_CHECKING
 from dotenv import load_dotenv
 
+if TYPE_CHECKING:
+    from supabase import Client
+
 load_dotenv()
 
 # Configuración
 SUPABASE_URL = os.getenv("SUPABASE_URL", "https://osdpemjvcsmfbacmjlcv.supabase.co")
 SUPABASE_KEY = os.getenv("SUPABASE_ANON_KEY")
 
-if not SUPABASE_KEY:
-    raise ValueError("SUPABASE_ANON_KEY no está configurado en .env")
+# Backend de datos: "supabase" (por defecto) o "sqlite" (ver sqlite_backend.py)
+DB_BACKEND = os.getenv("DB_BACKEND", "supabase").strip().lower()
+
+# Tabla única de schedules para todos los modelos (ver migrations/001_schedules.sql)
+SCHEDULES_TABLE = os.getenv("SCHEDULES_TABLE", "schedules")
+PAGE_SIZE = 1000
+
+# Registro en memoria de modelos conocidos: {modelo: (config, leído_en)}
+MODEL_REGISTRY_TTL = float(os.getenv("MODEL_REGISTRY_TTL", "300"))
+_model_registry: Dict[str, tuple] = {}
+_registry_lock = threading.Lock()
+
+# Cliente global (se crea en get_client(), no al importar)
+_client: Optional["Client"] = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> "Client":
+    """
+    Devuelve el cliente síncrono de Supabase, creándolo en el primer uso.
+    
+    Lo usan las herramientas que leen tablas fuera de BACKEND_API
+    (migrate_schedules.py); las funciones de este módulo van por async_client.
+    
+    Importar este módulo no abre conexiones ni exige credenciales; el error por
+    falta de SUPABASE_ANON_KEY aparece solo cuando se necesita la base de datos.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                if not SUPABASE_KEY:
+                    raise ValueError("SUPABASE_ANON_KEY no está configurado en .env")
+                from supabase import create_client
+                _client = create_client(SUPABASE_URL, SUPABASE_KEY)
+    return _client
+
 
-# Cliente global
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+def __getattr__(name: str):
+    # Compatibilidad: `from database.supabase_client import supabase`
+    if name == "supabase":
+        return get_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _remember_model(config: Dict) -> None:
+    with _registry_lock:
+        _model_registry[config["modelo"]] = (config, time.monotonic())
+
+
+def warm_model_registry() -> int:
+    """
+    Carga todos los modelos de la tabla 'modelos' en el registro en memoria
+    (una sola consulta). Se llama al arrancar el bot/poster.
+    
+    Returns:
+        Número de modelos cargados
+    """
+    return _aio.run_sync(_aio.awarm_model_registry())
 
 
 def get_model_config(modelo: str) -> Optional[Dict]:
     """
     Obtiene la configuración de un modelo desde la tabla 'modelos'.
     
+    Usa el registro en memoria si la entrada tiene menos de MODEL_REGISTRY_TTL
+    segundos; los modelos inexistentes no se cachean (otro proceso puede crearlos).
+    
     Returns:
         Dict con {modelo, plataformas, hora_inicio, ventana_horas} o None si no existe
     """
-    try:
-        response = supabase.table("modelos").select("*").eq("modelo", modelo).execute()
-        if response.data and len(response.data) > 0:
-            return response.data[0]
-        return None
-    except Exception as e:
-        print(f"Error obteniendo config de {modelo}: {e}")
-        return None
+    return _aio.run_sync(_aio.aget_model_config(modelo))
 
 
 def create_model_config(modelo: str, plataformas: str, hora_inicio: str = "12:00", ventana_horas: int = 5) -> bool:
@@ -55,19 +119,7 @@ def create_model_config(modelo: str, plataformas: str, hora_inicio: str = "12:00
     Returns:
         True si se creó exitosamente
     """
-    try:
-        data = {
-            "modelo": modelo,
-            "plataformas": plataformas,
-            "hora_inicio": hora_inicio,
-            "ventana_horas": ventana_horas
-        }
-        supabase.table("modelos").insert(data).execute()
-        print(f"✅ Configuración de {modelo} creada en tabla 'modelos'")
-        return True
-    except Exception as e:
-        print(f"Error creando config de {modelo}: {e}")
-        return False
+    return _aio.run_sync(_aio.acreate_model_config(modelo, plataformas, hora_inicio, ventana_horas))
 
 
 def table_exists(table_name: str) -> bool:
@@ -76,96 +128,17 @@ def table_exists(table_name: str) -> bool:
     
     Intenta hacer un select simple y si falla, asume que no existe.
     """
-    try:
-        supabase.table(table_name).select("*").limit(1).execute()
-        return True
-    except Exception:
-        return False
-
-
-def create_model_table(modelo: str) -> bool:
-    """
-    Crea una tabla para un modelo nuevo ejecutando el script Node.js con MCP.
-    
-    Args:
-        modelo: Nombre del modelo (slug)
-    
-    Returns:
-        True si se creó exitosamente
-    """
-    import subprocess
-    from pathlib import Path
-    
-    try:
-        # Verificar si ya existe
-        if table_exists(modelo):
-            print(f"ℹ️  Tabla '{modelo}' ya existe")
-            return True
-        
-        print(f"🆕 Creando tabla para modelo nuevo: {modelo}")
-        
-        # Ruta al script de creación
-        script_path = Path(__file__).parent / "create_model_table.js"
-        
-        if not script_path.exists():
-            print(f"❌ Script no encontrado: {script_path}")
-            return False
-        
-        # Preparar entorno con credenciales
-        env = os.environ.copy()
-        # Asegurar que las variables necesarias estén presentes
-        if "SUPABASE_ACCESS_TOKEN" not in env:
-             # Intenta obtenerlo de .env si no está en el entorno
-             token = os.getenv("SUPABASE_ACCESS_TOKEN")
-             if token:
-                 env["SUPABASE_ACCESS_TOKEN"] = token
-        
-        if "SUPABASE_PROJECT_REF" not in env:
-             # Extraer project ref de la URL si no está explícito
-             # URL formato: https://<project_ref>.supabase.co
-             if "supabase.co" in SUPABASE_URL:
-                 project_ref = SUPABASE_URL.split("//")[1].split(".")[0]
-                 env["SUPABASE_PROJECT_REF"] = project_ref
-             else:
-                 env["SUPABASE_PROJECT_REF"] = os.getenv("SUPABASE_PROJECT_REF")
-
-        # Ejecutar script Node.js
-        result = subprocess.run(
-            ["node", str(script_path), modelo],
-            cwd=str(script_path.parent),
-            env=env,
-            capture_output=True,
-            text=True,
-            timeout=30
-        )
-        
-        if result.returncode == 0:
-            print(f"✅ Tabla '{modelo}' creada exitosamente")
-            # Esperar a que el caché de esquema de Supabase se actualice
-            import time
-            time.sleep(3)
-            return True
-        else:
-            print(f"❌ Error creando tabla '{modelo}':")
-            print(result.stderr)
-            return False
-        
-    except subprocess.TimeoutExpired:
-        print(f"❌ Timeout creando tabla '{modelo}'")
-        return False
-    except Exception as e:
-        print(f"❌ Error creando tabla {modelo}: {e}")
-        return False
+    return _aio.run_sync(_aio.atable_exists(table_name))
 
 
 def ensure_model_exists(modelo: str, plataformas: str = "xxxfollow,myclub", 
                        hora_inicio: str = "12:00", ventana_horas: int = 5) -> bool:
     """
-    Asegura que un modelo existe tanto en la tabla 'modelos' como su tabla propia.
+    Asegura que un modelo existe en la tabla 'modelos'.
     
-    Si no existe:
-    1. Crea entrada en tabla 'modelos'
-    2. Intenta crear tabla del modelo
+    Los schedules de todos los modelos viven en la tabla compartida
+    SCHEDULES_TABLE, así que un modelo nuevo no necesita DDL. Con el registro
+    en memoria caliente, un modelo conocido no cuesta ninguna consulta.
     
     Args:
         modelo: Nombre del modelo
@@ -176,29 +149,27 @@ def ensure_model_exists(modelo: str, plataformas: str = "xxxfollow,myclub",
     Returns:
         True si el modelo existe o se creó exitosamente
     """
-    # Verificar si existe en tabla modelos
-    config = get_model_config(modelo)
-    
-    if not config:
-        print(f"🆕 Modelo nuevo detectado: {modelo}")
-        create_model_config(modelo, plataformas, hora_inicio, ventana_horas)
-    
-    # Verificar si existe tabla del modelo
-    if not table_exists(modelo):
-        print(f"⚠️  Tabla '{modelo}' no existe en Supabase")
-        print(f"   Creando tabla automáticamente...")
-        if not create_model_table(modelo):
-            print(f"❌ No se pudo crear tabla '{modelo}'")
-            return False
-    
-    return True
+    return _aio.run_sync(_aio.aensure_model_exists(modelo, plataformas, hora_inicio, ventana_horas))
+
+
+def _fetch_all(build_query, page_size: int = PAGE_SIZE) -> List[Dict]:
+    """Lee todas las filas de una consulta paginando con range() (PostgREST corta en 1000)."""
+    rows: List[Dict] = []
+    start = 0
+    while True:
+        response = build_query().range(start, start + page_size - 1).execute()
+        data = response.data or []
+        rows.extend(data)
+        if len(data) < page_size:
+            return rows
+        start += page_size
 
 
 def insert_schedule(modelo: str, video: str, caption: str, tags: str, 
                    plataforma: str, estado: str = "pendiente", 
                    scheduled_time: str = "") -> bool:
     """
-    Inserta un schedule en la tabla del modelo.
+    Inserta un schedule del modelo en la tabla de schedules.
     
     Args:
         modelo: Nombre del modelo
@@ -212,36 +183,21 @@ def insert_schedule(modelo: str, video: str, caption: str, tags: str,
     Returns:
         True si se insertó exitosamente
     """
-    try:
-        data = {
-            "video": video,
-            "caption": caption,
-            "tags": tags,
-            "plataforma": plataforma,
-            "estado": estado,
-            "scheduled_time": scheduled_time
-        }
-        supabase.table(modelo).insert(data).execute()
-        print(f"✅ Schedule insertado en tabla '{modelo}'")
-        return True
-    except Exception as e:
-        print(f"❌ Error insertando schedule en {modelo}: {e}")
-        return False
-
-
-def get_all_schedules(modelo: str) -> List[Dict]:
+    return _aio.run_sync(_aio.ainsert_schedule(modelo, video, caption, tags, plataforma, estado, scheduled_time))
+
+
+def get_all_schedules(modelo: str, raise_errors: bool = False) -> List[Dict]:
     """
     Obtiene todos los schedules de un modelo.
     
+    Args:
+        raise_errors: Propagar el error en vez de devolver []; para quien no
+            puede confundir "falló la lectura" con "no hay filas" (retention.py)
+    
     Returns:
         Lista de diccionarios con los schedules
     """
-    try:
-        response = supabase.table(modelo).select("*").execute()
-        return response.data if response.data else []
-    except Exception as e:
-        print(f"Error obteniendo schedules de {modelo}: {e}")
-        return []
+    return _aio.run_sync(_aio.aget_all_schedules(modelo, raise_errors))
 
 
 def get_pending_schedules(modelo: str, plataforma: Optional[str] = None) -> List[Dict]:
@@ -255,17 +211,7 @@ def get_pending_schedules(modelo: str, plataforma: Optional[str] = None) -> List
     Returns:
         Lista de schedules pendientes
     """
-    try:
-        query = supabase.table(modelo).select("*").eq("estado", "pendiente")
-        
-        if plataforma:
-            query = query.eq("plataforma", plataforma)
-        
-        response = query.execute()
-        return response.data if response.data else []
-    except Exception as e:
-        print(f"Error obteniendo schedules pendientes de {modelo}: {e}")
-        return []
+    return _aio.run_sync(_aio.aget_pending_schedules(modelo, plataforma))
 
 
 def update_schedule_time(modelo: str, video: str, plataforma: str, scheduled_time: str) -> bool:
@@ -281,9 +227,143 @@ def update_schedule_time(modelo: str, video: str, plataforma: str, scheduled_tim
     Returns:
         True si se actualizó exitosamente
     """
+    return _aio.run_sync(_aio.aupdate_schedule_time(modelo, video, plataforma, scheduled_time))
+
+
+def upsert_schedules(modelo: str, rows: List[Dict]) -> bool:
+    """
+    Escribe varios schedules ya planificados (con scheduled_time) en una sola
+    petición. Es idempotente: una fila con el mismo (modelo, video, plataforma,
+    scheduled_time) ya existente se deja como está, así que reintentar una
+    escritura a medias no duplica publicaciones ni reabre las ya publicadas.
+    
+    Args:
+        modelo: Nombre del modelo
+        rows: Lista de dicts con {video, caption, tags, plataforma, estado, scheduled_time}
+    
+    Returns:
+        True si se escribieron exitosamente
+    """
+    return _aio.run_sync(_aio.aupsert_schedules(modelo, rows))
+
+
+def insert_schedules(modelo: str, rows: List[Dict]) -> bool:
+    """
+    Inserta varios schedules de un modelo en una sola petición.
+    
+    Args:
+        modelo: Nombre del modelo
+        rows: Lista de dicts con {video, caption, tags, plataforma, estado, scheduled_time}
+    
+    Returns:
+        True si se insertaron exitosamente
+    """
+    return _aio.run_sync(_aio.ainsert_schedules(modelo, rows))
+
+
+def get_all_models() -> List[str]:
+    """Lista los modelos registrados en la tabla 'modelos'."""
+    return _aio.run_sync(_aio.aget_all_models())
+
+
+def claim_due_schedules(now_str: str, limit: int = 20, modelos: Optional[List[str]] = None,
+                        plataformas: Optional[List[str]] = None, lease_seconds: int = 10800) -> List[Dict]:
+    """
+    Toma atómicamente los schedules pendientes cuya hora ya llegó (de todos los
+    modelos, o solo de `modelos`/`plataformas`) y los deja en 'procesando'.
+    
+    Usa la función SQL claim_due_schedules (FOR UPDATE SKIP LOCKED), así que
+    varios posters pueden reclamar a la vez sin publicar dos veces lo mismo.
+    También retoma las filas en 'procesando' reclamadas hace más de
+    `lease_seconds` (su poster murió sin escribir el estado final).
+    
+    Args:
+        now_str: Hora actual "YYYY-MM-DD HH:MM:SS" (Bogotá, igual que scheduled_time)
+        limit: Máximo de filas a tomar
+        modelos: Restringir a estos modelos (opcional)
+        plataformas: Restringir a estas plataformas, en minúsculas (opcional)
+        lease_seconds: Antigüedad de claimed_at a partir de la cual un 'procesando' se retoma
+    
+    Returns:
+        Lista de schedules reclamados (con id y modelo)
+    """
+    return _aio.run_sync(_aio.aclaim_due_schedules(now_str, limit, modelos, plataformas, lease_seconds))
+
+
+def set_schedule_estado(schedule_id: int, estado: str, campos: Optional[Dict] = None) -> bool:
+    """
+    Actualiza el estado de un schedule por id.
+    
+    Args:
+        campos: Otras columnas a escribir en la misma petición (ej: started_at, finished_at)
+    
+    Returns:
+        True si se actualizó exitosamente
+    """
+    return _aio.run_sync(_aio.aset_schedule_estado(schedule_id, estado, campos))
+
+
+def iter_finished_schedules(since: str, page_size: int = PAGE_SIZE) -> Iterator[Dict]:
+    """
+    Recorre por páginas (por id, sin offset) los schedules terminados desde `since`.
+    
+    Args:
+        since: Fecha ISO 8601 con zona; filas con finished_at >= since
+    
+    Yields:
+        Filas de schedules con claimed_at, started_at y finished_at
+    """
+    last_id = 0
+    while True:
+        data = _aio.run_sync(_aio._afinished_page(since, last_id, page_size))
+        yield from data
+        if len(data) < page_size:
+            return
+        last_id = data[-1]["id"]
+
+
+def upsert_model_profiles(rows: List[Dict]) -> bool:
+    """
+    Inserta o actualiza perfiles de modelos (payloads de create_models) en una
+    sola petición, por model_slug.
+    
+    Returns:
+        True si se escribieron exitosamente
+    """
+    return _aio.run_sync(_aio.aupsert_model_profiles(rows))
+
+
+# Funciones que todo backend debe implementar con la misma firma
+BACKEND_API = (
+    "warm_model_registry",
+    "get_model_config",
+    "create_model_config",
+    "table_exists",
+    "ensure_model_exists",
+    "get_all_models",
+    "insert_schedule",
+    "insert_schedules",
+    "upsert_schedules",
+    "get_all_schedules",
+    "get_pending_schedules",
+    "update_schedule_time",
+    "claim_due_schedules",
+    "set_schedule_estado",
+    "iter_finished_schedules",
+    "upsert_model_profiles",
+)
+
+if DB_BACKEND == "sqlite":
     try:
-        supabase.table(modelo).update({"scheduled_time": scheduled_time}).eq("video", video).eq("plataforma", plataforma).execute()
-        return True
-    except Exception as e:
-        print(f"Error actualizando schedule: {e}")
-        return False
+        from . import sqlite_backend as _backend
+    except ImportError:
+        import sqlite_backend as _backend
+    globals().update({name: getattr(_backend, name) for name in BACKEND_API})
+elif DB_BACKEND != "supabase":
+    raise ValueError(f"DB_BACKEND desconocido: {DB_BACKEND!r} (usa 'supabase' o 'sqlite')")
+
+# Al final: async_client lee de este módulo la configuración y el backend ya elegido
+try:
+    from . import async_client as _aio
+except ImportError:
+    import async_client as _aio
@@ -2,28 +2,69 @@ import sys, os
 from pathlib import Path
 BASE_DIR = Path(__file__).resolve().parents[2]
 VENV_PYTHON = BASE_DIR / ".venv" / "bin" / "python3"
-if VENV_PYTHON.exists() and not sys.executable.startswith(str(BASE_DIR / ".venv")):
+# Solo al ejecutarse como script: importar el módulo nunca reinicia el proceso
+if __name__ == "__main__" and VENV_PYTHON.exists() and not sys.executable.startswith(str(BASE_DIR / ".venv")):
     print(f"⚠️  Ejecuta siempre en el entorno virtual:\n    source {BASE_DIR}/.venv/bin/activate\n")
     os.execv(str(VENV_PYTHON), [str(VENV_PYTHON), __file__] + sys.argv[1:])
 
 import os, json, pathlib
+import asyncio
+import time
 from datetime import datetime
 import secrets
 from telegram import Update, InlineKeyboardMarkup, InlineKeyboardButton
 from telegram.ext import Application, CommandHandler, MessageHandler, CallbackQueryHandler, ContextTypes, filters
 from dotenv import load_dotenv
+
+# Añadir directorio src al path para importar database
+sys.path.append(str(BASE_DIR / "src"))
+from database.async_client import aensure_model_exists, aupsert_schedules, awarm_model_registry
+
 try:
-    from .scheduler import plan
-    from .caption import generate_and_update
+    from .scheduler import plan_many, schedule_rows, video_at_limit
+    from .caption import caption_many
+    from . import job_queue, media_store, profiling, renditions, tracing
+    from .bot_runtime import PerUserUpdateProcessor, SQLitePersistence
 except ImportError:
-    from scheduler import plan
-    from caption import generate_and_update
+    from scheduler import plan_many, schedule_rows, video_at_limit
+    from caption import caption_many
+    import job_queue, media_store, profiling, renditions, tracing
+    from bot_runtime import PerUserUpdateProcessor, SQLitePersistence
 
 load_dotenv()
 TOKEN = os.getenv("TELEGRAM_TOKEN")
 ADMIN_ID = os.getenv("ADMIN_ID")
 NOMBRE_POR_USER_ID = {} # opcional: puedes mapear ids a nombres
 
+# Cola de procesamiento en segundo plano
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "2"))
+DOWNLOAD_PROGRESS_SECONDS = float(os.getenv("DOWNLOAD_PROGRESS_SECONDS", "5"))
+DOWNLOAD_WAIT_SECONDS = float(os.getenv("DOWNLOAD_WAIT_SECONDS", "3600"))
+CAPTION_WORKERS = int(os.getenv("CAPTION_WORKERS", "4"))
+# Vídeos que llegan mientras el formulario sigue abierto (y dentro de esta ventana) van al mismo lote
+BATCH_WINDOW_SECONDS = float(os.getenv("BATCH_WINDOW_SECONDS", "120"))
+
+# Modo de ejecución: "polling" (por defecto) o "webhook"
+BOT_MODE = os.getenv("BOT_MODE", "polling").strip().lower()
+BOT_CONCURRENT_UPDATES = int(os.getenv("BOT_CONCURRENT_UPDATES", "32"))
+TELEGRAM_BASE_URL = os.getenv("TELEGRAM_BASE_URL", "")  # ej: http://127.0.0.1:8081/bot
+TELEGRAM_BASE_FILE_URL = os.getenv("TELEGRAM_BASE_FILE_URL", "")  # ej: http://127.0.0.1:8081/file/bot
+
+# Servidor Bot API local (telegram-bot-api --local) en el mismo host: getFile
+# devuelve una ruta del disco y el vídeo se enlaza en vez de descargarse.
+TELEGRAM_LOCAL_MODE = os.getenv("TELEGRAM_LOCAL_MODE", "0").lower() in ("1", "true", "yes")
+TELEGRAM_LOCAL_MOVE = os.getenv("TELEGRAM_LOCAL_MOVE", "0").lower() in ("1", "true", "yes")
+# "prefijo_del_servidor:prefijo_local" si el servidor corre en un contenedor con otro punto de montaje
+TELEGRAM_LOCAL_PATH_MAP = os.getenv("TELEGRAM_LOCAL_PATH_MAP", "")
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8443"))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "telegram")
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")  # URL pública, ej: https://bot.midominio.com/telegram
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET") or None
+_JOB_TASKS = []
+_JOB_WAKEUP = None  # asyncio.Event creado en on_startup
+
 # Configuración de modelos (carpeta en BASE_DIR)
 MODELOS_DIR = BASE_DIR / "modelos"
 MODELOS_DIR.mkdir(parents=True, exist_ok=True)
@@ -48,7 +89,7 @@ OUTFIT_OPCIONES = [
     ("desnuda", "✨ Desnuda"),
 ]
 
-def build_que_vendes_keyboard(seleccionados: list) -> InlineKeyboardMarkup:
+def build_que_vendes_keyboard(seleccionados: list, lote_n: int = 1, por_video: bool = False) -> InlineKeyboardMarkup:
     """Construye teclado para seleccionar qué vendes (múltiple selección)"""
     botones = []
     for valor, etiqueta in QUE_VENDES_OPCIONES:
@@ -57,9 +98,26 @@ def build_que_vendes_keyboard(seleccionados: list) -> InlineKeyboardMarkup:
             f"{check} {etiqueta}",
             callback_data=f"qv_toggle_{valor}"
         )])
+    if lote_n > 1:
+        modo = "una por vídeo" if por_video else f"mismas para los {lote_n}"
+        botones.append([InlineKeyboardButton(f"🔀 Respuestas: {modo}", callback_data="lote_modo")])
     botones.append([InlineKeyboardButton("➡️ Continuar a Outfit", callback_data="qv_done")])
     return InlineKeyboardMarkup(botones)
 
+def _teclado_que_vendes(user_data) -> InlineKeyboardMarkup:
+    # El modo del lote solo se puede cambiar antes de responder el primer vídeo
+    lote_n = len(user_data.get("lote", [])) if not user_data.get("lote_idx") else 1
+    return build_que_vendes_keyboard(user_data.get("que_vendes", []), lote_n, user_data.get("por_video", False))
+
+def _titulo_lote(user_data) -> str:
+    """Cabecera del formulario cuando hay varios vídeos en el lote."""
+    n = len(user_data.get("lote", []))
+    if n <= 1:
+        return ""
+    if user_data.get("por_video"):
+        return f"🎬 **Vídeo {user_data.get('lote_idx', 0) + 1} de {n}**\n\n"
+    return f"📦 **Lote de {n} vídeos** (mismas respuestas para todos)\n\n"
+
 def build_outfit_keyboard(seleccionados: list) -> InlineKeyboardMarkup:
     """Construye teclado para seleccionar outfit (múltiple selección)"""
     botones = []
@@ -82,11 +140,108 @@ async def start(update: Update, context):
         reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("📹 Enviar vídeo nuevo", callback_data="nuevo")]])
     )
 
+def _ruta_local(file_path: str) -> str:
+    """Traduce la ruta que da el servidor Bot API local a una ruta de este host."""
+    if TELEGRAM_LOCAL_PATH_MAP:
+        remoto, _, local = TELEGRAM_LOCAL_PATH_MAP.partition(":")
+        if remoto and file_path.startswith(remoto):
+            return local + file_path[len(remoto):]
+    return file_path
+
+async def _descargar_video(file, ruta: str, modelo: str, progreso: dict):
+    """
+    Descarga a `ruta`.part calculando el hash al vuelo y la pasa al almacén
+    por contenido (rename atómico + hardlink en la carpeta del modelo).
+    Los bytes recibidos se publican en ``progreso["bytes"]``.
+
+    Con TELEGRAM_LOCAL_MODE el archivo ya está en disco: se enlaza sin copiarlo.
+
+    Returns:
+        Tuple (ruta final, duplicado)
+    """
+    ruta_tmp = ruta + ".part"
+    try:
+        telegram_file = await file.get_file()
+        if TELEGRAM_LOCAL_MODE:
+            origen = _ruta_local(telegram_file.file_path)
+            if not os.path.isfile(origen):
+                raise FileNotFoundError(
+                    f"{origen} no existe en este host (¿falta TELEGRAM_LOCAL_PATH_MAP?)"
+                )
+            return await asyncio.to_thread(
+                media_store.ingest_local, modelo, origen, ruta, file.file_unique_id, TELEGRAM_LOCAL_MOVE
+            )
+        digest, size = await media_store.download_hashed(telegram_file.file_path, ruta_tmp, progreso)
+        return await asyncio.to_thread(
+            media_store.ingest, modelo, ruta_tmp, ruta, digest, size, file.file_unique_id
+        )
+    except BaseException:
+        if os.path.exists(ruta_tmp):
+            os.remove(ruta_tmp)
+        raise
+
+async def _reportar_progreso(mensaje, progreso: dict, total_bytes: int, descarga: asyncio.Task):
+    """Edita el mensaje de descarga con el porcentaje mientras la tarea avanza."""
+    ultimo = None
+    while not descarga.done():
+        await asyncio.wait([descarga], timeout=DOWNLOAD_PROGRESS_SECONDS)
+        # En modo local no hay descarga: el archivo ya está en disco y solo se enlaza
+        if descarga.done() or not total_bytes or TELEGRAM_LOCAL_MODE:
+            continue
+        # Contado por la descarga en streaming, no por el tamaño del .part en disco
+        actual = progreso.get("bytes", 0)
+        texto = f"📥 Descargando vídeo… {actual * 100 // total_bytes}% ({actual / 1e9:.2f}/{total_bytes / 1e9:.2f} GB)"
+        if texto != ultimo:
+            try:
+                await mensaje.edit_text(texto)
+                ultimo = texto
+            except Exception:
+                pass
+    try:
+        if descarga.cancelled() or descarga.exception():
+            await mensaje.edit_text("❌ Falló la descarga del vídeo. Envíalo de nuevo.")
+        else:
+            _, duplicado = descarga.result()
+            await mensaje.edit_text("♻️ Vídeo repetido: reutilizo el que ya tenías" if duplicado else "📥 Vídeo descargado ✅")
+    except Exception:
+        pass
+
+def _lote_abierto(user_data, media_group_id) -> bool:
+    """Un vídeo se suma al lote en curso si es del mismo álbum o llega en ráfaga."""
+    if not user_data.get("lote") or user_data.get("step") not in ("que_vendes", "outfit"):
+        return False
+    if media_group_id and media_group_id == user_data.get("media_group_id"):
+        return True
+    return time.time() - user_data.get("lote_ts", 0) <= BATCH_WINDOW_SECONDS
+
+async def _actualizar_formulario(bot, user_data):
+    """Refresca el formulario abierto para mostrar el tamaño del lote."""
+    if user_data.get("step") != "que_vendes" or user_data.get("lote_idx") or not user_data.get("form_msg"):
+        return
+    chat_id, message_id = user_data["form_msg"]
+    try:
+        await bot.edit_message_text(
+            chat_id=chat_id,
+            message_id=message_id,
+            text=_titulo_lote(user_data) + "Selecciona **qué vendes** (puedes elegir varios):",
+            reply_markup=_teclado_que_vendes(user_data),
+            parse_mode="Markdown"
+        )
+    except Exception:
+        pass
+
 async def video_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
     modelo = NOMBRE_POR_USER_ID.get(user.id, user.first_name.lower().replace(" ", "_"))
     file = update.message.video or update.message.document
-    await update.message.reply_text("Descargando vídeo grande…")
+    user_data = context.user_data
+    media_group_id = update.message.media_group_id
+    al_lote = _lote_abierto(user_data, media_group_id)
+    if not al_lote:
+        user_data.clear()
+    mensaje = await update.message.reply_text(
+        f"📥 Vídeo {len(user_data['lote']) + 1} del lote: descargando…" if al_lote else "📥 Descargando vídeo…"
+    )
     
     # Ruta absoluta dentro de Trafico/modelos/
     modelo_dir = MODELOS_DIR / modelo
@@ -97,22 +252,60 @@ async def video_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     random_suffix = secrets.token_hex(3)  # 6 caracteres hexadecimales
     video_nombre = f"{timestamp}_{random_suffix}.mp4"
     ruta = str(modelo_dir / video_nombre)
+    # Un trace por vídeo: lo sigue hasta la publicación (sidecar, schedules, worker)
+    trace_id = tracing.new_trace_id()
+    recibido_ns = time.time_ns()
     
-    telegram_file = await file.get_file()
-    await telegram_file.download_to_drive(ruta)
-    context.user_data["video_ruta"] = ruta
-    context.user_data["modelo"] = modelo
-    context.user_data["que_vendes"] = []  # Inicializar selección
-    context.user_data["outfit"] = []  # Inicializar selección
-    context.user_data["step"] = "que_vendes"  # Paso actual
+    # Reenvío del mismo archivo de Telegram: no se vuelve a descargar
+    existente = await asyncio.to_thread(media_store.find_video, modelo, None, file.file_unique_id)
+    if existente:
+        ruta = str(modelo_dir / existente)
+        item = {"video_ruta": ruta, "duplicado": True, "trace_id": trace_id, "recibido_ns": recibido_ns}
+        await mensaje.edit_text(f"♻️ Ya tenía este vídeo ({existente}), no lo descargo de nuevo.")
+    else:
+        # La descarga corre en segundo plano mientras la modelo responde las preguntas
+        progreso = {"bytes": 0}
+        descarga = asyncio.get_running_loop().create_task(_descargar_video(file, ruta, modelo, progreso))
+        asyncio.get_running_loop().create_task(_reportar_progreso(mensaje, progreso, file.file_size or 0, descarga))
+        # "_": estado en memoria, no serializable
+        user_data.setdefault("_descargas", {})[ruta] = descarga
+        item = {"video_ruta": ruta, "duplicado": False, "trace_id": trace_id, "recibido_ns": recibido_ns}
+
+        def _al_terminar(tarea, item=item):
+            error = "cancelada" if tarea.cancelled() else (repr(tarea.exception()) if tarea.exception() else None)
+            # Publicar la ruta final en user_data (persistido) para otras réplicas del bot
+            if not error:
+                item["video_ruta"], item["duplicado"] = tarea.result()
+            tracing.record_span(
+                "telegram.download", trace_id, recibido_ns, error=error, modelo=modelo,
+                bytes=file.file_size or 0, local_mode=TELEGRAM_LOCAL_MODE, duplicado=item["duplicado"],
+            )
+        descarga.add_done_callback(_al_terminar)
+    user_data["lote_ts"] = time.time()
+    user_data["media_group_id"] = media_group_id
+
+    if al_lote:
+        user_data["lote"].append(item)
+        await _actualizar_formulario(context.bot, user_data)
+        return
+
+    user_data["lote"] = [item]
+    user_data["lote_idx"] = 0
+    user_data["modelo"] = modelo
+    user_data["que_vendes"] = []  # Inicializar selección
+    user_data["outfit"] = []  # Inicializar selección
+    user_data["step"] = "que_vendes"  # Paso actual
     
-    await update.message.reply_text(
-        "¡Vídeo recibido! ✅\n\n"
+    formulario = await update.message.reply_text(
+        "¡Vídeo recibido! ✅ (se sigue descargando mientras eliges)\n"
+        "Si mandas más vídeos ahora, van en el mismo lote.\n\n"
         "Ahora selecciona **qué vendes** (puedes elegir varios):",
         reply_markup=build_que_vendes_keyboard([]),
         parse_mode="Markdown"
     )
+    user_data["form_msg"] = [formulario.chat_id, formulario.message_id]
 
+@profiling.profiled("callback_handler")
 async def callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Maneja todos los callbacks de los botones interactivos"""
     query = update.callback_query
@@ -128,7 +321,7 @@ async def callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
     
     # Verificar que hay video pendiente
-    if not user_data.get("video_ruta"):
+    if not user_data.get("lote"):
         await query.edit_message_text("❌ Error: No hay video pendiente.")
         return
     
@@ -143,9 +336,19 @@ async def callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         user_data["que_vendes"] = seleccionados
         
         await query.edit_message_text(
+            _titulo_lote(user_data) +
             f"**Qué vendes** (seleccionados: {len(seleccionados)})\n\n"
             "Toca los botones para seleccionar/deseleccionar:",
-            reply_markup=build_que_vendes_keyboard(seleccionados),
+            reply_markup=_teclado_que_vendes(user_data),
+            parse_mode="Markdown"
+        )
+    
+    # Mismas respuestas para todo el lote, o una por vídeo
+    elif data == "lote_modo":
+        user_data["por_video"] = not user_data.get("por_video", False)
+        await query.edit_message_text(
+            _titulo_lote(user_data) + "Selecciona **qué vendes** (puedes elegir varios):",
+            reply_markup=_teclado_que_vendes(user_data),
             parse_mode="Markdown"
         )
     
@@ -157,6 +360,7 @@ async def callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         
         user_data["step"] = "outfit"
         await query.edit_message_text(
+            _titulo_lote(user_data) +
             f"✅ **Qué vendes seleccionado:** {', '.join(user_data['que_vendes'])}\n\n"
             "Ahora selecciona **outfit** (puedes elegir varios):",
             reply_markup=build_outfit_keyboard([]),
@@ -174,6 +378,7 @@ async def callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         user_data["outfit"] = seleccionados
         
         await query.edit_message_text(
+            _titulo_lote(user_data) +
             f"**Outfit** (seleccionados: {len(seleccionados)})\n\n"
             "Toca los botones para seleccionar/deseleccionar:",
             reply_markup=build_outfit_keyboard(seleccionados),
@@ -186,59 +391,400 @@ async def callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
             await query.answer("⚠️ Selecciona al menos un outfit", show_alert=True)
             return
         
-        await query.edit_message_text("⏳ Procesando video...")
-        
-        # Procesar igual que antes
-        modelo = user_data["modelo"]
-        video_ruta = user_data["video_ruta"]
-        video_nombre = pathlib.Path(video_ruta).name
-        meta_path = video_ruta.replace(".mp4", ".json")
-        
-        que_vendes = user_data.get("que_vendes", [])
-        outfit = user_data.get("outfit", [])
-        
-        # Guardar metadata
-        json.dump({
-            "que_vendes": que_vendes,
-            "outfit": outfit,
-            "video_filename": video_nombre
-        }, open(meta_path, "w"), ensure_ascii=False, indent=2)
-        
-        # Generar caption y tags
-        generate_and_update(modelo, meta_path)
+        lote = user_data["lote"]
+        if user_data.get("por_video"):
+            idx = user_data.get("lote_idx", 0)
+            lote[idx]["que_vendes"] = user_data["que_vendes"]
+            lote[idx]["outfit"] = user_data["outfit"]
+            if idx + 1 < len(lote):
+                # Siguiente vídeo del lote: repetir el formulario
+                user_data["lote_idx"] = idx + 1
+                user_data["que_vendes"] = []
+                user_data["outfit"] = []
+                user_data["step"] = "que_vendes"
+                await query.edit_message_text(
+                    _titulo_lote(user_data) + "Selecciona **qué vendes** (puedes elegir varios):",
+                    reply_markup=_teclado_que_vendes(user_data),
+                    parse_mode="Markdown"
+                )
+                return
+        else:
+            for item in lote:
+                item["que_vendes"] = list(user_data["que_vendes"])
+                item["outfit"] = list(user_data["outfit"])
         
-        # Programar slots
+        # Encolar y responder de inmediato: el trabajo lo hace un worker en segundo plano
+        payload = {
+            "modelo": user_data["modelo"],
+            "videos": lote,
+            "chat_id": query.message.chat_id,
+            "message_id": query.message.message_id,
+        }
+        descargas = user_data.get("_descargas", {})
+        user_data.clear()
+        # Solo aquí, al final, se esperan las descargas (en otra tarea, sin bloquear el handler)
+        asyncio.get_running_loop().create_task(_encolar_tras_descarga(query, descargas, payload))
+
+async def _encolar_tras_descarga(query, descargas: dict, payload: dict):
+    """Espera las descargas del lote (si siguen en curso) y encola el procesamiento."""
+    avisado = False
+    limite = asyncio.get_running_loop().time() + DOWNLOAD_WAIT_SECONDS
+    listos, vistos, fallidos = [], set(), 0
+    for item in payload["videos"]:
+        # Lo que tardó la modelo en responder el formulario
+        tracing.record_span("bot.form", item.get("trace_id"), item.get("recibido_ns") or time.time_ns(),
+                            modelo=payload["modelo"], lote=len(payload["videos"]))
+        espera_ns = time.time_ns()
+        descarga = descargas.get(item["video_ruta"])
+        if not avisado and ((descarga is not None and not descarga.done())
+                            or (descarga is None and not os.path.exists(item["video_ruta"]))):
+            await query.edit_message_text("⏳ Terminando la descarga del vídeo…")
+            avisado = True
+        if descarga is not None:
+            try:
+                item["video_ruta"], item["duplicado"] = await descarga
+            except Exception as e:
+                print(f"❌ Falló la descarga de {item['video_ruta']}: {e}")
+                fallidos += 1
+                continue
+        else:
+            # La descarga la lleva otra réplica del bot: esperar a que aparezca en el disco compartido
+            while not os.path.exists(item["video_ruta"]) and asyncio.get_running_loop().time() < limite:
+                await asyncio.sleep(2)
+            if not os.path.exists(item["video_ruta"]):
+                fallidos += 1
+                continue
+        tracing.record_span("bot.wait_download", item.get("trace_id"), espera_ns, replica=descarga is None)
+        if item["video_ruta"] not in vistos:  # el mismo contenido dos veces en el lote
+            vistos.add(item["video_ruta"])
+            listos.append(item)
+
+    if not listos:
+        await query.edit_message_text("❌ Falló la descarga del vídeo. Envíalo de nuevo.")
+        return
+    payload["videos"] = listos
+    job_id = await asyncio.to_thread(job_queue.enqueue, "process_video", payload)
+    if _JOB_WAKEUP is not None:
+        _JOB_WAKEUP.set()
+    texto = f"📥 {len(listos)} vídeos en cola (#{job_id})." if len(listos) > 1 else f"📥 Video en cola (#{job_id})."
+    if fallidos:
+        texto += f"\n⚠️ {fallidos} no se pudieron descargar; envíalos de nuevo."
+    await query.edit_message_text(texto + " Te aviso aquí cuando esté listo.")
+
+# ---- Procesamiento en segundo plano ----
+
+def _videos(payload: dict) -> list:
+    """Vídeos del trabajo (los trabajos encolados antes de los lotes traían uno solo en la raíz)."""
+    if "videos" not in payload:
+        payload["videos"] = [{
+            "video_ruta": payload["video_ruta"],
+            "duplicado": payload.get("duplicado", False),
+            "que_vendes": payload["que_vendes"],
+            "outfit": payload["outfit"],
+        }]
+    return payload["videos"]
+
+def _stage_metadata(payload: dict):
+    """Guarda el sidecar .json junto a cada video."""
+    for item in _videos(payload):
+        video_ruta = item["video_ruta"]
+        sidecar = video_ruta.replace(".mp4", ".json")
+        if item.get("duplicado") and os.path.exists(sidecar):
+            # El video ya existía: su sidecar conserva la metadata original (y el
+            # "archivado" de retention.py); el caption se genera con ella
+            continue
+        with open(sidecar, "w", encoding="utf-8") as f:
+            json.dump({
+                "que_vendes": item["que_vendes"],
+                "outfit": item["outfit"],
+                "video_filename": pathlib.Path(video_ruta).name,
+                "trace_id": item.get("trace_id"),
+            }, f, ensure_ascii=False, indent=2)
+
+def _stage_caption(payload: dict):
+    """Genera captions y tags de todo el lote en paralelo."""
+    modelo = payload["modelo"]
+    pendientes = {}
+    for item in _videos(payload):
+        video_nombre = pathlib.Path(item["video_ruta"]).name
+        if item.get("caption") or item.get("omitido"):
+            continue
+        if item.get("duplicado") and video_at_limit(modelo, video_nombre):
+            # Contenido repetido que ya agotó MAX_SAME_VIDEO: ni caption ni planificación
+            item["omitido"] = True
+            item["slots_msg"] = "Slots: tope_video (vídeo duplicado)"
+            continue
+        pendientes[video_nombre] = item
+    if not pendientes:
+        return
+
+    sidecars = [pathlib.Path(item["video_ruta"].replace(".mp4", ".json")) for item in pendientes.values()]
+    captions = caption_many(modelo, sidecars, CAPTION_WORKERS)
+    if not captions:
+        raise RuntimeError("no se pudo generar ningún caption")
+    for video_nombre, item in pendientes.items():
+        if video_nombre in captions:
+            item["caption"], item["tags"] = captions[video_nombre]
+        else:
+            item["slots_msg"] = "Sin caption (falló la generación)"
+
+async def _stage_plan(payload: dict):
+    """
+    Programa los slots de todo el lote en una pasada y los guarda en el payload.
+
+    No escribe en Supabase: la etapa "schedule" escribe exactamente estos slots,
+    así un reintento no vuelve a planificar (con otro jitter) ni duplica filas.
+    """
+    modelo = payload["modelo"]
+    por_nombre = {
+        pathlib.Path(item["video_ruta"]).name: item
+        for item in _videos(payload) if item.get("caption") and not item.get("omitido")
+    }
+    if not por_nombre:
+        return
+    if not await aensure_model_exists(modelo):
+        raise RuntimeError(f"no se pudo asegurar el modelo '{modelo}' en Supabase")
+
+    try:
+        planificados = await asyncio.to_thread(plan_many, modelo, list(por_nombre))
+    except ValueError as e:
+        for item in por_nombre.values():
+            item["slots_msg"] = f"Slots: {e}"
+        return
+
+    for video_nombre, slots in planificados.items():
+        item = por_nombre[video_nombre]
+        if isinstance(slots, Exception):
+            item["slots_msg"] = f"Slots: {slots}"
+            continue
+        item["slots"] = [list(slot) for slot in slots]
+        item["plataformas"] = [plataforma for plataforma, _ in slots]
+        item["slots_msg"] = f"{len(slots)} slots programados"
+
+async def _stage_schedule(payload: dict):
+    """Escribe en Supabase, de una vez, los slots guardados por la etapa "plan" (upsert idempotente)."""
+    rows = []
+    for item in _videos(payload):
+        if item.get("slots") and not item.get("omitido"):
+            rows.extend(schedule_rows(pathlib.Path(item["video_ruta"]).name, item["caption"], item["tags"],
+                                      item["slots"], item.get("trace_id")))
+    if not rows:
+        return
+    if not await aupsert_schedules(payload["modelo"], rows):
+        raise RuntimeError("no se pudieron guardar los horarios en Supabase")
+
+def _stage_renditions(payload: dict):
+    """Genera las versiones por plataforma de todo el lote (pool de procesos con ffmpeg)."""
+    trabajos = {
+        item["video_ruta"]: item["plataformas"]
+        for item in _videos(payload) if not item.get("omitido") and item.get("plataformas")
+    }
+    if not trabajos:
+        return
+    try:
+        renditions.prepare_renditions_many(trabajos)
+    except Exception as e:
+        # No es crítico: el poster sube el original si no hay rendition
+        print(f"⚠️  Error preparando renditions: {e}")
+
+# Etapas en orden; un trabajo reanudado tras un reinicio salta las ya completadas
+VIDEO_STAGES = [
+    ("metadata", "💾 Guardando metadata…", _stage_metadata),
+    ("caption", "🧠 Generando captions y tags…", _stage_caption),
+    ("plan", "📅 Programando horarios…", _stage_plan),
+    ("schedule", "🗓️ Guardando horarios…", _stage_schedule),
+    ("renditions", "🎞️ Preparando versiones por plataforma…", _stage_renditions),
+]
+
+async def _edit_job_message(bot, payload: dict, text: str, reply_markup=None, parse_mode=None):
+    try:
+        await bot.edit_message_text(
+            chat_id=payload["chat_id"],
+            message_id=payload["message_id"],
+            text=text,
+            reply_markup=reply_markup,
+            parse_mode=parse_mode
+        )
+    except Exception as e:
+        print(f"⚠️  No se pudo actualizar el mensaje del trabajo: {e}")
+
+async def _heartbeat(job_id: int, claim: str, perdido: asyncio.Event):
+    """Renueva el lease del trabajo mientras corre; marca `perdido` si otra réplica lo tomó."""
+    while True:
+        await asyncio.sleep(job_queue.JOB_LEASE_SECONDS / 3)
         try:
-            slots = plan(modelo, video_nombre)
-            
-            # Actualizar scheduled_time en Supabase
-            # Añadir src al path si no está (ya debería estar por bot_central.py pero por seguridad)
-            if str(BASE_DIR / "src") not in sys.path:
-                sys.path.append(str(BASE_DIR / "src"))
-            from database.supabase_client import update_schedule_time
-            for plataforma, scheduled_time in slots:
-                update_schedule_time(modelo, video_nombre, plataforma, scheduled_time)
-            
-            slots_msg = f"{len(slots)} slots programados"
+            vigente = await asyncio.to_thread(job_queue.heartbeat, job_id, claim)
         except Exception as e:
-            slots_msg = f"Slots: {str(e)}"
-            slots = []
-        
-        await query.edit_message_text(
-            f"✅ **¡Todo procesado!**\n\n"
-            f"📝 Qué vendes: {', '.join(que_vendes)}\n"
-            f"👗 Outfit: {', '.join(outfit)}\n"
-            f"📅 {slots_msg} ✨\n\n"
-            "¿Otro vídeo?",
-            reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("Sí, otro", callback_data="nuevo")]]),
-            parse_mode="Markdown"
+            print(f"⚠️  No se pudo renovar el lease del trabajo #{job_id}: {e}")
+            continue
+        if not vigente:
+            perdido.set()
+            return
+
+async def run_video_job(bot, job: dict):
+    """Ejecuta las etapas de un trabajo process_video, editando el mensaje en cada una."""
+    perdido = asyncio.Event()
+    latido = asyncio.create_task(_heartbeat(job["id"], job["claim"], perdido))
+    try:
+        await _run_video_stages(bot, job, perdido)
+    finally:
+        latido.cancel()
+
+async def _run_video_stages(bot, job: dict, perdido: asyncio.Event):
+    payload = job["payload"]
+    videos = _videos(payload)
+    titulo = f"⏳ Procesando {len(videos)} vídeos..." if len(videos) > 1 else "⏳ Procesando video..."
+    nombres = [nombre for nombre, _, _ in VIDEO_STAGES]
+    hechas = nombres[:nombres.index(job["stage"]) + 1] if job["stage"] in nombres else []
+    for video in videos:
+        tracing.record_span("job.queue_wait", video.get("trace_id"), int(job["created_at"] * 1e9),
+                            job_id=job["id"], intento=job["attempts"])
+
+    for nombre, etiqueta, funcion in VIDEO_STAGES:
+        if nombre in hechas:
+            continue
+        if perdido.is_set():
+            print(f"⚠️  Trabajo #{job['id']}: lease perdido, lo continúa otra réplica")
+            return
+        await _edit_job_message(bot, payload, f"{titulo}\n\n{etiqueta}")
+        inicio_ns = time.time_ns()
+        try:
+            if asyncio.iscoroutinefunction(funcion):
+                # Etapas de base de datos: async_client, sin ocupar un hilo
+                await funcion(payload)
+            else:
+                await asyncio.to_thread(funcion, payload)
+        except Exception as e:
+            for video in videos:
+                tracing.record_span(f"job.{nombre}", video.get("trace_id"), inicio_ns,
+                                    error=str(e), job_id=job["id"], lote=len(videos))
+            reintenta = await asyncio.to_thread(job_queue.fail, job["id"], f"{nombre}: {e}", claim=job["claim"])
+            await _edit_job_message(
+                bot, payload,
+                f"❌ Error procesando video ({etiqueta}): {e}" + ("\n🔁 Reintentando…" if reintenta else "")
+            )
+            return
+        for video in videos:
+            tracing.record_span(f"job.{nombre}", video.get("trace_id"), inicio_ns, job_id=job["id"], lote=len(videos))
+        if not await asyncio.to_thread(job_queue.set_stage, job["id"], nombre, payload, claim=job["claim"]):
+            print(f"⚠️  Trabajo #{job['id']}: lease perdido tras {nombre}, lo continúa otra réplica")
+            return
+
+    if not await asyncio.to_thread(job_queue.complete, job["id"], claim=job["claim"]):
+        print(f"⚠️  Trabajo #{job['id']}: lease perdido al completar")
+        return
+    otro = InlineKeyboardMarkup([[InlineKeyboardButton("Sí, otro", callback_data="nuevo")]])
+    if len(videos) > 1:
+        lineas = "\n".join(
+            f"{'♻️' if v.get('duplicado') else '🎬'} {i}. {', '.join(v['que_vendes'])} · "
+            f"{', '.join(v['outfit'])} → {v.get('slots_msg', '')}"
+            for i, v in enumerate(videos, start=1)
         )
-        user_data.clear()
+        await _edit_job_message(
+            bot, payload,
+            f"✅ ¡Lote de {len(videos)} vídeos procesado!\n\n{lineas}\n\n¿Otro vídeo?",
+            reply_markup=otro
+        )
+        return
+    video = videos[0]
+    await _edit_job_message(
+        bot, payload,
+        f"✅ **¡Todo procesado!**\n\n"
+        f"📝 Qué vendes: {', '.join(video['que_vendes'])}\n"
+        f"👗 Outfit: {', '.join(video['outfit'])}\n"
+        f"📅 {video.get('slots_msg', '')} ✨\n"
+        + ("♻️ Contenido repetido, no ocupa disco extra\n" if video.get("duplicado") else "")
+        + "\n"
+        "¿Otro vídeo?",
+        reply_markup=otro,
+        parse_mode="Markdown"
+    )
+
+async def job_worker(app: Application):
+    """Consume la cola persistente hasta que se cancele la tarea."""
+    while True:
+        job = await asyncio.to_thread(job_queue.claim_next, "process_video")
+        if job is None:
+            _JOB_WAKEUP.clear()
+            try:
+                await asyncio.wait_for(_JOB_WAKEUP.wait(), JOB_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            continue
+        try:
+            await run_video_job(app.bot, job)
+        except Exception as e:
+            print(f"❌ Error inesperado en trabajo #{job['id']}: {e}")
+            await asyncio.to_thread(job_queue.fail, job["id"], str(e), claim=job["claim"])
+
+async def on_startup(app: Application):
+    """Precarga los modelos, reencola trabajos interrumpidos y lanza los workers."""
+    global _JOB_WAKEUP
+    _JOB_WAKEUP = asyncio.Event()
+    try:
+        # Registro de modelos en memoria: las subidas no consultan si el modelo existe
+        print(f"📚 {await awarm_model_registry()} modelos en memoria")
+    except Exception as e:
+        print(f"⚠️  No se pudo precargar el registro de modelos: {e}")
+    # Solo los de procesos muertos (lease vencido); los de otras réplicas vivas siguen con su dueño
+    reencolados = await asyncio.to_thread(job_queue.requeue_expired)
+    if reencolados:
+        print(f"🔁 {reencolados} trabajos interrumpidos vueltos a la cola")
+    loop = asyncio.get_running_loop()
+    for _ in range(JOB_WORKERS):
+        _JOB_TASKS.append(loop.create_task(job_worker(app)))
+
+async def on_shutdown(app: Application):
+    for task in _JOB_TASKS:
+        task.cancel()
+    _JOB_TASKS.clear()
+    # Devolver los trabajos en curso para que otra réplica no espere a que venza el lease
+    liberados = await asyncio.to_thread(job_queue.release)
+    if liberados:
+        print(f"🔁 {liberados} trabajos en curso devueltos a la cola")
+
+def build_application() -> Application:
+    """Construye la Application de Telegram (sin conectarse todavía)."""
+    if not TOKEN:
+        raise ValueError("TELEGRAM_TOKEN no está configurado en .env")
+    builder = (
+        Application.builder()
+        .token(TOKEN)
+        .concurrent_updates(PerUserUpdateProcessor(BOT_CONCURRENT_UPDATES))
+        .persistence(SQLitePersistence())
+        .post_init(on_startup)
+        .post_shutdown(on_shutdown)
+    )
+    if TELEGRAM_BASE_URL:
+        builder = builder.base_url(TELEGRAM_BASE_URL)
+    if TELEGRAM_BASE_FILE_URL:
+        builder = builder.base_file_url(TELEGRAM_BASE_FILE_URL)
+    if TELEGRAM_LOCAL_MODE:
+        builder = builder.local_mode(True)
+    app = builder.build()
+    app.add_handler(CommandHandler("start", start))
+    app.add_handler(CallbackQueryHandler(callback_handler))  # Maneja todos los botones
+    app.add_handler(MessageHandler(filters.VIDEO | filters.Document.ALL, video_handler))
+    # Ya no necesitamos texto_handler, todo es con botones
+    return app
+
+def main():
+    app = build_application()
+    profiling.install_signal_toggle()  # kill -USR2 <pid> enciende/apaga el perfilado
+    print("BOT CENTRAL corriendo – recibe de todas las modelos al mismo tiempo")
+    if BOT_MODE == "webhook":
+        if not WEBHOOK_URL:
+            raise ValueError("WEBHOOK_URL no está configurado en .env (requerido con BOT_MODE=webhook)")
+        print(f"🌐 Modo webhook en {WEBHOOK_LISTEN}:{WEBHOOK_PORT}/{WEBHOOK_PATH}")
+        app.run_webhook(
+            listen=WEBHOOK_LISTEN,
+            port=WEBHOOK_PORT,
+            url_path=WEBHOOK_PATH,
+            webhook_url=WEBHOOK_URL,
+            secret_token=WEBHOOK_SECRET,
+        )
+    else:
+        app.run_polling()
 
-app = Application.builder().token(TOKEN).build()
-app.add_handler(CommandHandler("start", start))
-app.add_handler(CallbackQueryHandler(callback_handler))  # Maneja todos los botones
-app.add_handler(MessageHandler(filters.VIDEO | filters.Document.ALL, video_handler))
-# Ya no necesitamos texto_handler, todo es con botones
-print("BOT CENTRAL corriendo – recibe de todas las modelos al mismo tiempo")
-app.run_polling()
+if __name__ == "__main__":
+    main()
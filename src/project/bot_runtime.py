@@ -0,0 +1,203 @@
+"""Infraestructura de ejecución del bot central.
+
+- ``PerUserUpdateProcessor``: procesa updates en paralelo (``concurrent_updates``)
+  pero en orden para cada usuario, así el callback lento de una modelo no
+  bloquea a las demás y los botones de una misma modelo no se pisan. Los
+  updates que esperan su turno no ocupan huecos de concurrencia.
+- ``SQLitePersistence``: guarda ``context.user_data`` en SQLite para que varias
+  réplicas del bot (detrás del mismo webhook) compartan el estado de la
+  conversación. Las claves que empiezan por ``_`` son estado en memoria
+  (p. ej. la tarea de descarga) y no se persisten.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import sqlite3
+from collections import deque
+from pathlib import Path
+from typing import Any, Awaitable, Deque, Dict, Optional
+
+from telegram import Update
+from telegram.ext import BasePersistence, BaseUpdateProcessor, PersistenceInput
+
+BASE_DIR = Path(__file__).resolve().parents[2]
+STATE_DB = Path(os.getenv("BOT_STATE_DB", str(BASE_DIR / ".runtime" / "bot_state.sqlite3")))
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """
+    Concurrencia entre usuarios, orden estricto dentro de cada usuario.
+
+    PTB llama a ``do_process_update`` con un hueco del semáforo global ya
+    tomado. Si el usuario ya tiene un update en curso, el nuevo se encola y se
+    devuelve el hueco enseguida; el update en curso ejecuta después los
+    encolados en orden con su mismo hueco. Así una ráfaga de un usuario (un
+    álbum, toques rápidos) ocupa un solo hueco y no deja sin turno a los demás.
+    """
+
+    def __init__(self, max_concurrent_updates: int):
+        super().__init__(max_concurrent_updates)
+        self._pending: Dict[int, Deque[Awaitable[Any]]] = {}
+
+    @staticmethod
+    def _key(update: object) -> Optional[int]:
+        if isinstance(update, Update):
+            if update.effective_user:
+                return update.effective_user.id
+            if update.effective_chat:
+                return update.effective_chat.id
+        return None
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        key = self._key(update)
+        if key is None:
+            await coroutine
+            return
+        cola = self._pending.get(key)
+        if cola is not None:
+            # Lo ejecuta el update en curso de este usuario, al terminar los anteriores
+            cola.append(coroutine)
+            return
+        cola = self._pending[key] = deque()
+        try:
+            while True:
+                try:
+                    await coroutine
+                except Exception as e:
+                    print(f"❌ Error procesando update del usuario {key}: {e}")
+                if not cola:
+                    break
+                coroutine = cola.popleft()
+        finally:
+            del self._pending[key]
+            # Cancelado (apagado): los encolados no se van a ejecutar
+            for pendiente in cola:
+                getattr(pendiente, "close", lambda: None)()
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+
+class SQLitePersistence(BasePersistence):
+    """Persistencia de user_data en SQLite (compartida entre réplicas del mismo host/volumen)."""
+
+    def __init__(self, path: Path = STATE_DB, update_interval: float = 1.0):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False),
+            update_interval=update_interval,
+        )
+        self.path = Path(path)
+        self._written: Dict[int, str] = {}
+
+    def _connect(self) -> sqlite3.Connection:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.path), timeout=10, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS user_data (user_id INTEGER PRIMARY KEY, data TEXT NOT NULL)")
+        return conn
+
+    @staticmethod
+    def _serializable(data: Dict) -> str:
+        return json.dumps(
+            {k: v for k, v in data.items() if not str(k).startswith("_")},
+            ensure_ascii=False, sort_keys=True, default=str,
+        )
+
+    def _load_all(self) -> Dict[int, Dict]:
+        conn = self._connect()
+        try:
+            rows = conn.execute("SELECT user_id, data FROM user_data").fetchall()
+        finally:
+            conn.close()
+        self._written = {uid: data for uid, data in rows}
+        return {uid: json.loads(data) for uid, data in rows}
+
+    def _load_one(self, user_id: int) -> Optional[str]:
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT data FROM user_data WHERE user_id = ?", (user_id,)).fetchone()
+        finally:
+            conn.close()
+        return row[0] if row else None
+
+    def _write(self, user_id: int, data: Optional[str]) -> None:
+        conn = self._connect()
+        try:
+            if data is None or data == "{}":
+                conn.execute("DELETE FROM user_data WHERE user_id = ?", (user_id,))
+            else:
+                conn.execute(
+                    "INSERT INTO user_data (user_id, data) VALUES (?, ?) "
+                    "ON CONFLICT(user_id) DO UPDATE SET data = excluded.data",
+                    (user_id, data),
+                )
+        finally:
+            conn.close()
+
+    # ---- user_data ----
+    async def get_user_data(self) -> Dict[int, Dict]:
+        return await asyncio.to_thread(self._load_all)
+
+    async def update_user_data(self, user_id: int, data: Dict) -> None:
+        serialized = self._serializable(data)
+        if self._written.get(user_id) == serialized:
+            return
+        await asyncio.to_thread(self._write, user_id, serialized)
+        self._written[user_id] = serialized
+
+    async def refresh_user_data(self, user_id: int, user_data: Dict) -> None:
+        # Otra réplica pudo haber atendido el update anterior de este usuario
+        stored = await asyncio.to_thread(self._load_one, user_id)
+        if stored is None or stored == self._written.get(user_id):
+            return
+        for key in [k for k in user_data if not str(k).startswith("_")]:
+            del user_data[key]
+        user_data.update(json.loads(stored))
+        self._written[user_id] = stored
+
+    async def drop_user_data(self, user_id: int) -> None:
+        await asyncio.to_thread(self._write, user_id, None)
+        self._written.pop(user_id, None)
+
+    async def flush(self) -> None:
+        pass
+
+    # ---- Datos no persistidos ----
+    async def get_chat_data(self) -> Dict[int, Dict]:
+        return {}
+
+    async def get_bot_data(self) -> Dict:
+        return {}
+
+    async def get_callback_data(self):
+        return None
+
+    async def get_conversations(self, name: str) -> Dict:
+        return {}
+
+    async def update_chat_data(self, chat_id: int, data: Dict) -> None:
+        pass
+
+    async def update_bot_data(self, data: Dict) -> None:
+        pass
+
+    async def update_callback_data(self, data) -> None:
+        pass
+
+    async def update_conversation(self, name: str, key, new_state) -> None:
+        pass
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        pass
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: Dict) -> None:
+        pass
+
+    async def refresh_bot_data(self, bot_data: Dict) -> None:
+        pass
@@ -0,0 +1,174 @@
+"""Importador masivo de videos para onboarding de modelos.
+
+Recorre ``modelos/<modelo>/`` buscando pares ``.mp4`` + ``.json`` (el mismo
+formato que deja el bot de Telegram), genera captions/tags en paralelo,
+planifica todos los videos en una sola pasada y escribe los schedules en bloque.
+
+El progreso se guarda en ``modelos/<modelo>/.import_state.json`` para poder
+reanudar una importación interrumpida sin duplicar filas.
+
+Uso:
+    python src/project/bulk_import.py <modelo> [--workers 8] [--chunk 100] [--dry-run]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+BASE_DIR = Path(__file__).resolve().parents[2]
+MODELS_DIR = BASE_DIR / "modelos"
+STATE_FILENAME = ".import_state.json"
+
+# Añadir src al path para importar database (igual que scheduler.py)
+sys.path.append(str(BASE_DIR / "src"))
+
+try:
+    from .caption import caption_many
+    from .scheduler import plan_many, schedule_rows
+    from .renditions import is_rendition
+except ImportError:
+    from caption import caption_many
+    from scheduler import plan_many, schedule_rows
+    from renditions import is_rendition
+
+
+def discover_videos(modelo: str) -> Tuple[List[Path], List[Path]]:
+    """
+    Busca los sidecars de un modelo.
+
+    Returns:
+        Tuple (sidecars con video existente, videos sin sidecar)
+    """
+    model_dir = MODELS_DIR / modelo
+    sidecars: List[Path] = []
+    sin_sidecar: List[Path] = []
+    for video_path in sorted(model_dir.glob("*.mp4")):
+        if is_rendition(video_path):
+            continue
+        meta_path = video_path.with_suffix(".json")
+        if meta_path.exists():
+            sidecars.append(meta_path)
+        else:
+            sin_sidecar.append(video_path)
+    return sidecars, sin_sidecar
+
+
+def load_state(modelo: str) -> Dict:
+    """Carga el estado de importación (videos ya escritos en Supabase)."""
+    state_path = MODELS_DIR / modelo / STATE_FILENAME
+    try:
+        return json.loads(state_path.read_text(encoding="utf-8"))
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {"done": []}
+
+
+def save_state(modelo: str, state: Dict) -> None:
+    """Guarda el estado de forma atómica (tmp + rename)."""
+    state_path = MODELS_DIR / modelo / STATE_FILENAME
+    tmp_path = state_path.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps(state, indent=2, ensure_ascii=False), encoding="utf-8")
+    tmp_path.replace(state_path)
+
+
+def import_model(modelo: str, workers: int = 8, chunk: int = 100, dry_run: bool = False) -> Dict[str, int]:
+    """
+    Importa todos los videos pendientes de un modelo.
+
+    Returns:
+        Resumen {encontrados, importados, omitidos, fallidos}
+    """
+    from database.supabase_client import ensure_model_exists, get_model_config, get_all_schedules, upsert_schedules
+
+    started = time.monotonic()
+    sidecars, sin_sidecar = discover_videos(modelo)
+    for video_path in sin_sidecar:
+        print(f"⚠️  Sin sidecar .json, se omite: {video_path.name}")
+
+    state = load_state(modelo)
+    done = set(state.get("done", []))
+
+    if not ensure_model_exists(modelo):
+        raise RuntimeError(f"No se pudo asegurar el modelo '{modelo}' en Supabase")
+    config = get_model_config(modelo)
+    if not config:
+        raise RuntimeError(f"Modelo '{modelo}' sin configuración en Supabase")
+
+    # Videos que ya están en Supabase (subidos por el bot o por una importación previa)
+    ya_programados = {(r.get("video") or "").strip() for r in get_all_schedules(modelo)}
+    pendientes = [
+        p for p in sidecars
+        if p.with_suffix(".mp4").name not in done and p.with_suffix(".mp4").name not in ya_programados
+    ]
+    summary = {
+        "encontrados": len(sidecars),
+        "importados": 0,
+        "omitidos": len(sidecars) - len(pendientes) + len(sin_sidecar),
+        "fallidos": 0,
+    }
+    print(f"📦 {modelo}: {len(sidecars)} videos, {len(pendientes)} por importar")
+    if not pendientes:
+        return summary
+
+    # 1) Captions/tags en paralelo
+    print(f"🧠 Generando captions con {workers} workers...")
+    captions = caption_many(modelo, pendientes, workers)
+    summary["fallidos"] += len(pendientes) - len(captions)
+
+    # 2) Planificación en una sola pasada
+    print("📅 Planificando horarios...")
+    planned = plan_many(modelo, list(captions.keys()))
+
+    rows_by_video: Dict[str, List[Dict]] = {}
+    for video_filename, slots in planned.items():
+        if isinstance(slots, Exception):
+            print(f"   ❌ {video_filename}: {slots}")
+            summary["fallidos"] += 1
+            continue
+        caption, tags = captions[video_filename]
+        rows_by_video[video_filename] = schedule_rows(video_filename, caption, tags, slots)
+
+    if dry_run:
+        for video_filename, rows in rows_by_video.items():
+            print(f"   🔎 {video_filename}: " + ", ".join(f"{r['plataforma']}@{r['scheduled_time']}" for r in rows))
+        summary["importados"] = len(rows_by_video)
+        return summary
+
+    # 3) Escritura en bloque, por lotes de videos; el estado se guarda tras cada lote
+    videos = list(rows_by_video.keys())
+    chunk = max(1, chunk)
+    for i in range(0, len(videos), chunk):
+        lote = videos[i:i + chunk]
+        rows = [row for v in lote for row in rows_by_video[v]]
+        if not upsert_schedules(modelo, rows):
+            summary["fallidos"] += len(lote)
+            print(f"❌ Falló el lote {i // chunk + 1}; vuelve a ejecutar para reanudar")
+            break
+        done.update(lote)
+        state["done"] = sorted(done)
+        save_state(modelo, state)
+        summary["importados"] += len(lote)
+        print(f"   💾 {summary['importados']}/{len(videos)} videos escritos")
+
+    elapsed = time.monotonic() - started
+    print(f"✅ Importación de {modelo} terminada en {elapsed:.1f}s: {summary}")
+    return summary
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Importa en bloque los videos de modelos/<modelo>/.")
+    parser.add_argument("modelo", help="Nombre del modelo (carpeta dentro de modelos/).")
+    parser.add_argument("--workers", type=int, default=8, help="Captions generados en paralelo.")
+    parser.add_argument("--chunk", type=int, default=100, help="Videos por escritura en Supabase.")
+    parser.add_argument("--dry-run", action="store_true", help="Solo muestra la planificación, no escribe.")
+    args = parser.parse_args()
+
+    import_model(args.modelo, workers=args.workers, chunk=args.chunk, dry_run=args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,24 +6,31 @@ import json
 import random
 import logging
 import time
-from typing import List, Dict, Optional
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import List, Dict, Optional, Tuple
 from dataclasses import dataclass
 
-import google.generativeai as genai
 from dotenv import load_dotenv
 load_dotenv()
 
+try:
+    from . import gemini_guard, profiling
+    from .local_caption import generate_local_caption, remember_caption
+except ImportError:
+    import gemini_guard, profiling
+    from local_caption import generate_local_caption, remember_caption
+
 # ---- ENV ----
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 MAX_RETRIES = 3
+GEMINI_RATE_WAIT = float(os.getenv("GEMINI_RATE_WAIT", "20"))  # segundos máximos esperando turno
+# Motor de captions: "gemini", "local" o "auto" (local bajo presión de latencia).
+# Si está vacío se usa "caption_engine" del config.json del modelo (por defecto "auto").
+CAPTION_ENGINE = os.getenv("CAPTION_ENGINE", "").strip().lower()
 
-# Configurar Gemini
-if GEMINI_API_KEY:
-    genai.configure(api_key=GEMINI_API_KEY)
-    # Usar gemini-2.0-flash-exp si está disponible, o fallback a 1.5
-    gemini_model = genai.GenerativeModel('gemini-2.0-flash-exp')
-else:
-    gemini_model = None
+# Modelo de Gemini: se configura en el primer uso (get_gemini_model)
+_GEMINI_MODEL = None
 
 # ---- Logging ----
 logging.basicConfig(level=logging.INFO)
@@ -33,6 +40,16 @@ logger = logging.getLogger(__name__)
 _TAGS_CACHE = None
 _CONFIG_CACHE = {}
 
+def get_gemini_model():
+    """Importa y configura Gemini la primera vez que se necesita."""
+    global _GEMINI_MODEL
+    if _GEMINI_MODEL is None and GEMINI_API_KEY:
+        import google.generativeai as genai
+        genai.configure(api_key=GEMINI_API_KEY)
+        # Usar gemini-2.0-flash-exp si está disponible, o fallback a 1.5
+        _GEMINI_MODEL = genai.GenerativeModel('gemini-2.0-flash-exp')
+    return _GEMINI_MODEL
+
 @dataclass
 class CaptionResult:
     """Resultado de la generación de caption y tags"""
@@ -227,33 +244,72 @@ def load_form_data(form_path: str) -> Dict:
         return {}
 
 def call_gemini_api(prompt: str) -> Optional[str]:
-    """Llama a la API de Gemini para generar caption"""
+    """Llama a la API de Gemini para generar caption.
+
+    Pasa por el limitador y el circuit breaker compartidos (gemini_guard): con el
+    circuito abierto devuelve None de inmediato para ir directo al fallback.
+    """
+    gemini_model = get_gemini_model()
     if not gemini_model:
         logger.error("❌ GEMINI_API_KEY no configurado")
         return None
-    
+
+    if not gemini_guard.breaker_allows():
+        logger.warning("⚡ Circuito de Gemini abierto, usando fallback sin llamar")
+        return None
+
     for attempt in range(MAX_RETRIES):
+        if not gemini_guard.acquire(timeout=GEMINI_RATE_WAIT):
+            logger.warning("⏳ Sin cupo en el limitador de Gemini, usando fallback")
+            return None
+
+        started = time.monotonic()
         try:
             response = gemini_model.generate_content(prompt)
             content = response.text
-            
+            latency_ms = (time.monotonic() - started) * 1000
+
             if content:
                 content = content.strip()
-                logger.info("✅ Respuesta exitosa de Gemini API")
+                usage = getattr(response, "usage_metadata", None)
+                gemini_guard.record_success(
+                    latency_ms,
+                    getattr(usage, "prompt_token_count", None),
+                    getattr(usage, "candidates_token_count", None),
+                )
+                logger.info(f"✅ Respuesta exitosa de Gemini API ({latency_ms:.0f} ms)")
                 return content
-                    
+            opened = gemini_guard.record_failure(latency_ms, "respuesta vacía")
+
         except Exception as e:
+            latency_ms = (time.monotonic() - started) * 1000
             logger.error(f"⚠️ Error llamando a Gemini (intento {attempt + 1}): {e}")
-            if "429" in str(e):
-                wait_time = 2 ** attempt
-                logger.info(f"⏳ Esperando {wait_time}s por cuota...")
-                time.sleep(wait_time)
-        
-        if attempt < MAX_RETRIES - 1:
-            time.sleep(1)
-    
+            # El backoff por 429 lo aplica el bucket compartido (se vacía para todos)
+            opened = gemini_guard.record_failure(latency_ms, str(e), rate_limited="429" in str(e))
+
+        if opened:
+            logger.warning("⚡ Circuito de Gemini abierto tras fallos repetidos")
+            return None
+
     return None
 
+def select_caption_engine(model_config: Dict) -> str:
+    """Decide qué motor usar para este modelo: "gemini" o "local"."""
+    engine = CAPTION_ENGINE or str(model_config.get("caption_engine", "auto")).strip().lower()
+    if engine == "local":
+        return "local"
+    if engine == "auto":
+        if not GEMINI_API_KEY:
+            return "local"
+        try:
+            if gemini_guard.latency_pressure():
+                logger.info("⚡ Gemini bajo presión de latencia, usando motor local")
+                return "local"
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudo leer el estado de Gemini: {e}")
+    return "gemini"
+
+@profiling.profiled("generate_caption_and_tags")
 def generate_caption_and_tags(modelo: str, form_path: str) -> CaptionResult:
     """Función principal que genera caption y tags usando la nueva lógica"""
     try:
@@ -276,6 +332,11 @@ def generate_caption_and_tags(modelo: str, form_path: str) -> CaptionResult:
         que_vendes = accion if isinstance(accion, list) else [accion] if accion else []
         outfit_norm = outfit if isinstance(outfit, list) else [outfit] if outfit else []
         
+        if select_caption_engine(model_config) == "local":
+            caption = generate_local_caption(modelo, que_vendes, outfit_norm, metadata, smart_tags)
+            logger.info(f"📝 Caption local: {caption}")
+            return CaptionResult(caption, smart_tags, True)
+        
         # Prompt Optimizado
         prompt = f"""
 You are an expert social media manager for adult content creators.
@@ -303,28 +364,12 @@ EXAMPLES:
         
         if ai_caption:
             caption = ai_caption
+            remember_caption(modelo, caption)
             logger.info(f"📝 Caption Gemini: {caption}")
         else:
-            # Fallback mejorado: caption genérico contextual
-            logger.warning("⚠️ Gemini falló, usando caption genérico")
-            
-            # Diccionario de fallbacks por foco principal
-            fallbacks = {
-                "culo": "Showing off my curves. Do you like what you see?",
-                "tetas": "Playing with my boobs just for you. Join me.",
-                "pies": "Worship my feet. I know you want to.",
-                "cara": "Look into my eyes and tell me what you want.",
-                "vagina": "I'm so wet for you. Come inside.",
-                "cuerpo completo": "My full body is waiting for you.",
-                "desnuda": "Completely naked and ready. Don't miss out."
-            }
-            
-            # Buscar el primer match
-            caption = "Exclusive content just for you. Link in bio."
-            for key, text in fallbacks.items():
-                if any(key in x.lower() for x in que_vendes + outfit_norm):
-                    caption = text
-                    break
+            # Fallback: motor local (variado y sin repetir captions recientes)
+            logger.warning("⚠️ Gemini falló, usando motor local de captions")
+            caption = generate_local_caption(modelo, que_vendes, outfit_norm, metadata, smart_tags)
         
         return CaptionResult(caption, smart_tags, True)
         
@@ -345,6 +390,44 @@ def persist_caption_result(form_path: str, caption: str, tags: List[str]) -> boo
         logger.error(f"❌ Error guardando caption/tags en {form_path}: {err}")
         return False
 
+def _caption_one(modelo: str, meta_path: Path) -> Tuple[str, Optional[str], List[str], Optional[str]]:
+    """Genera (o reutiliza) caption y tags de un sidecar."""
+    data = load_form_data(str(meta_path))
+    video_filename = data.get("video_filename") or meta_path.with_suffix(".mp4").name
+    if data.get("caption") and data.get("tags"):
+        # Ya generado en una ejecución anterior: no gastar otra llamada a Gemini
+        return video_filename, data["caption"], list(data["tags"]), None
+
+    result = generate_caption_and_tags(modelo, str(meta_path))
+    if not result.success:
+        return video_filename, None, [], result.error
+    persist_caption_result(str(meta_path), result.caption, result.tags)
+    return video_filename, result.caption, result.tags, None
+
+
+def caption_many(modelo: str, meta_paths: List[Path], workers: int = 8) -> Dict[str, Tuple[str, List[str]]]:
+    """
+    Genera captions/tags concurrentemente.
+
+    Returns:
+        Dict {video_filename: (caption, tags)} solo con los que tuvieron éxito
+    """
+    results: Dict[str, Tuple[str, List[str]]] = {}
+    total = len(meta_paths)
+    if not total:
+        return results
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = [pool.submit(_caption_one, modelo, p) for p in meta_paths]
+        for i, future in enumerate(as_completed(futures), start=1):
+            video_filename, caption, tags, error = future.result()
+            if error:
+                print(f"   [{i}/{total}] ❌ {video_filename}: {error}")
+                continue
+            results[video_filename] = (caption, tags)
+            print(f"   [{i}/{total}] 📝 {video_filename}")
+    return results
+
 def generate_and_update(modelo: str, form_path: str):
     """Función pública principal que usa el nuevo sistema inteligente de tags"""
     try:
@@ -370,40 +453,29 @@ def generate_and_update(modelo: str, form_path: str):
         if success:
             logger.info("✅ Backup local guardado")
         
-        # Insertar en Supabase
+        # Planificar y escribir todas las plataformas con su horario en una sola petición
         try:
-            from database.supabase_client import get_model_config, insert_schedule, ensure_model_exists
+            from database.supabase_client import ensure_model_exists, upsert_schedules
+            try:
+                from .scheduler import plan_many, schedule_rows
+            except ImportError:
+                from scheduler import plan_many, schedule_rows
             
-            # Asegurar que el modelo existe en Supabase
-            ensure_model_exists(modelo)
-            
-            # Obtener plataformas del modelo
-            config = get_model_config(modelo)
-            if not config:
-                logger.warning(f"⚠️ No se encontró configuración para {modelo} en Supabase")
+            # Asegurar que el modelo existe en Supabase (registro en memoria)
+            if not ensure_model_exists(modelo):
+                logger.error(f"❌ No se pudo asegurar el modelo {modelo} en Supabase")
                 return
             
-            # Parsear plataformas
-            plataformas = [p.strip() for p in config['plataformas'].split(',')]
-            
-            # Convertir tags de lista a string separado por comas
-            tags_str = ','.join(result.tags)
+            slots = plan_many(modelo, [video_filename])[video_filename]
+            if isinstance(slots, Exception):
+                logger.warning(f"⚠️ No se pudo planificar {video_filename}: {slots}")
+                return
             
-            # Insertar un schedule por cada plataforma
-            for plataforma in plataformas:
-                inserted = insert_schedule(
-                    modelo=modelo,
-                    video=video_filename,
-                    caption=result.caption,
-                    tags=tags_str,
-                    plataforma=plataforma,
-                    estado='pendiente',
-                    scheduled_time=''  # Se llenará después por scheduler
-                )
-                if inserted:
-                    logger.info(f"✅ Schedule insertado en Supabase: {modelo} -> {plataforma}")
-                else:
-                    logger.error(f"❌ Error insertando schedule: {modelo} -> {plataforma}")
+            rows = schedule_rows(video_filename, result.caption, result.tags, slots)
+            if upsert_schedules(modelo, rows):
+                logger.info(f"✅ {len(rows)} schedules escritos en Supabase: {modelo} -> {video_filename}")
+            else:
+                logger.error(f"❌ Error escribiendo schedules: {modelo} -> {video_filename}")
                     
         except ImportError:
             logger.warning("⚠️ supabase_client no disponible, saltando inserción en Supabase")
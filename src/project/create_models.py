@@ -13,6 +13,11 @@ import os
 from pathlib import Path
 from typing import Any, Dict, Optional
 
+try:
+    import fcntl
+except ImportError:  # Windows: sin bloqueo entre procesos
+    fcntl = None
+
 BASE_DIR = Path(__file__).resolve().parents[2]
 MODELS_DIR = BASE_DIR / "modelos"
 QUEUE_DIR = BASE_DIR / "supabase_queue"
@@ -82,13 +87,33 @@ def _ensure_queue_dir() -> None:
     QUEUE_DIR.mkdir(parents=True, exist_ok=True)
 
 
+def open_locked_queue(queue_file: Path, mode: str = "a"):
+    """
+    Abre el archivo de cola con bloqueo exclusivo (flock).
+
+    El drenador (outbox.py) compacta la cola reemplazando el archivo; si al
+    obtener el bloqueo el archivo abierto ya no es el de la ruta, se reabre.
+    """
+    while True:
+        handler = queue_file.open(mode, encoding="utf-8")
+        if fcntl is None:
+            return handler
+        fcntl.flock(handler.fileno(), fcntl.LOCK_EX)
+        try:
+            if os.fstat(handler.fileno()).st_ino == os.stat(queue_file).st_ino:
+                return handler
+        except FileNotFoundError:
+            pass
+        handler.close()
+
+
 def queue_supabase_payload(event: str, payload: Dict[str, Any]) -> Path:
-    """Guarda un payload en formato JSONL para ser enviado vía MCP."""
+    """Guarda un payload en formato JSONL; lo envía a Supabase el drenador (outbox.py)."""
     _ensure_queue_dir()
     queue_file = QUEUE_DIR / f"{event}.jsonl"
-    with queue_file.open("a", encoding="utf-8") as handler:
-        handler.write(json.dumps(payload, ensure_ascii=False))
-        handler.write("\n")
+    line = json.dumps(payload, ensure_ascii=False) + "\n"
+    with open_locked_queue(queue_file) as handler:
+        handler.write(line)
     return queue_file
 
 
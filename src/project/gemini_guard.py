@@ -0,0 +1,293 @@
+"""Limitador de tasa y circuit breaker compartidos para Gemini.
+
+El estado vive en un archivo SQLite (``.runtime/gemini_guard.sqlite3`` por
+defecto), así que el bot, el importador masivo y cualquier otro proceso en la
+misma máquina comparten:
+
+- Un token bucket (``GEMINI_RATE_PER_MIN`` peticiones/minuto, ráfaga ``GEMINI_BURST``).
+- Un circuit breaker que se abre tras ``GEMINI_BREAKER_FAILURES`` fallos seguidos
+  y deja pasar una sola llamada de prueba cada ``GEMINI_BREAKER_COOLDOWN`` segundos.
+- Un registro por llamada con latencia y tokens consumidos.
+
+Uso:
+    python src/project/gemini_guard.py stats [--minutes 60]
+    python src/project/gemini_guard.py reset
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+BASE_DIR = Path(__file__).resolve().parents[2]
+DB_PATH = Path(os.getenv("GEMINI_GUARD_DB", str(BASE_DIR / ".runtime" / "gemini_guard.sqlite3")))
+
+RATE_PER_MIN = float(os.getenv("GEMINI_RATE_PER_MIN", "15"))
+BURST = float(os.getenv("GEMINI_BURST", "5"))
+BREAKER_FAILURES = int(os.getenv("GEMINI_BREAKER_FAILURES", "5"))
+BREAKER_COOLDOWN = float(os.getenv("GEMINI_BREAKER_COOLDOWN", "60"))
+LATENCY_BUDGET_MS = float(os.getenv("GEMINI_LATENCY_BUDGET_MS", "8000"))
+STATS_RETENTION_DAYS = 7
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS bucket (
+  id INTEGER PRIMARY KEY CHECK (id = 1),
+  tokens REAL NOT NULL,
+  updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS breaker (
+  id INTEGER PRIMARY KEY CHECK (id = 1),
+  state TEXT NOT NULL,
+  failures INTEGER NOT NULL,
+  opened_at REAL NOT NULL,
+  probe_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS calls (
+  ts REAL NOT NULL,
+  latency_ms REAL NOT NULL,
+  prompt_tokens INTEGER,
+  output_tokens INTEGER,
+  ok INTEGER NOT NULL,
+  error TEXT
+);
+CREATE INDEX IF NOT EXISTS calls_ts ON calls (ts);
+"""
+
+
+def _connect() -> sqlite3.Connection:
+    """Abre una conexión nueva (una por llamada: segura entre hilos y procesos)."""
+    DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(DB_PATH), timeout=10, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(_SCHEMA)
+    now = time.time()
+    conn.execute("INSERT OR IGNORE INTO bucket (id, tokens, updated_at) VALUES (1, ?, ?)", (BURST, now))
+    conn.execute(
+        "INSERT OR IGNORE INTO breaker (id, state, failures, opened_at, probe_at) VALUES (1, 'closed', 0, 0, 0)"
+    )
+    return conn
+
+
+def acquire(timeout: float = 30.0) -> bool:
+    """
+    Toma un token del bucket compartido, esperando hasta `timeout` segundos.
+
+    Returns:
+        True si se obtuvo el token, False si se agotó la espera
+    """
+    rate_per_sec = RATE_PER_MIN / 60.0
+    deadline = time.monotonic() + timeout
+    while True:
+        conn = _connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            tokens, updated_at = conn.execute("SELECT tokens, updated_at FROM bucket WHERE id = 1").fetchone()
+            now = time.time()
+            tokens = min(BURST, tokens + max(0.0, now - updated_at) * rate_per_sec)
+            if tokens >= 1:
+                conn.execute("UPDATE bucket SET tokens = ?, updated_at = ? WHERE id = 1", (tokens - 1, now))
+                conn.execute("COMMIT")
+                return True
+            conn.execute("UPDATE bucket SET tokens = ?, updated_at = ? WHERE id = 1", (tokens, now))
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+        wait = (1 - tokens) / rate_per_sec if rate_per_sec > 0 else timeout
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        # Jitter para que varios procesos no despierten a la vez
+        time.sleep(min(remaining, wait) + random.uniform(0, 0.05))
+
+
+def breaker_allows() -> bool:
+    """
+    Indica si se puede llamar a Gemini según el circuit breaker.
+
+    - closed: siempre.
+    - open: no, hasta que pase el cooldown; entonces pasa a half_open y deja
+      pasar exactamente una llamada de prueba.
+    - half_open: no mientras la prueba esté en curso (o hasta otro cooldown).
+    """
+    conn = _connect()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        state, opened_at, probe_at = conn.execute(
+            "SELECT state, opened_at, probe_at FROM breaker WHERE id = 1"
+        ).fetchone()
+        now = time.time()
+        if state == "closed":
+            conn.execute("COMMIT")
+            return True
+        last = probe_at if state == "half_open" else opened_at
+        if now - last >= BREAKER_COOLDOWN:
+            conn.execute("UPDATE breaker SET state = 'half_open', probe_at = ? WHERE id = 1", (now,))
+            conn.execute("COMMIT")
+            return True
+        conn.execute("COMMIT")
+        return False
+    finally:
+        conn.close()
+
+
+def probe_due() -> bool:
+    """
+    True si el circuito no está cerrado pero ya pasó el cooldown, es decir, si
+    `breaker_allows` dejaría pasar ahora la llamada de prueba. Solo lee el estado.
+    """
+    conn = _connect()
+    try:
+        state, opened_at, probe_at = conn.execute(
+            "SELECT state, opened_at, probe_at FROM breaker WHERE id = 1"
+        ).fetchone()
+    finally:
+        conn.close()
+    if state == "closed":
+        return False
+    last = probe_at if state == "half_open" else opened_at
+    return time.time() - last >= BREAKER_COOLDOWN
+
+
+def _record_call(conn: sqlite3.Connection, latency_ms: float, prompt_tokens: Optional[int],
+                 output_tokens: Optional[int], ok: bool, error: Optional[str]) -> None:
+    now = time.time()
+    conn.execute(
+        "INSERT INTO calls (ts, latency_ms, prompt_tokens, output_tokens, ok, error) VALUES (?, ?, ?, ?, ?, ?)",
+        (now, latency_ms, prompt_tokens, output_tokens, int(ok), (error or "")[:300] or None),
+    )
+    if random.random() < 0.01:
+        conn.execute("DELETE FROM calls WHERE ts < ?", (now - STATS_RETENTION_DAYS * 86400,))
+
+
+def record_success(latency_ms: float, prompt_tokens: Optional[int] = None,
+                   output_tokens: Optional[int] = None) -> None:
+    """Registra una llamada exitosa y cierra el circuito."""
+    conn = _connect()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        _record_call(conn, latency_ms, prompt_tokens, output_tokens, True, None)
+        conn.execute("UPDATE breaker SET state = 'closed', failures = 0 WHERE id = 1")
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+
+
+def record_failure(latency_ms: float, error: str, rate_limited: bool = False) -> bool:
+    """
+    Registra un fallo. Un 429 vacía el bucket para que todos los procesos frenen.
+
+    Returns:
+        True si el circuito quedó abierto
+    """
+    conn = _connect()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        _record_call(conn, latency_ms, None, None, False, error)
+        if rate_limited:
+            conn.execute("UPDATE bucket SET tokens = MIN(tokens, 0), updated_at = ? WHERE id = 1", (time.time(),))
+        state, failures = conn.execute("SELECT state, failures FROM breaker WHERE id = 1").fetchone()
+        failures += 1
+        opened = state == "half_open" or failures >= BREAKER_FAILURES
+        if opened:
+            conn.execute(
+                "UPDATE breaker SET state = 'open', failures = ?, opened_at = ? WHERE id = 1",
+                (failures, time.time()),
+            )
+        else:
+            conn.execute("UPDATE breaker SET failures = ? WHERE id = 1", (failures,))
+        conn.execute("COMMIT")
+        return opened
+    finally:
+        conn.close()
+
+
+def _percentile(values, pct: float) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    k = min(len(values) - 1, max(0, int(round(pct / 100.0 * (len(values) - 1)))))
+    return round(values[k], 1)
+
+
+def get_stats(minutes: int = 60) -> Dict:
+    """Resumen de las llamadas de los últimos `minutes` minutos y estado del circuito."""
+    conn = _connect()
+    try:
+        since = time.time() - minutes * 60
+        rows = conn.execute(
+            "SELECT latency_ms, prompt_tokens, output_tokens, ok FROM calls WHERE ts >= ?", (since,)
+        ).fetchall()
+        state, failures, opened_at = conn.execute(
+            "SELECT state, failures, opened_at FROM breaker WHERE id = 1"
+        ).fetchone()
+        tokens = conn.execute("SELECT tokens FROM bucket WHERE id = 1").fetchone()[0]
+    finally:
+        conn.close()
+
+    ok_latencies = [r[0] for r in rows if r[3]]
+    return {
+        "window_minutes": minutes,
+        "calls": len(rows),
+        "ok": len(ok_latencies),
+        "failed": len(rows) - len(ok_latencies),
+        "latency_ms_p50": _percentile(ok_latencies, 50),
+        "latency_ms_p95": _percentile(ok_latencies, 95),
+        "prompt_tokens": sum(r[1] or 0 for r in rows),
+        "output_tokens": sum(r[2] or 0 for r in rows),
+        "breaker_state": state,
+        "consecutive_failures": failures,
+        "breaker_opened_at": opened_at or None,
+        "bucket_tokens": round(tokens, 2),
+    }
+
+
+def latency_pressure(minutes: int = 5) -> bool:
+    """
+    True si conviene no esperar a Gemini: circuito no cerrado o p95 reciente
+    por encima de GEMINI_LATENCY_BUDGET_MS.
+
+    Con el cooldown cumplido devuelve False aunque el circuito siga abierto:
+    si no, en modo auto nadie llamaría a Gemini y nunca llegaría la prueba
+    que lo vuelve a cerrar.
+    """
+    stats = get_stats(minutes)
+    if stats["breaker_state"] != "closed":
+        return not probe_due()
+    p95 = stats["latency_ms_p95"]
+    return p95 is not None and p95 > LATENCY_BUDGET_MS
+
+
+def reset() -> None:
+    """Cierra el circuito y rellena el bucket (uso manual tras un incidente)."""
+    conn = _connect()
+    try:
+        conn.execute("UPDATE breaker SET state = 'closed', failures = 0, opened_at = 0, probe_at = 0 WHERE id = 1")
+        conn.execute("UPDATE bucket SET tokens = ?, updated_at = ? WHERE id = 1", (BURST, time.time()))
+    finally:
+        conn.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Estado del limitador/circuit breaker de Gemini.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    stats_parser = sub.add_parser("stats", help="Muestra latencias, tokens y estado del circuito.")
+    stats_parser.add_argument("--minutes", type=int, default=60)
+    sub.add_parser("reset", help="Cierra el circuito y rellena el bucket.")
+    args = parser.parse_args()
+
+    if args.cmd == "stats":
+        print(json.dumps(get_stats(args.minutes), indent=2, ensure_ascii=False))
+    elif args.cmd == "reset":
+        reset()
+        print("✅ Circuito cerrado y bucket rellenado")
+
+
+if __name__ == "__main__":
+    main()
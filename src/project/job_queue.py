@@ -0,0 +1,275 @@
+"""Cola persistente de trabajos en segundo plano (SQLite).
+
+La usa el bot central para sacar el procesamiento de videos (metadata,
+caption, planificación) de los handlers de Telegram. Los trabajos sobreviven a
+reinicios y se reanudan desde la última etapa completada.
+
+Cada trabajo en ``procesando`` tiene dueño (``WORKER_ID``), un lease de
+``JOB_LEASE_SECONDS`` que el dueño renueva con ``heartbeat`` y un token de
+reclamo (``job["claim"]``) distinto en cada reclamo. Solo un trabajo con el
+lease vencido (su proceso murió o se colgó) vuelve a reclamarse, así que
+varias réplicas del bot pueden compartir la cola. ``set_stage``, ``complete``
+y ``fail`` exigen el token: las escrituras de un reclamo anterior, aunque sea
+de otro worker del mismo proceso, dejan de aplicarse.
+
+Estados: pendiente → procesando → hecho | fallido
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import secrets
+import socket
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+BASE_DIR = Path(__file__).resolve().parents[2]
+DB_PATH = Path(os.getenv("JOB_QUEUE_DB", str(BASE_DIR / ".runtime" / "jobs.sqlite3")))
+MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+RETENTION_DAYS = 7
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "120"))
+# Dueño de los trabajos que reclama este proceso
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{secrets.token_hex(3)}"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  kind TEXT NOT NULL,
+  payload TEXT NOT NULL,
+  estado TEXT NOT NULL DEFAULT 'pendiente',
+  stage TEXT NOT NULL DEFAULT '',
+  attempts INTEGER NOT NULL DEFAULT 0,
+  error TEXT,
+  created_at REAL NOT NULL,
+  updated_at REAL NOT NULL,
+  owner TEXT,
+  lease_until REAL,
+  claim TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_estado ON jobs (estado, id);
+"""
+_schema_ready = False
+
+
+def _connect() -> sqlite3.Connection:
+    DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(DB_PATH), timeout=10, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    global _schema_ready
+    if not _schema_ready:
+        conn.executescript(_SCHEMA)
+        # Colas creadas antes de los leases
+        columnas = {r[1] for r in conn.execute("PRAGMA table_info(jobs)")}
+        for columna, tipo in (("owner", "TEXT"), ("lease_until", "REAL"), ("claim", "TEXT")):
+            if columna not in columnas:
+                conn.execute(f"ALTER TABLE jobs ADD COLUMN {columna} {tipo}")
+        _schema_ready = True
+    return conn
+
+
+def _row_to_job(row: sqlite3.Row) -> Dict:
+    job = dict(row)
+    job["payload"] = json.loads(job["payload"])
+    return job
+
+
+def enqueue(kind: str, payload: Dict) -> int:
+    """Agrega un trabajo a la cola y devuelve su id."""
+    conn = _connect()
+    try:
+        now = time.time()
+        cur = conn.execute(
+            "INSERT INTO jobs (kind, payload, created_at, updated_at) VALUES (?, ?, ?, ?)",
+            (kind, json.dumps(payload, ensure_ascii=False), now, now),
+        )
+        return cur.lastrowid
+    finally:
+        conn.close()
+
+
+# Reclamable: pendiente, o en proceso con el lease vencido (o sin lease, de antes de los leases)
+_CLAIMABLE = "(estado = 'pendiente' OR (estado = 'procesando' AND (lease_until IS NULL OR lease_until < ?)))"
+
+
+def claim_next(kind: Optional[str] = None, owner: str = WORKER_ID) -> Optional[Dict]:
+    """
+    Toma atómicamente el trabajo reclamable más antiguo (seguro entre procesos)
+    con un lease de JOB_LEASE_SECONDS a nombre de `owner`.
+
+    Returns:
+        El trabajo, con ``claim``: el token que piden las escrituras de este reclamo
+    """
+    conn = _connect()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        now = time.time()
+        if kind:
+            row = conn.execute(
+                f"SELECT * FROM jobs WHERE {_CLAIMABLE} AND kind = ? ORDER BY id LIMIT 1", (now, kind)
+            ).fetchone()
+        else:
+            row = conn.execute(f"SELECT * FROM jobs WHERE {_CLAIMABLE} ORDER BY id LIMIT 1", (now,)).fetchone()
+        if row is None:
+            conn.execute("COMMIT")
+            return None
+        claim = secrets.token_hex(8)
+        conn.execute(
+            "UPDATE jobs SET estado = 'procesando', attempts = attempts + 1, owner = ?, lease_until = ?, "
+            "claim = ?, updated_at = ? WHERE id = ?",
+            (owner, now + JOB_LEASE_SECONDS, claim, now, row["id"]),
+        )
+        conn.execute("COMMIT")
+        job = _row_to_job(row)
+        job["estado"] = "procesando"
+        job["attempts"] += 1
+        job["owner"] = owner
+        job["claim"] = claim
+        return job
+    finally:
+        conn.close()
+
+
+# Escrituras de un reclamo: solo mientras siga en curso y nadie lo haya vuelto a reclamar
+_FENCE = "id = ? AND claim = ? AND estado = 'procesando'"
+
+
+def heartbeat(job_id: int, claim: str) -> bool:
+    """
+    Renueva el lease del trabajo.
+
+    Returns:
+        False si el reclamo `claim` ya no está vigente (lease vencido y reclamado por otro)
+    """
+    conn = _connect()
+    try:
+        cur = conn.execute(
+            f"UPDATE jobs SET lease_until = ? WHERE {_FENCE}",
+            (time.time() + JOB_LEASE_SECONDS, job_id, claim),
+        )
+        return cur.rowcount == 1
+    finally:
+        conn.close()
+
+
+def set_stage(job_id: int, stage: str, payload: Optional[Dict] = None, *, claim: str) -> bool:
+    """
+    Marca la última etapa completada (y opcionalmente actualiza el payload).
+
+    Returns:
+        False si el reclamo `claim` ya no está vigente (no se escribe nada)
+    """
+    conn = _connect()
+    try:
+        now = time.time()
+        if payload is None:
+            cur = conn.execute(
+                f"UPDATE jobs SET stage = ?, lease_until = ?, updated_at = ? WHERE {_FENCE}",
+                (stage, now + JOB_LEASE_SECONDS, now, job_id, claim),
+            )
+        else:
+            cur = conn.execute(
+                f"UPDATE jobs SET stage = ?, payload = ?, lease_until = ?, updated_at = ? WHERE {_FENCE}",
+                (stage, json.dumps(payload, ensure_ascii=False), now + JOB_LEASE_SECONDS, now, job_id, claim),
+            )
+        return cur.rowcount == 1
+    finally:
+        conn.close()
+
+
+def complete(job_id: int, *, claim: str) -> bool:
+    conn = _connect()
+    try:
+        cur = conn.execute(
+            f"UPDATE jobs SET estado = 'hecho', error = NULL, lease_until = NULL, updated_at = ? WHERE {_FENCE}",
+            (time.time(), job_id, claim),
+        )
+        return cur.rowcount == 1
+    finally:
+        conn.close()
+
+
+def fail(job_id: int, error: str, retry: bool = True, *, claim: str) -> bool:
+    """
+    Registra un error. Si quedan intentos y `retry`, vuelve a 'pendiente'.
+
+    Returns:
+        True si el trabajo se reintentará (False también si el reclamo ya no está vigente)
+    """
+    conn = _connect()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute(f"SELECT attempts FROM jobs WHERE {_FENCE}", (job_id, claim)).fetchone()
+        if row is None:
+            conn.execute("COMMIT")
+            return False
+        will_retry = retry and row[0] < MAX_ATTEMPTS
+        conn.execute(
+            "UPDATE jobs SET estado = ?, error = ?, lease_until = NULL, updated_at = ? WHERE id = ?",
+            ("pendiente" if will_retry else "fallido", error[:1000], time.time(), job_id),
+        )
+        conn.execute("COMMIT")
+        return will_retry
+    finally:
+        conn.close()
+
+
+def release(owner: str = WORKER_ID) -> int:
+    """
+    Devuelve a 'pendiente' los trabajos en curso de `owner` (apagado ordenado):
+    otra réplica los retoma sin esperar a que venza el lease.
+    """
+    conn = _connect()
+    try:
+        cur = conn.execute(
+            "UPDATE jobs SET estado = 'pendiente', lease_until = NULL, updated_at = ? "
+            "WHERE estado = 'procesando' AND owner = ?",
+            (time.time(), owner),
+        )
+        return cur.rowcount
+    finally:
+        conn.close()
+
+
+def requeue_expired() -> int:
+    """
+    Devuelve a 'pendiente' los trabajos en 'procesando' cuyo lease venció (su
+    proceso murió) y purga los terminados antiguos. Los de réplicas vivas no
+    se tocan.
+
+    Returns:
+        Número de trabajos reencolados
+    """
+    conn = _connect()
+    try:
+        now = time.time()
+        cur = conn.execute(
+            "UPDATE jobs SET estado = 'pendiente', updated_at = ? "
+            "WHERE estado = 'procesando' AND (lease_until IS NULL OR lease_until < ?)",
+            (now, now),
+        )
+        conn.execute(
+            "DELETE FROM jobs WHERE estado IN ('hecho', 'fallido') AND updated_at < ?",
+            (now - RETENTION_DAYS * 86400,),
+        )
+        return cur.rowcount
+    finally:
+        conn.close()
+
+
+def list_jobs(estado: Optional[str] = None, limit: int = 50) -> List[Dict]:
+    """Lista trabajos recientes (para depuración)."""
+    conn = _connect()
+    try:
+        if estado:
+            rows = conn.execute(
+                "SELECT * FROM jobs WHERE estado = ? ORDER BY id DESC LIMIT ?", (estado, limit)
+            ).fetchall()
+        else:
+            rows = conn.execute("SELECT * FROM jobs ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+        return [_row_to_job(r) for r in rows]
+    finally:
+        conn.close()
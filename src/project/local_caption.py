@@ -0,0 +1,215 @@
+"""Generador local de captions (sin red).
+
+Gramática de plantillas que combina foco (que_vendes), outfit, rasgos del
+modelo (metadata de config.json) y los tags elegidos de tags_disponibles.json.
+Cumple las mismas reglas que el prompt de Gemini: una frase en inglés, máximo
+100 caracteres, sin hashtags ni emojis y siempre con un call to action.
+
+Cada modelo guarda un historial (``modelos/<modelo>/.caption_history.json``)
+para no repetir captions recientes.
+"""
+
+from __future__ import annotations
+
+import json
+import random
+import re
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+BASE_DIR = Path(__file__).resolve().parents[2]
+MODELS_DIR = BASE_DIR / "modelos"
+HISTORY_FILENAME = ".caption_history.json"
+HISTORY_SIZE = 200
+MAX_CHARS = 100
+MAX_ATTEMPTS = 40
+
+# ---- Gramática ----
+FOCUS_ALIASES = {
+    "culo": "ass", "tetas": "boobs", "pies": "feet", "cara": "face",
+    "vagina": "pussy", "cuerpo completo": "fullbody",
+}
+
+FOCUS_NOUNS = {
+    "ass": ["my ass", "this booty", "my curves", "my round ass", "this peach"],
+    "boobs": ["my boobs", "these tits", "my chest", "my girls", "these curves"],
+    "feet": ["my feet", "my soles", "these toes", "my pretty feet", "my little toes"],
+    "face": ["my face", "my lips", "my eyes", "this smile", "my pretty face"],
+    "pussy": ["my pussy", "my sweet spot", "what's between my legs", "my little secret"],
+    "fullbody": ["my body", "every inch of me", "all of me", "this body", "my whole body"],
+}
+
+# Tags de tags_disponibles.json que funcionan como sustantivo en una frase
+TAG_NOUNS = {
+    "#BubbleButt": "my bubble butt", "#JuicyAss": "my juicy ass", "#Booty": "this booty",
+    "#PerkyBoobs": "my perky boobs", "#Busty": "my big boobs", "#Soles": "my soles",
+    "#Toes": "my toes", "#PrettyFace": "my pretty face", "#Smile": "this smile",
+    "#Curvy": "my curves", "#Petite": "my petite body", "#Stockings": "my stockings",
+    "#Legs": "my legs", "#Underboob": "this underboob", "#Thong": "my thong",
+}
+
+OUTFIT_PHRASES = {
+    "lenceria": ["in my lingerie", "in lace", "in my sexiest lingerie", "in see-through lace"],
+    "tanga": ["in a tiny thong", "in just a thong", "in my favorite thong"],
+    "topless": ["topless", "with no bra", "with nothing on top"],
+    "tacones": ["in high heels", "in my heels", "in stilettos"],
+    "tenis": ["in my sneakers", "in socks and sneakers", "in my gym shoes"],
+    "falda": ["in a mini skirt", "in my short skirt", "under this skirt"],
+    "desnuda": ["completely naked", "with nothing on", "totally bare"],
+}
+
+TRAIT_WORDS = {
+    "Categoria": {"teen": ["your cute girl next door", "your naughty college girl"],
+                  "milf": ["your favorite milf", "your hot stepmom"]},
+    "Tipo de cuerpo": {"delgada": ["petite", "slim"], "curvy": ["curvy", "thick"]},
+    "Color de cabello": {"claro": ["blonde"], "oscuro": ["brunette"], "rojo": ["redhead"]},
+}
+
+VERBS = [
+    "Showing off", "Teasing you with", "Playing with", "Look at",
+    "All about", "Just for you:", "Can't stop touching", "Spoiling you with",
+]
+
+QUESTIONS = [
+    "Do you like {noun} {outfit}?", "Want to see {noun} {outfit}?",
+    "Ready for {noun} {outfit}?", "Can you handle {noun} {outfit}?",
+]
+
+INTROS = [
+    "{trait} here.", "Your {adj} girl is back.", "{trait} is waiting.",
+    "Just your {adj} girl.",
+]
+
+CTAS = [
+    "Link in bio.", "See more inside.", "I'm live now.", "Join me.",
+    "Come play with me.", "Full video on my profile.", "Watch the rest inside.",
+    "Come find me.", "Don't miss it.", "Unlock the rest.", "DM me.",
+    "Subscribe for more.", "Come see it all.",
+]
+
+_EMOJI_RE = re.compile("[\U0001F000-\U0001FAFF☀-➿]")
+
+# ---- Historial por modelo ----
+_HISTORY: Dict[str, List[str]] = {}
+_HISTORY_LOCK = threading.Lock()
+
+
+def _history_path(modelo: str) -> Path:
+    return MODELS_DIR / modelo / HISTORY_FILENAME
+
+
+def _normalize(caption: str) -> str:
+    return re.sub(r"[^a-z0-9 ]", "", caption.lower()).strip()
+
+
+def _load_history(modelo: str) -> List[str]:
+    if modelo not in _HISTORY:
+        try:
+            _HISTORY[modelo] = json.loads(_history_path(modelo).read_text(encoding="utf-8"))
+        except (FileNotFoundError, json.JSONDecodeError):
+            _HISTORY[modelo] = []
+    return _HISTORY[modelo]
+
+
+def remember_caption(modelo: str, caption: str) -> None:
+    """Agrega un caption (de cualquier motor) al historial del modelo."""
+    with _HISTORY_LOCK:
+        history = _load_history(modelo)
+        history.append(_normalize(caption))
+        del history[:-HISTORY_SIZE]
+        path = _history_path(modelo)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(history, ensure_ascii=False), encoding="utf-8")
+            tmp.replace(path)
+        except OSError:
+            pass  # El historial es una optimización; no debe tumbar la generación
+
+
+def is_valid_caption(caption: str) -> bool:
+    """Reglas del prompt: ≤100 caracteres, sin hashtags ni emojis."""
+    return 0 < len(caption) <= MAX_CHARS and "#" not in caption and not _EMOJI_RE.search(caption)
+
+
+def _as_list(value) -> List[str]:
+    if isinstance(value, list):
+        return value
+    return [value] if value else []
+
+
+def _trait_options(metadata: Dict) -> Dict[str, List[str]]:
+    opts: Dict[str, List[str]] = {"trait": [], "adj": []}
+    for field, mapping in TRAIT_WORDS.items():
+        words = mapping.get(str(metadata.get(field, "")).strip().lower(), [])
+        opts["trait" if field == "Categoria" else "adj"].extend(words)
+    return opts
+
+
+def _compose(rng: random.Random, nouns: List[str], outfits: List[str], traits: Dict[str, List[str]]) -> str:
+    noun = rng.choice(nouns)
+    outfit = rng.choice(outfits) if outfits else ""
+    cta = rng.choice(CTAS)
+    shape = rng.randrange(3)
+
+    if shape == 0:
+        body = f"{rng.choice(VERBS)} {noun} {outfit}".strip() + "."
+    elif shape == 1:
+        body = rng.choice(QUESTIONS).format(noun=noun, outfit=outfit).replace(" ?", "?")
+    else:
+        intro = rng.choice(INTROS)
+        trait = rng.choice(traits["trait"]) if traits["trait"] else "Your girl"
+        adj = rng.choice(traits["adj"]) if traits["adj"] else "favorite"
+        intro = intro.format(trait=trait, adj=adj)
+        body = f"{intro[0].upper()}{intro[1:]} {rng.choice(VERBS)} {noun} {outfit}".strip() + "."
+
+    caption = f"{body} {cta}"
+    caption = re.sub(r"\s+", " ", caption).strip()
+    return caption[0].upper() + caption[1:]
+
+
+def generate_local_caption(modelo: str, que_vendes, outfit, metadata: Optional[Dict] = None,
+                           tags: Optional[List[str]] = None, rng: Optional[random.Random] = None) -> str:
+    """
+    Genera un caption variado sin llamar a ninguna API.
+
+    Args:
+        modelo: Nombre del modelo (para el historial anti-repetición)
+        que_vendes: Foco(s) elegidos en el bot (ej: ["culo"])
+        outfit: Outfit(s) elegidos en el bot (ej: ["tanga"])
+        metadata: metadata de config.json del modelo
+        tags: Tags ya elegidos (se usan como sustantivos cuando encajan)
+    """
+    rng = rng or random.Random()
+    metadata = metadata or {}
+
+    nouns: List[str] = []
+    for item in _as_list(que_vendes):
+        focus_id = FOCUS_ALIASES.get(item.lower(), item.lower())
+        nouns.extend(FOCUS_NOUNS.get(focus_id, []))
+    nouns.extend(TAG_NOUNS[t] for t in (tags or []) if t in TAG_NOUNS)
+    if not nouns:
+        nouns = FOCUS_NOUNS["fullbody"]
+
+    outfits = [p for item in _as_list(outfit) for p in OUTFIT_PHRASES.get(item.lower(), [])]
+    traits = _trait_options(metadata)
+
+    with _HISTORY_LOCK:
+        seen = set(_load_history(modelo))
+
+    fallback = None
+    for _ in range(MAX_ATTEMPTS):
+        caption = _compose(rng, nouns, outfits, traits)
+        if not is_valid_caption(caption):
+            continue
+        if fallback is None:
+            fallback = caption
+        if _normalize(caption) not in seen:
+            remember_caption(modelo, caption)
+            return caption
+
+    # Todas las combinaciones cercanas ya se usaron: repetir la menos mala
+    caption = fallback or "Exclusive content just for you. Link in bio."
+    remember_caption(modelo, caption)
+    return caption
@@ -0,0 +1,248 @@
+"""Almacén de videos direccionado por contenido.
+
+Cada video se guarda una sola vez en ``modelos/.store/<aa>/<hash>.mp4`` (hash
+BLAKE2b del contenido) y las carpetas de los modelos tienen hardlinks a ese
+archivo, así que un reenvío idéntico no ocupa disco de nuevo.
+
+Un índice SQLite (``modelos/.store/index.sqlite3``) relaciona
+``(modelo, video) → hash`` y el ``file_unique_id`` de Telegram, para detectar
+duplicados antes de descargar (por id) o justo después (por hash), siempre
+antes de generar captions y planificar.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import shutil
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+BASE_DIR = Path(__file__).resolve().parents[2]
+MODELS_DIR = BASE_DIR / "modelos"
+STORE_DIR = MODELS_DIR / ".store"
+INDEX_PATH = STORE_DIR / "index.sqlite3"
+CHUNK_SIZE = 1024 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS videos (
+  modelo TEXT NOT NULL,
+  video TEXT NOT NULL,
+  hash TEXT NOT NULL,
+  size INTEGER NOT NULL,
+  file_unique_id TEXT,
+  created_at REAL NOT NULL,
+  PRIMARY KEY (modelo, video)
+);
+CREATE INDEX IF NOT EXISTS videos_hash ON videos (modelo, hash);
+CREATE INDEX IF NOT EXISTS videos_fuid ON videos (modelo, file_unique_id);
+"""
+
+
+def _connect() -> sqlite3.Connection:
+    STORE_DIR.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(INDEX_PATH), timeout=10, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def new_hasher():
+    return hashlib.blake2b(digest_size=32)
+
+
+def blob_path(digest: str) -> Path:
+    return STORE_DIR / digest[:2] / f"{digest}.mp4"
+
+
+def hash_file(path) -> Tuple[str, int]:
+    """Hash BLAKE2b y tamaño de un archivo local, leyendo por bloques."""
+    hasher = new_hasher()
+    size = 0
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            hasher.update(chunk)
+            size += len(chunk)
+    return hasher.hexdigest(), size
+
+
+async def download_hashed(url: str, destino: str, progreso: Optional[Dict] = None) -> Tuple[str, int]:
+    """
+    Descarga `url` a `destino` en streaming calculando el hash al vuelo.
+
+    Args:
+        progreso: dict opcional; ``progreso["bytes"]`` se actualiza en cada bloque
+
+    Returns:
+        Tuple (hash hex, bytes descargados)
+    """
+    import httpx
+
+    hasher = new_hasher()
+    size = 0
+    async with httpx.AsyncClient(timeout=httpx.Timeout(60.0, read=300.0)) as client:
+        async with client.stream("GET", url) as response:
+            response.raise_for_status()
+            with open(destino, "wb") as f:
+                async for chunk in response.aiter_bytes(CHUNK_SIZE):
+                    f.write(chunk)
+                    hasher.update(chunk)
+                    size += len(chunk)
+                    if progreso is not None:
+                        progreso["bytes"] = size
+    return hasher.hexdigest(), size
+
+
+def find_video(modelo: str, digest: Optional[str] = None, file_unique_id: Optional[str] = None) -> Optional[str]:
+    """
+    Busca un video ya recibido por el modelo, por hash o por file_unique_id.
+
+    Returns:
+        Nombre del video existente (en modelos/<modelo>/) o None
+    """
+    if not digest and not file_unique_id:
+        return None
+    conn = _connect()
+    try:
+        if digest:
+            rows = conn.execute(
+                "SELECT video FROM videos WHERE modelo = ? AND hash = ? ORDER BY created_at", (modelo, digest)
+            ).fetchall()
+        else:
+            rows = conn.execute(
+                "SELECT video FROM videos WHERE modelo = ? AND file_unique_id = ? ORDER BY created_at",
+                (modelo, file_unique_id),
+            ).fetchall()
+    finally:
+        conn.close()
+    for (video,) in rows:
+        if (MODELS_DIR / modelo / video).exists():
+            return video
+    return None
+
+
+def _link(src: Path, dst: Path) -> None:
+    """Hardlink src → dst; si no se puede (otro sistema de archivos), copia."""
+    try:
+        os.link(src, dst)
+    except OSError:
+        tmp = dst.with_name(dst.name + ".tmp")
+        shutil.copyfile(src, tmp)
+        os.replace(tmp, dst)
+
+
+def ingest_local(modelo: str, origen: str, ruta: str, file_unique_id: Optional[str] = None,
+                 move: bool = False) -> Tuple[str, bool]:
+    """
+    Incorpora un archivo que ya está en este host (servidor Bot API local) sin
+    descargarlo: hardlink (o rename con `move`) a ``<ruta>.part`` y luego `ingest`.
+
+    Solo se copia si el origen está en otro sistema de archivos.
+
+    Returns:
+        Tuple (ruta final del video, duplicado)
+    """
+    ruta_tmp = ruta + ".part"
+    Path(ruta_tmp).parent.mkdir(parents=True, exist_ok=True)
+    if move:
+        shutil.move(origen, ruta_tmp)
+    else:
+        _link(Path(origen), Path(ruta_tmp))
+    digest, size = hash_file(ruta_tmp)
+    return ingest(modelo, ruta_tmp, ruta, digest, size, file_unique_id)
+
+
+def ingest(modelo: str, descargado: str, ruta: str, digest: str, size: int,
+           file_unique_id: Optional[str] = None) -> Tuple[str, bool]:
+    """
+    Mueve un archivo recién descargado al almacén y lo enlaza en la carpeta del modelo.
+
+    Args:
+        modelo: Nombre del modelo
+        descargado: Archivo temporal ya completo (p. ej. "<ruta>.part")
+        ruta: Ruta final deseada dentro de modelos/<modelo>/
+        digest: Hash BLAKE2b del contenido
+        size: Tamaño en bytes
+        file_unique_id: Id estable de Telegram (opcional)
+
+    Returns:
+        Tuple (ruta final del video, duplicado). Si el modelo ya tenía este
+        contenido, se descarta la copia nueva y se devuelve la ruta existente.
+    """
+    existente = find_video(modelo, digest=digest)
+    if existente:
+        os.remove(descargado)
+        return str(MODELS_DIR / modelo / existente), True
+
+    blob = blob_path(digest)
+    blob.parent.mkdir(parents=True, exist_ok=True)
+    if blob.exists():
+        # Mismo contenido subido por otro modelo: reutilizar el blob
+        os.remove(descargado)
+    else:
+        os.replace(descargado, blob)
+
+    destino = Path(ruta)
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    _link(blob, destino)
+
+    conn = _connect()
+    try:
+        conn.execute(
+            "INSERT OR REPLACE INTO videos (modelo, video, hash, size, file_unique_id, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (modelo, destino.name, digest, size, file_unique_id, time.time()),
+        )
+    finally:
+        conn.close()
+    return str(destino), False
+
+
+def video_hash(modelo: str, video: str) -> Optional[str]:
+    """Hash del contenido de modelos/<modelo>/<video> según el índice (None si no está)."""
+    conn = _connect()
+    try:
+        row = conn.execute("SELECT hash FROM videos WHERE modelo = ? AND video = ?", (modelo, video)).fetchone()
+    finally:
+        conn.close()
+    return row[0] if row else None
+
+
+def forget(modelo: str, video: str) -> None:
+    """Quita un video del índice (tras borrarlo de la carpeta del modelo)."""
+    conn = _connect()
+    try:
+        conn.execute("DELETE FROM videos WHERE modelo = ? AND video = ?", (modelo, video))
+    finally:
+        conn.close()
+
+
+def release_blob(digest: str, dry_run: bool = False) -> int:
+    """
+    Borra el blob del almacén si ya ningún modelo lo enlaza (solo queda el hardlink del almacén).
+
+    Returns:
+        Bytes liberados (0 si el blob sigue en uso o no existe)
+    """
+    blob = blob_path(digest)
+    try:
+        st = blob.stat()
+    except FileNotFoundError:
+        return 0
+    if st.st_nlink > 1:
+        return 0
+    if not dry_run:
+        blob.unlink()
+    return st.st_size
+
+
+def orphan_blobs():
+    """Blobs del almacén sin ningún hardlink en las carpetas de los modelos."""
+    for blob in STORE_DIR.glob("??/*.mp4"):
+        try:
+            if blob.stat().st_nlink == 1:
+                yield blob
+        except FileNotFoundError:
+            continue
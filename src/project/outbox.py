@@ -0,0 +1,198 @@
+"""Drenador de la cola JSONL de ``create_models`` hacia Supabase.
+
+``create_models.queue_supabase_payload`` agrega payloads a
+``supabase_queue/<evento>.jsonl``. Este drenador:
+
+- Lee la cola de forma incremental desde un offset en bytes persistido en
+  ``supabase_queue/<evento>.offset`` (ligado al inode del archivo).
+- Agrupa por ``model_slug``: si un modelo aparece varias veces, gana el último.
+- Escribe en Supabase con upsert por lotes.
+- Compacta la cola reemplazándola por lo que aún no se ha enviado.
+
+Escritores y drenador se coordinan con ``flock`` sobre el archivo de cola; un
+segundo drenador del mismo evento sale sin hacer nada. La entrega es "al menos
+una vez": el offset se guarda después del upsert, que es idempotente.
+
+Uso:
+    python src/project/outbox.py [--event models] [--batch 500] [--loop 30] [--dry-run]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+try:
+    from .create_models import QUEUE_DIR, fcntl, open_locked_queue
+except ImportError:
+    from create_models import QUEUE_DIR, fcntl, open_locked_queue
+
+BASE_DIR = Path(__file__).resolve().parents[2]
+sys.path.append(str(BASE_DIR / "src"))
+
+MAX_READ_BYTES = 8 * 1024 * 1024
+COMPACT_MIN_BYTES = int(os.getenv("OUTBOX_COMPACT_BYTES", str(1024 * 1024)))
+
+
+def _handlers() -> Dict[str, Tuple[str, Callable[[List[Dict]], bool]]]:
+    """Evento → (clave de agrupación, función de upsert en lote)."""
+    from database.supabase_client import upsert_model_profiles
+    return {"models": ("model_slug", upsert_model_profiles)}
+
+
+def _paths(event: str) -> Tuple[Path, Path, Path]:
+    return (
+        QUEUE_DIR / f"{event}.jsonl",
+        QUEUE_DIR / f"{event}.offset",
+        QUEUE_DIR / f"{event}.drain.lock",
+    )
+
+
+def load_offset(offset_path: Path, inode: int) -> int:
+    """Offset guardado; si la cola fue reemplazada (otro inode) se empieza de 0."""
+    try:
+        state = json.loads(offset_path.read_text(encoding="utf-8"))
+    except (FileNotFoundError, json.JSONDecodeError):
+        return 0
+    return int(state.get("offset", 0)) if state.get("inode") == inode else 0
+
+
+def save_offset(offset_path: Path, inode: int, offset: int) -> None:
+    tmp = offset_path.with_suffix(".tmp")
+    tmp.write_text(json.dumps({"inode": inode, "offset": offset}), encoding="utf-8")
+    os.replace(tmp, offset_path)
+
+
+def read_segment(queue_path: Path, offset_path: Path) -> Tuple[int, int, List[Dict]]:
+    """
+    Lee, con la cola bloqueada, las líneas completas desde el offset guardado.
+
+    Returns:
+        Tuple (inode, offset final, payloads)
+    """
+    with open_locked_queue(queue_path, "a+") as handler:
+        inode = os.fstat(handler.fileno()).st_ino
+        start = load_offset(offset_path, inode)
+        handler.buffer.seek(start)
+        data = handler.buffer.read(MAX_READ_BYTES)
+    end = data.rfind(b"\n") + 1  # solo líneas completas
+    payloads = []
+    for raw in data[:end].splitlines():
+        if not raw.strip():
+            continue
+        try:
+            payloads.append(json.loads(raw))
+        except json.JSONDecodeError as e:
+            print(f"⚠️  Línea inválida en {queue_path.name} (se omite): {e}")
+    return inode, start + end, payloads
+
+
+def coalesce(payloads: List[Dict], key: str) -> List[Dict]:
+    """Un payload por clave; gana el último (manteniendo el orden de llegada del último)."""
+    latest: Dict[str, Dict] = {}
+    for payload in payloads:
+        slug = payload.get(key)
+        if not slug:
+            print(f"⚠️  Payload sin {key} (se omite)")
+            continue
+        latest.pop(slug, None)
+        latest[slug] = payload
+    return list(latest.values())
+
+
+def compact(queue_path: Path, offset_path: Path, inode: int, offset: int) -> bool:
+    """
+    Reemplaza la cola por la parte aún no enviada (desde `offset`).
+
+    Los escritores detectan el cambio de inode y reabren; el offset nuevo (0)
+    queda ligado al inode nuevo, así que un corte a mitad no reenvía nada.
+    """
+    if fcntl is None:
+        return False
+    with open_locked_queue(queue_path, "a+") as handler:
+        if os.fstat(handler.fileno()).st_ino != inode:
+            return False
+        handler.buffer.seek(offset)
+        tail = handler.buffer.read()
+        tmp = queue_path.with_name(queue_path.name + ".compact")
+        tmp.write_bytes(tail)
+        os.replace(tmp, queue_path)
+        save_offset(offset_path, os.stat(queue_path).st_ino, 0)
+    return True
+
+
+def drain(event: str = "models", batch: int = 500, dry_run: bool = False) -> Dict[str, int]:
+    """
+    Envía a Supabase todo lo pendiente de una cola.
+
+    Returns:
+        Resumen {leidos, enviados, compactados}
+    """
+    queue_path, offset_path, lock_path = _paths(event)
+    summary = {"leidos": 0, "enviados": 0, "compactados": 0}
+    if not queue_path.exists():
+        return summary
+    handlers = _handlers()
+    if event not in handlers:
+        raise ValueError(f"Evento sin destino en Supabase: {event}")
+    key, upsert = handlers[event]
+
+    with lock_path.open("a") as drain_lock:
+        if fcntl is not None:
+            try:
+                fcntl.flock(drain_lock.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                print(f"ℹ️  Otro drenador ya procesa '{event}'")
+                return summary
+
+        while True:
+            inode, end, payloads = read_segment(queue_path, offset_path)
+            if not payloads and end == load_offset(offset_path, inode):
+                break
+            summary["leidos"] += len(payloads)
+            rows = coalesce(payloads, key)
+            if dry_run:
+                for row in rows:
+                    print(f"   🔎 {row[key]}")
+                summary["enviados"] += len(rows)
+                break
+            for i in range(0, len(rows), max(1, batch)):
+                lote = rows[i:i + max(1, batch)]
+                if not upsert(lote):
+                    print(f"❌ Falló el upsert de '{event}'; se reintentará desde el último offset")
+                    return summary
+                summary["enviados"] += len(lote)
+            save_offset(offset_path, inode, end)
+
+        if not dry_run:
+            inode = os.stat(queue_path).st_ino
+            offset = load_offset(offset_path, inode)
+            if offset and (offset >= COMPACT_MIN_BYTES or offset == queue_path.stat().st_size):
+                summary["compactados"] = int(compact(queue_path, offset_path, inode, offset))
+    return summary
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Envía a Supabase la cola JSONL de create_models.")
+    parser.add_argument("--event", default="models", help="Cola supabase_queue/<event>.jsonl")
+    parser.add_argument("--batch", type=int, default=500, help="Filas por upsert.")
+    parser.add_argument("--loop", type=float, default=0, help="Repetir cada N segundos (0 = una vez).")
+    parser.add_argument("--dry-run", action="store_true", help="Solo muestra qué se enviaría.")
+    args = parser.parse_args()
+
+    while True:
+        summary = drain(args.event, args.batch, args.dry_run)
+        if summary["leidos"] or summary["compactados"]:
+            print(f"📤 {args.event}: {summary}")
+        if not args.loop:
+            break
+        time.sleep(args.loop)
+
+
+if __name__ == "__main__":
+    main()
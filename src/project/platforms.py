@@ -0,0 +1,416 @@
+"""Registro de plataformas de publicación y sus adaptadores de subida.
+
+Cada plataforma declara:
+
+- ``adapters`` – formas de subir, en orden de preferencia;
+- ``concurrency`` – subidas simultáneas por poster;
+- ``rate_limit`` – ``(n, segundos)``: como mucho n subidas por ventana, por poster;
+- ``capabilities`` – ``title``, ``tags``, ``http`` (subida sin navegador),
+  ``browser`` (worker de Playwright) y ``session_check`` (sesión verificable
+  con ``workers/check_session.js``, ver ``session_check.py``).
+
+Adaptadores:
+
+- ``HttpUpload`` – sin navegador. Toma el token de la sesión guardada por
+  Playwright (``modelos/<modelo>/.auth/user.json``) y envía el archivo en
+  streaming, en bloques de ``HTTP_CHUNK_BYTES``, a la misma API interna que
+  llama el worker. Si la conexión se cae reintenta la subida hasta
+  ``HTTP_RETRIES`` veces.
+- ``WorkerUpload`` – un worker de ``workers/`` (Playwright/Node).
+
+Si ``HttpUpload`` falla antes de publicar (sin token, sesión rechazada, API
+caída) se pasa al siguiente adaptador. Si falla al publicar los detalles no
+se pasa, para no duplicar el video. ``UPLOAD_MODE=browser`` usa solo los
+workers.
+
+Los límites no bloquean: el poster pregunta ``capacity()`` antes de reclamar
+y solo reclama lo que la plataforma puede empezar ya (``try_start``), así una
+plataforma saturada no retiene hilos ni posts en ``procesando``.
+"""
+
+from __future__ import annotations
+
+import abc
+import http.client
+import json
+import mimetypes
+import os
+import re
+import secrets
+import subprocess
+import threading
+import time
+import urllib.parse
+from collections import deque
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+BASE_DIR = Path(__file__).resolve().parents[2]
+UPLOAD_MODE = os.getenv("UPLOAD_MODE", "auto").strip().lower()  # auto | browser
+HTTP_CHUNK_BYTES = int(os.getenv("HTTP_CHUNK_BYTES", str(1024 * 1024)))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "120"))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "2"))
+
+
+class UploadError(Exception):
+    """Subida fallida. Con ``fallback`` no se publicó nada y se puede probar otro adaptador."""
+
+    def __init__(self, mensaje: str, fallback: bool = False):
+        super().__init__(mensaje)
+        self.fallback = fallback
+
+
+# ---- Límites por plataforma ----
+
+class RateLimiter:
+    """Ventana deslizante: como mucho ``n`` turnos cada ``per`` segundos."""
+
+    def __init__(self, n: int, per: float):
+        self.n = n
+        self.per = per
+        self._marks: deque = deque()
+        self._lock = threading.Lock()
+
+    def _purge(self, ahora: float) -> None:
+        while self._marks and ahora - self._marks[0] >= self.per:
+            self._marks.popleft()
+
+    def available(self) -> int:
+        """Turnos libres ahora mismo."""
+        with self._lock:
+            self._purge(time.monotonic())
+            return self.n - len(self._marks)
+
+    def try_acquire(self) -> bool:
+        """Toma un turno si hay uno libre, sin esperar."""
+        with self._lock:
+            ahora = time.monotonic()
+            self._purge(ahora)
+            if len(self._marks) >= self.n:
+                return False
+            self._marks.append(ahora)
+            return True
+
+    def next_turn(self) -> float:
+        """Segundos hasta que se libere un turno (0 si ya hay uno)."""
+        with self._lock:
+            ahora = time.monotonic()
+            self._purge(ahora)
+            if len(self._marks) < self.n:
+                return 0.0
+            return self.per - (ahora - self._marks[0])
+
+
+class Platform:
+    """Una plataforma: adaptadores, límites y capacidades."""
+
+    def __init__(self, name: str, adapters: List, concurrency: int = 1,
+                 rate_limit: Optional[Tuple[int, float]] = None,
+                 capabilities: Iterable[str] = (), aliases: Iterable[str] = ()):
+        self.name = name
+        self.adapters = adapters
+        self.concurrency = concurrency
+        self.rate_limit = rate_limit
+        self.capabilities = frozenset(capabilities)
+        self.aliases = tuple(aliases)
+        self._active = 0
+        self._lock = threading.Lock()
+        self._limiter = RateLimiter(*rate_limit) if rate_limit else None
+
+    @property
+    def active(self) -> int:
+        return self._active
+
+    def capacity(self) -> int:
+        """Subidas que podrían empezar ahora: huecos libres acotados por los turnos del límite."""
+        with self._lock:
+            libres = self.concurrency - self._active
+        if self._limiter is not None:
+            libres = min(libres, self._limiter.available())
+        return max(0, libres)
+
+    def try_start(self) -> bool:
+        """Ocupa un hueco y un turno si los hay, sin esperar; hay que llamar a ``finish`` al terminar."""
+        with self._lock:
+            if self._active >= self.concurrency:
+                return False
+            if self._limiter is not None and not self._limiter.try_acquire():
+                return False
+            self._active += 1
+            return True
+
+    def finish(self) -> None:
+        with self._lock:
+            self._active -= 1
+
+    def next_turn(self) -> float:
+        """Segundos hasta el próximo turno del límite (0 si hay uno libre o no hay límite)."""
+        return self._limiter.next_turn() if self._limiter is not None else 0.0
+
+    def upload(self, job: Dict) -> str:
+        """
+        Sube con el primer adaptador disponible; pasa al siguiente solo si el
+        anterior falló sin publicar.
+
+        Returns:
+            Nombre del adaptador que publicó
+
+        Raises:
+            UploadError: si ningún adaptador pudo publicar
+        """
+        error: Optional[UploadError] = None
+        for adapter in self.adapters:
+            if UPLOAD_MODE == "browser" and adapter.kind == "http":
+                continue
+            if not adapter.available(job):
+                continue
+            try:
+                adapter.upload(job)
+                return adapter.name
+            except UploadError as e:
+                error = e
+                print(f"⚠️  {adapter.name}: {e}")
+                if not e.fallback:
+                    break
+        raise error or UploadError(f"ningún adaptador disponible para {self.name}")
+
+
+# ---- Worker de Playwright/Node ----
+
+class WorkerUpload:
+    """Ejecuta un worker de ``workers/`` con el contrato de entorno VIDEO_PATH, VIDEO_TITLE, ..."""
+
+    kind = "browser"
+
+    def __init__(self, name: str, cmd: List[str]):
+        self.name = name
+        self.cmd = cmd  # el último elemento es el script, relativo a BASE_DIR
+
+    def available(self, job: Dict) -> bool:
+        return (BASE_DIR / self.cmd[-1]).exists()
+
+    def upload(self, job: Dict) -> None:
+        env = os.environ.copy()
+        env.update({
+            "VIDEO_PATH": str(job["video_path"]),
+            "VIDEO_TITLE": job.get("title", ""),
+            "VIDEO_TAGS": job.get("tags", ""),
+            "MODEL_NAME": job["modelo"],  # para aislar la sesión por modelo
+            "TRACE_ID": job.get("trace_id") or "",
+        })
+        cmd = [*self.cmd[:-1], str(BASE_DIR / self.cmd[-1])]
+        print(f"🚀 Ejecutando: {' '.join(cmd)}")
+        result = subprocess.run(cmd, env=env, capture_output=True, text=True, cwd=str(BASE_DIR))
+        if result.returncode != 0:
+            print(f"Return code: {result.returncode}")
+            if result.stderr:
+                print("STDERR:", result.stderr[-1000:])  # Últimas 1000 chars
+            if result.stdout:
+                print("STDOUT:", result.stdout[-1000:])
+            raise UploadError(f"returncode {result.returncode}")
+        if result.stdout:
+            print("STDOUT:", result.stdout[-500:])  # Últimas 500 chars
+
+
+# ---- Subida HTTP directa ----
+
+def auth_file(modelo: str) -> Path:
+    return BASE_DIR / "modelos" / modelo / ".auth" / "user.json"
+
+
+def session_token(modelo: str, origin: str, pattern: str = r"token|auth") -> Optional[str]:
+    """Token del localStorage de ``origin`` en el storageState de Playwright (como lo busca kams.js)."""
+    try:
+        state = json.loads(auth_file(modelo).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    regex = re.compile(pattern, re.IGNORECASE)
+    for entrada in state.get("origins", []):
+        if entrada.get("origin") != origin:
+            continue
+        for item in entrada.get("localStorage", []):
+            if regex.search(item.get("name", "")) and item.get("value"):
+                return item["value"]
+    return None
+
+
+def _connection(url: str) -> Tuple[http.client.HTTPConnection, str]:
+    partes = urllib.parse.urlsplit(url)
+    clase = http.client.HTTPSConnection if partes.scheme == "https" else http.client.HTTPConnection
+    ruta = (partes.path or "/") + (f"?{partes.query}" if partes.query else "")
+    return clase(partes.netloc, timeout=HTTP_TIMEOUT), ruta
+
+
+def post_file(url: str, field: str, path: Path, headers: Dict[str, str]) -> Tuple[int, bytes]:
+    """POST multipart/form-data leyendo el archivo por bloques: la memoria no crece con el tamaño."""
+    boundary = secrets.token_hex(16)
+    nombre = path.name.replace('"', "%22")
+    tipo = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+    inicio = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"{field}\"; filename=\"{nombre}\"\r\n"
+              f"Content-Type: {tipo}\r\n\r\n").encode("utf-8")
+    fin = f"\r\n--{boundary}--\r\n".encode("utf-8")
+
+    conn, ruta = _connection(url)
+    try:
+        conn.putrequest("POST", ruta)
+        for clave, valor in headers.items():
+            conn.putheader(clave, valor)
+        conn.putheader("Content-Type", f"multipart/form-data; boundary={boundary}")
+        conn.putheader("Content-Length", str(len(inicio) + path.stat().st_size + len(fin)))
+        conn.endheaders()
+        conn.send(inicio)
+        with path.open("rb") as f:
+            while True:
+                bloque = f.read(HTTP_CHUNK_BYTES)
+                if not bloque:
+                    break
+                conn.send(bloque)
+        conn.send(fin)
+        respuesta = conn.getresponse()
+        return respuesta.status, respuesta.read()
+    finally:
+        conn.close()
+
+
+def post_json(url: str, payload: Dict, headers: Dict[str, str]) -> Tuple[int, bytes]:
+    conn, ruta = _connection(url)
+    try:
+        conn.request("POST", ruta, body=json.dumps(payload).encode("utf-8"),
+                     headers={**headers, "Content-Type": "application/json"})
+        respuesta = conn.getresponse()
+        return respuesta.status, respuesta.read()
+    finally:
+        conn.close()
+
+
+class HttpUpload(abc.ABC):
+    """
+    Subida a la API interna de un sitio en dos pasos: archivo (multipart) y
+    detalles (JSON). Las subclases definen URLs y la forma de los detalles.
+    """
+
+    kind = "http"
+    name = "http"
+    origin = ""
+    upload_url = ""
+    details_url = ""
+    field = "video"
+
+    def available(self, job: Dict) -> bool:
+        return auth_file(job["modelo"]).exists()
+
+    def video_id(self, data: Dict) -> Optional[str]:
+        return data.get("id") or data.get("videoId") or (data.get("data") or {}).get("id")
+
+    @abc.abstractmethod
+    def details(self, video_id: str, job: Dict) -> Dict:
+        """Cuerpo JSON del paso de detalles (publica el video)."""
+
+    def upload(self, job: Dict) -> None:
+        token = session_token(job["modelo"], self.origin)
+        if not token:
+            raise UploadError(f"sin token de sesión de {self.origin} en {auth_file(job['modelo'])}", fallback=True)
+        headers = {"Accept": "application/json", "Authorization": f"Bearer {token}"}
+        path = Path(job["video_path"])
+
+        # 1. Archivo: aún no hay nada publicado, se puede reintentar o pasar al worker
+        for intento in range(HTTP_RETRIES + 1):
+            try:
+                print(f"📤 Subiendo {path.name} ({path.stat().st_size / 1024 / 1024:.1f} MB) vía HTTP...")
+                status, cuerpo = post_file(self.upload_url, self.field, path, headers)
+            except OSError as e:  # incluye timeouts y conexiones cortadas
+                status, cuerpo = None, str(e).encode("utf-8")
+            if status is not None and status < 500:
+                break
+            if intento < HTTP_RETRIES:
+                print(f"🔁 Subida interrumpida ({status or cuerpo.decode('utf-8', 'replace')}); reintento {intento + 1}")
+                time.sleep(2 ** intento)
+        if status is None or not 200 <= status < 300:
+            raise UploadError(f"subida: {status} {cuerpo[:300].decode('utf-8', 'replace')}", fallback=True)
+        try:
+            video_id = self.video_id(json.loads(cuerpo))
+        except ValueError:
+            video_id = None
+        if not video_id:
+            raise UploadError(f"subida sin videoId: {cuerpo[:300].decode('utf-8', 'replace')}", fallback=True)
+
+        # 2. Detalles: publica el video; si falla no se repite con otro adaptador
+        try:
+            status, cuerpo = post_json(self.details_url, self.details(video_id, job), headers)
+        except OSError as e:
+            raise UploadError(f"detalles: {e}")
+        if not 200 <= status < 300:
+            raise UploadError(f"detalles: {status} {cuerpo[:300].decode('utf-8', 'replace')}")
+        print(f"✅ Publicado vía HTTP. videoId: {video_id}")
+
+
+class KamsHttp(HttpUpload):
+    """Los mismos dos pasos que ``workers/kams.js`` ejecuta dentro del navegador."""
+
+    name = "kams-http"
+    origin = "https://kams.com"
+    upload_url = "https://api.kams.com/v1/videos/upload"
+    details_url = "https://api.kams.com/v1/videos/upload-details"
+
+    def details(self, video_id: str, job: Dict) -> Dict:
+        return {
+            "videoId": video_id,
+            "title": job.get("title", ""),
+            "tags": job.get("tags", ""),
+            "is_nsfw": True,
+            "uploadDate": "",
+            "uploadDateTimezone": "America/Bogota",
+        }
+
+
+# ---- Registro ----
+
+REGISTRY: Dict[str, Platform] = {}
+
+
+def register(platform: Platform) -> Platform:
+    for nombre in (platform.name, *platform.aliases):
+        REGISTRY[nombre] = platform
+    return platform
+
+
+register(Platform(
+    "kams",
+    adapters=[KamsHttp(), WorkerUpload("kams.js", ["npx", "playwright", "test", "workers/kams.js"])],
+    concurrency=2,
+    rate_limit=(20, 3600),
+    capabilities=("title", "tags", "http", "browser", "session_check"),
+    aliases=("kams.com",),
+))
+register(Platform(
+    "xxxfollow",
+    # Perfil persistente de Chromium por modelo: una sola subida a la vez
+    adapters=[WorkerUpload("xxxfollow.js", ["node", "workers/xxxfollow.js"])],
+    concurrency=1,
+    rate_limit=(10, 3600),
+    capabilities=("title", "tags", "browser"),
+    aliases=("xxxfollow.com",),
+))
+
+
+def get(plataforma: Optional[str]) -> Optional[Platform]:
+    return REGISTRY.get((plataforma or "").strip().lower())
+
+
+def names() -> List[str]:
+    """Nombres y alias aceptados en la columna ``plataforma``."""
+    return list(REGISTRY)
+
+
+def with_capability(capability: str) -> Dict[str, Platform]:
+    """Nombre o alias → plataforma, solo las que declaran la capacidad."""
+    return {nombre: p for nombre, p in REGISTRY.items() if capability in p.capabilities}
+
+
+def unique() -> List[Platform]:
+    """Cada plataforma una vez (sin repetir por sus alias)."""
+    return list({id(p): p for p in REGISTRY.values()}.values())
+
+
+def total_concurrency() -> int:
+    return sum(p.concurrency for p in unique())
@@ -1,189 +1,300 @@
+import asyncio
 import os
+import sys
 import time
-import subprocess
 import json
-from datetime import datetime
+import signal
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 import pytz
-from supabase import create_client, Client
 from dotenv import load_dotenv
 from pathlib import Path
 
-# Cargar variables de entorno
-# Cargar variables de entorno
 # Cargar variables de entorno
 BASE_DIR = Path(__file__).resolve().parents[2]
 env_path = BASE_DIR / '.env'
 load_dotenv(dotenv_path=env_path)
 
-# Configuración Supabase
-url: str = os.environ.get("SUPABASE_URL")
-key: str = os.environ.get("SUPABASE_ANON_KEY")
+# Cliente de Supabase compartido (se crea en el primer uso, no al importar)
+sys.path.append(str(BASE_DIR / "src"))
+from database.supabase_client import get_all_models, set_schedule_estado
+from database.async_client import aclaim_due_schedules, run_sync
 
-if not url or not key:
-    raise ValueError(f"Faltan credenciales de Supabase en .env ({env_path})")
+try:
+    from .renditions import rendition_for
+    from . import platforms, profiling, session_check, tracing
+except ImportError:
+    from renditions import rendition_for
+    import platforms, profiling, session_check, tracing
 
-supabase: Client = create_client(url, key)
+POSTER_BATCH = int(os.getenv("POSTER_BATCH", "20"))
+# Hilos de subida; cada plataforma limita además los suyos (platforms.py)
+POSTER_WORKERS = int(os.getenv("POSTER_WORKERS", str(platforms.total_concurrency())))
 
-def get_all_models():
-    """Obtiene la lista de todos los modelos registrados."""
-    try:
-        response = supabase.table('modelos').select("modelo").execute()
-        return [item['modelo'] for item in response.data] if response.data else []
-    except Exception as e:
-        print(f"Error obteniendo modelos: {e}")
-        return []
+# Un post en 'procesando' con el reclamo más viejo que esto se retoma (su poster murió);
+# debe superar la subida más larga
+CLAIM_LEASE_SECONDS = int(os.getenv("CLAIM_LEASE_SECONDS", "10800"))
+
+# Shard de este poster, "<índice>/<total>" (lo asigna main.py al lanzar varios)
+POSTER_SHARD = os.getenv("POSTER_SHARD", "0/1")
+
+# Se activa con SIGTERM: deja de reclamar y termina las subidas en curso
+_STOP = threading.Event()
+# Despierta el bucle principal: terminó una subida (hay hueco) o llegó SIGTERM
+_WAKE = threading.Event()
 
-def get_pending_posts(modelo):
-    """Busca posts pendientes para un modelo específico."""
-    # Usar timezone de Colombia (UTC-5)
+def now_colombia_str():
+    """Hora actual de Colombia (UTC-5) sin tz, igual que scheduled_time en Supabase."""
     colombia_tz = pytz.timezone('America/Bogota')
-    now_colombia = datetime.now(colombia_tz)
-    # Convertir a string sin timezone para comparar con Supabase (que guarda sin tz)
-    now_str = now_colombia.strftime('%Y-%m-%d %H:%M:%S')
-    
-    print(f"   🕐 Hora actual (Colombia): {now_str}")
+    return datetime.now(colombia_tz).strftime('%Y-%m-%d %H:%M:%S')
+
+def utc_now_iso():
+    """Marca de tiempo para claimed_at/started_at/finished_at (timestamptz)."""
+    return datetime.now(timezone.utc).isoformat()
+
+def scheduled_time_ns(scheduled_time):
+    """scheduled_time (hora de Colombia sin tz) → epoch en nanosegundos; None si no se puede leer."""
     try:
-        # Primero ver TODOS los posts para debug
-        all_posts = supabase.table(modelo).select("*").execute()
-        print(f"   📊 Total posts en tabla: {len(all_posts.data) if all_posts.data else 0}")
-        if all_posts.data:
-            for p in all_posts.data[:3]:  # Mostrar primeros 3
-                print(f"      - {p.get('video', 'N/A')}: estado={p.get('estado')}, scheduled={p.get('scheduled_time')}")
-        
-        # Columnas: video, caption, tags, plataforma, estado, scheduled_time
-        response = supabase.table(modelo)\
-            .select("*")\
-            .eq('estado', 'pendiente')\
-            .lte('scheduled_time', now_str)\
-            .execute()
-        return response.data
-    except Exception as e:
-        print(f"Error consultando tabla {modelo}: {e}")
+        naive = datetime.strptime(scheduled_time, '%Y-%m-%d %H:%M:%S')
+    except (TypeError, ValueError):
+        return None
+    return int(pytz.timezone('America/Bogota').localize(naive).timestamp() * 1e9)
+
+def parse_shard(shard=POSTER_SHARD):
+    """'1/4' → (1, 4)."""
+    indice, total = (int(x) for x in shard.split("/"))
+    if total < 1 or not 0 <= indice < total:
+        raise ValueError(f"POSTER_SHARD inválido: {shard}")
+    return indice, total
+
+def shard_of(modelo, total):
+    """Shard estable de un modelo (crc32, igual en todos los procesos y reinicios)."""
+    return zlib.crc32(modelo.encode("utf-8")) % total
+
+def shard_models(shard=POSTER_SHARD):
+    """Modelos que atiende este poster; None si hay un solo shard (todos)."""
+    indice, total = parse_shard(shard)
+    if total == 1:
+        return None
+    return [m for m in get_all_models() if shard_of(m, total) == indice]
+
+def poster_models():
+    """Lista explícita de los modelos de este poster (todos si hay un solo shard)."""
+    modelos = shard_models()
+    return get_all_models() if modelos is None else modelos
+
+def round_models():
+    """
+    Modelos de este shard y sesiones vencidas para una ronda de reclamo. Se
+    resuelven una vez por ronda (dispatch) y valen para todas las plataformas.
+
+    Returns:
+        (lista de modelos o None si son todos, pares (modelo, plataforma) vencidos)
+    """
+    modelos = shard_models()
+    vencidas = session_check.stale_pairs()
+    if vencidas and modelos is None:
+        # Para excluir sesiones vencidas hace falta la lista explícita
+        modelos = get_all_models()
+    return modelos, vencidas
+
+async def aclaim_due_posts(platform, limit, now_str=None, ronda=None):
+    """
+    Reclama hasta `limit` posts vencidos de una plataforma (y sus alias) de los
+    modelos de este shard (tabla única de schedules); quedan en 'procesando'.
+    También retoma los 'procesando' con el reclamo vencido (CLAIM_LEASE_SECONDS).
+    Los de sesiones marcadas como vencidas (session_check) no se reclaman: siguen
+    'pendiente' hasta que se repita el login.
+
+    Args:
+        ronda: Resultado de round_models() de la ronda en curso; si falta se calcula aquí
+    """
+    now_str = now_str or now_colombia_str()
+    modelos, vencidas = ronda if ronda is not None else round_models()
+    if modelos == []:
         return []
+    if vencidas:
+        chequeo = session_check.CHECK_PLATFORMS.get(platform.name, platform.name)
+        modelos = [m for m in modelos if (m, chequeo) not in vencidas]
+        if not modelos:
+            return []
+    return await aclaim_due_schedules(now_str, limit, modelos=modelos,
+                                      plataformas=[platform.name, *platform.aliases],
+                                      lease_seconds=CLAIM_LEASE_SECONDS)
 
+async def _claim_round(pedidos, now_str, ronda):
+    """Reclama a la vez (asyncio.gather) los posts de todas las plataformas con cupo."""
+    return await asyncio.gather(*(aclaim_due_posts(platform, cupo, now_str, ronda) for platform, cupo in pedidos))
+
+@profiling.profiled("process_post")
 def process_post(modelo, post):
     """Procesa un post individual ejecutando el worker de Playwright."""
     print(f"🔄 Procesando post para {modelo}: {post.get('video', 'Sin video')}")
     
-    # 1. Actualizar estado a 'procesando'
-    match_query = supabase.table(modelo).update({'estado': 'procesando'})
-    if 'id' in post:
-        match_query = match_query.eq('id', post['id'])
-    else:
-        match_query = match_query.eq('video', post['video']).eq('plataforma', post['plataforma'])
-    
-    match_query.execute()
-    
-    # 2. Preparar entorno para el worker
-    env = os.environ.copy()
+    # 1. El post ya viene en 'procesando' (reclamado por aclaim_due_posts)
+    if session_check.is_stale(modelo, post.get('plataforma')):
+        # La sesión se marcó vencida después del reclamo: no quemar el slot
+        print(f"🔐 Sesión vencida de {modelo}/{post.get('plataforma')}: el post vuelve a 'pendiente'")
+        set_schedule_estado(post['id'], 'pendiente')
+        return
+    # started_at se escribe junto con el estado final: ninguna petición extra
+    tiempos = {'started_at': utc_now_iso()}
+    trace_id = post.get('trace_id')
+    programado_ns = scheduled_time_ns(post.get('scheduled_time'))
+    if programado_ns:
+        # Retraso desde la hora programada (intervalo de sondeo + posts antes en el lote)
+        tracing.record_span("poster.lateness", trace_id, programado_ns, modelo=modelo,
+                            plataforma=post.get('plataforma'), schedule_id=post.get('id'))
     
-    # Construir ruta absoluta del video: Trafico/modelos/{modelo}/{video}
+    # 2. Construir ruta absoluta del video: Trafico/modelos/{modelo}/{video}
     video_path = BASE_DIR / "modelos" / modelo / post['video']
     
-    env['VIDEO_PATH'] = str(video_path)
-    env['VIDEO_TITLE'] = post.get('caption', '') # Usamos caption como título
-    env['VIDEO_TAGS'] = post.get('tags', '')
-    env['MODEL_NAME'] = modelo # Nombre del modelo para aislar sesión
-    
     # Validar que el archivo existe
     if not video_path.exists():
         print(f"❌ Archivo no encontrado: {video_path}")
         # Actualizar error
-        err_query = supabase.table(modelo).update({'estado': 'fallido'}) # No hay columna error_log standard, solo estado
-        if 'id' in post:
-            err_query = err_query.eq('id', post['id'])
-        else:
-            err_query = err_query.eq('video', post['video']).eq('plataforma', post['plataforma'])
-        err_query.execute()
+        set_schedule_estado(post['id'], 'fallido', {**tiempos, 'finished_at': utc_now_iso()})  # No hay columna error_log standard, solo estado
         return
 
-    # 3. Ejecutar kams.js (Solo si la plataforma es 'kams' o similar)
-    # El usuario mencionó @[plataformas], asumimos que el script kams.js es para esa plataforma.
-    # Deberíamos verificar post['plataforma'].
-    
+    # 3. Adaptador de la plataforma (platforms.py): HTTP directo o worker de Playwright
     plataforma = post.get('plataforma', '').lower()
+    platform = platforms.get(plataforma)
     
-    # Mapeo de scripts por plataforma
-    script_map = {
-        'kams': 'workers/kams.js',
-        'kams.com': 'workers/kams.js',
-        # Agregar otros aquí
-    }
-    
-    script_rel_path = script_map.get(plataforma)
-    
-    if not script_rel_path:
+    if platform is None:
         print(f"⚠️  Plataforma no soportada por este scheduler: {plataforma}")
-        return # No marcamos como fallido, tal vez otro proceso lo maneja
+        set_schedule_estado(post['id'], 'pendiente')  # Devolverlo: tal vez otro proceso lo maneja
+        return
+
+    # Subir la versión pre-procesada para esta plataforma si existe (menos bytes)
+    upload_path = rendition_for(video_path, plataforma)
+    if upload_path != video_path:
+        print(f"🎞️  Usando rendition: {upload_path.name}")
+    job = {
+        'modelo': modelo,  # para aislar la sesión
+        'video_path': upload_path,
+        'title': post.get('caption', ''),  # Usamos caption como título
+        'tags': post.get('tags', ''),
+        'trace_id': trace_id,
+    }
 
     try:
-        script_path = BASE_DIR / script_rel_path
-        
-        if not script_path.exists():
-            print(f"❌ Script no encontrado: {script_path}")
-            raise FileNotFoundError(f"Script no encontrado: {script_path}")
-        
-        cmd = ["npx", "playwright", "test", str(script_path)]
-        
-        print(f"🚀 Ejecutando: {' '.join(cmd)}")
         print(f"📂 Directorio de trabajo: {BASE_DIR}")
-        print(f"🎬 Video: {env['VIDEO_PATH']}")
-        print(f"📝 Título: {env['VIDEO_TITLE']}")
-        print(f"🏷️  Tags: {env['VIDEO_TAGS']}")
+        print(f"🎬 Video: {upload_path}")
+        print(f"📝 Título: {job['title']}")
+        print(f"🏷️  Tags: {job['tags']}")
         
-        result = subprocess.run(cmd, env=env, capture_output=True, text=True, cwd=str(BASE_DIR))
+        # Duración y tamaño por plataforma: alimentan el modelo de rendimiento de scheduler.py
+        tiempos['upload_bytes'] = upload_path.stat().st_size
+        with tracing.span("poster.upload", trace_id, modelo=modelo, plataforma=plataforma,
+                          schedule_id=post.get('id'), bytes=tiempos['upload_bytes']) as sp:
+            inicio = time.monotonic()
+            try:
+                sp["attrs"]["adapter"] = platform.upload(job)
+                final_status = 'publicado'
+            except platforms.UploadError as e:
+                sp["error"] = str(e)
+                final_status = 'fallido'
+            tiempos['upload_seconds'] = round(time.monotonic() - inicio, 3)
         
-        final_status = 'publicado' if result.returncode == 0 else 'fallido'
-        
-        if result.returncode == 0:
-            print(f"✅ Publicado exitosamente: {post.get('video')}")
-            if result.stdout:
-                print("STDOUT:", result.stdout[-500:])  # Últimas 500 chars
+        if final_status == 'publicado':
+            print(f"✅ Publicado exitosamente: {post.get('video')} ({sp['attrs']['adapter']})")
         else:
-            print(f"❌ Falló la publicación: {post.get('video')}")
-            print(f"Return code: {result.returncode}")
-            if result.stderr:
-                print("STDERR:", result.stderr[-1000:])  # Últimas 1000 chars
-            if result.stdout:
-                print("STDOUT:", result.stdout[-1000:])
+            print(f"❌ Falló la publicación: {post.get('video')} ({sp['error']})")
             
         # Actualizar estado final
-        upd_query = supabase.table(modelo).update({'estado': final_status})
-        if 'id' in post:
-            upd_query = upd_query.eq('id', post['id'])
-        else:
-            upd_query = upd_query.eq('video', post['video']).eq('plataforma', post['plataforma'])
-        upd_query.execute()
+        set_schedule_estado(post['id'], final_status, {**tiempos, 'finished_at': utc_now_iso()})
             
     except Exception as e:
         print(f"❌ Error ejecutando worker: {e}")
         # Update fail
-        fail_query = supabase.table(modelo).update({'estado': 'fallido'})
-        if 'id' in post:
-            fail_query = fail_query.eq('id', post['id'])
-        else:
-            fail_query = fail_query.eq('video', post['video']).eq('plataforma', post['plataforma'])
-        fail_query.execute()
+        set_schedule_estado(post['id'], 'fallido', {**tiempos, 'finished_at': utc_now_iso()})
+
+def run_post(platform, post):
+    """
+    Procesa un post que ya tiene hueco y turno de su plataforma (try_start) y
+    libera el hueco al terminar. Si llegó SIGTERM antes de empezar, lo devuelve
+    a 'pendiente'.
+    """
+    try:
+        if _STOP.is_set():
+            set_schedule_estado(post['id'], 'pendiente')
+            return
+        process_post(post['modelo'], post)
+    finally:
+        platform.finish()
+        _WAKE.set()
+
+def dispatch(pool, en_curso):
+    """
+    Una ronda de reclamo: cada plataforma reclama solo los posts que puede
+    empezar ya (huecos libres y turnos de su límite, y hilos libres del pool) y
+    los lanza. Una plataforma saturada no frena a las demás.
+
+    Los reclamos de todas las plataformas van a la vez (una consulta en vuelo
+    por plataforma), así que el cupo de hilos del pool se reparte antes de
+    reclamar; lo que una plataforma no llegue a usar queda para la ronda siguiente.
+
+    Returns:
+        (posts lanzados, segundos hasta el próximo turno de una plataforma limitada por ritmo o None)
+    """
+    now_str = now_colombia_str()
+    print(f"   🕐 Hora actual (Colombia): {now_str}")
+    proximo = None
+    pedidos = []
+    libres = POSTER_WORKERS - en_curso
+    for platform in platforms.unique():
+        cupo = min(platform.capacity(), POSTER_BATCH, libres)
+        if cupo <= 0:
+            turno = platform.next_turn()
+            if platform.active < platform.concurrency and turno > 0:
+                # Limitada por ritmo, no por huecos: despertar cuando se libere su turno
+                proximo = turno if proximo is None else min(proximo, turno)
+            continue
+        pedidos.append((platform, cupo))
+        libres -= cupo
+    if not pedidos:
+        return 0, proximo
+
+    # Modelos del shard: una lectura por ronda, no una por plataforma
+    reclamados = run_sync(_claim_round(pedidos, now_str, round_models()))
+    lanzados = 0
+    for (platform, _), posts in zip(pedidos, reclamados):
+        for post in posts:
+            if not platform.try_start():
+                # No debería pasar (solo este hilo empieza subidas): no retener el post
+                set_schedule_estado(post['id'], 'pendiente')
+                continue
+            pool.submit(run_post, platform, post)
+            lanzados += 1
+    return lanzados, proximo
+
+def _on_sigterm(signum, frame):
+    print("🛑 SIGTERM: se terminan las subidas en curso y se sale")
+    _STOP.set()
+    _WAKE.set()
 
 def main():
-    print("🚀 Iniciando Scheduler Multi-Modelo...")
-    while True:
-        modelos = get_all_models()
-        print(f"🔍 Modelos encontrados: {modelos}")
-        if not modelos:
-            print("⚠️  No se encontraron modelos en la tabla 'modelos'.")
-        
-        for modelo in modelos:
-            print(f"🔍 Verificando {modelo}...")
-            posts = get_pending_posts(modelo)
-            print(f"   Posts pendientes para {modelo}: {len(posts) if posts else 0}")
-            if posts:
-                print(f"\n📬 {modelo}: {len(posts)} posts pendientes.")
-                for post in posts:
-                    process_post(modelo, post)
-        
-        print(f"💤 Esperando 60 segundos...")
-        time.sleep(60) # Verificar cada minuto
+    print(f"🚀 Iniciando Scheduler Multi-Modelo (shard {POSTER_SHARD})...")
+    signal.signal(signal.SIGTERM, _on_sigterm)
+    profiling.install_signal_toggle()  # kill -USR2 <pid> enciende/apaga el perfilado
+    # Sesiones de los posts de las próximas horas: se verifican y refrescan antes de la subida
+    session_check.start_background(poster_models, _STOP)
+    pool = ThreadPoolExecutor(max_workers=max(1, POSTER_WORKERS), thread_name_prefix="upload")
+    while not _STOP.is_set():
+        _WAKE.clear()
+        with profiling.profile("poster_cycle"):
+            en_curso = sum(p.active for p in platforms.unique())
+            lanzados, proximo = dispatch(pool, en_curso)
+            print(f"🔍 Posts vencidos reclamados: {lanzados} ({en_curso} subidas en curso)")
+
+        # Hasta que termine una subida (hay hueco), se libere un turno o pase el minuto
+        espera = min(60, proximo) if proximo else 60
+        print(f"💤 Esperando hasta {espera:.0f} segundos...")
+        _WAKE.wait(espera)
+    pool.shutdown(wait=True)
+    print("👋 Poster detenido.")
 
 if __name__ == "__main__":
     main()
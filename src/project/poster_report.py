@@ -0,0 +1,170 @@
+"""Informe de retraso y rendimiento del poster.
+
+Recorre por páginas los schedules terminados (``finished_at``, migración
+``005``) sin cargarlos todos en memoria de una vez y calcula, por plataforma,
+por modelo y por hora del día (hora programada, Colombia):
+
+- ``reclamo``: retraso de ``claimed_at`` sobre ``scheduled_time`` (p50/p90/p99).
+  Si crece, faltan posters: los posts esperan turno.
+- ``publicacion``: retraso de ``finished_at`` sobre ``scheduled_time``.
+- ``subida``: duración ``started_at`` → ``finished_at``.
+- Tasa de éxito, publicaciones por hora y ocupación (tiempo subiendo / ventana).
+
+El resumen se guarda en JSON (``--out``) y se muestra como tabla.
+
+Uso:
+    python src/project/poster_report.py [--days 7] [--out .runtime/poster_report.json]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+BASE_DIR = Path(__file__).resolve().parents[2]
+sys.path.append(str(BASE_DIR / "src"))
+
+try:
+    from .poster import scheduled_time_ns
+except ImportError:
+    from poster import scheduled_time_ns
+
+DEFAULT_OUT = BASE_DIR / ".runtime" / "poster_report.json"
+DIMENSIONES = ("plataforma", "modelo", "hora")
+
+_FRACCION = re.compile(r"\.(\d+)")
+
+
+def parse_ts(valor) -> Optional[float]:
+    """timestamptz de Supabase o SQLite (ISO 8601) → epoch en segundos."""
+    if not valor:
+        return None
+    texto = str(valor).replace("Z", "+00:00").replace(" ", "T", 1)
+    # Python < 3.11 solo acepta 3 o 6 decimales; PostgREST recorta ceros
+    texto = _FRACCION.sub(lambda m: "." + m.group(1)[:6].ljust(6, "0"), texto, count=1)
+    try:
+        dt = datetime.fromisoformat(texto)
+    except ValueError:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+def percentiles(valores: List[float]) -> Dict[str, Optional[float]]:
+    if not valores:
+        return {"p50": None, "p90": None, "p99": None}
+    valores = sorted(valores)
+    pick = lambda q: round(valores[min(len(valores) - 1, int(len(valores) * q))], 1)
+    return {"p50": pick(0.50), "p90": pick(0.90), "p99": pick(0.99)}
+
+
+class _Grupo:
+    """Acumulador de un valor de una dimensión (ej: plataforma=kams)."""
+
+    __slots__ = ("total", "publicados", "reclamo", "publicacion", "subida")
+
+    def __init__(self):
+        self.total = 0
+        self.publicados = 0
+        self.reclamo: List[float] = []
+        self.publicacion: List[float] = []
+        self.subida: List[float] = []
+
+    def add(self, row: Dict, programado: Optional[float]) -> None:
+        self.total += 1
+        self.publicados += row.get("estado") == "publicado"
+        claimed, started, finished = (parse_ts(row.get(c)) for c in ("claimed_at", "started_at", "finished_at"))
+        if programado is not None and claimed is not None:
+            self.reclamo.append(max(0.0, claimed - programado))
+        if programado is not None and finished is not None:
+            self.publicacion.append(max(0.0, finished - programado))
+        if started is not None and finished is not None:
+            self.subida.append(max(0.0, finished - started))
+
+    def resumen(self, ventana_h: float) -> Dict:
+        return {
+            "n": self.total,
+            "exito": round(self.publicados / self.total, 3) if self.total else None,
+            "por_hora": round(self.publicados / ventana_h, 2) if ventana_h else None,
+            "ocupacion": round(sum(self.subida) / (ventana_h * 3600), 3) if ventana_h else None,
+            "reclamo_s": percentiles(self.reclamo),
+            "publicacion_s": percentiles(self.publicacion),
+            "subida_s": percentiles(self.subida),
+        }
+
+
+def build_report(rows: Iterable[Dict], since: datetime, until: datetime) -> Dict:
+    """Agrega filas terminadas (en streaming) en el resumen por dimensión."""
+    total = _Grupo()
+    grupos: Dict[str, Dict[str, _Grupo]] = {d: {} for d in DIMENSIONES}
+    for row in rows:
+        ns = scheduled_time_ns(row.get("scheduled_time"))
+        programado = ns / 1e9 if ns else None
+        claves = {
+            "plataforma": (row.get("plataforma") or "?").lower(),
+            "modelo": row.get("modelo") or "?",
+            "hora": (row.get("scheduled_time") or "")[11:13] or "?",
+        }
+        total.add(row, programado)
+        for dimension, clave in claves.items():
+            grupos[dimension].setdefault(clave, _Grupo()).add(row, programado)
+
+    ventana_h = max((until - since).total_seconds() / 3600, 1e-9)
+    return {
+        "desde": since.isoformat(),
+        "hasta": until.isoformat(),
+        "total": total.resumen(ventana_h),
+        **{
+            dimension: {clave: g.resumen(ventana_h) for clave, g in sorted(por_clave.items())}
+            for dimension, por_clave in grupos.items()
+        },
+    }
+
+
+def print_report(report: Dict) -> None:
+    def linea(nombre: str, r: Dict) -> str:
+        exito = f"{r['exito'] * 100:.0f}%" if r["exito"] is not None else "-"
+        fmt = lambda v: "-" if v is None else f"{v:.0f}"
+        return (f"  {nombre:<14}{r['n']:>6}{exito:>7}{r['por_hora']:>8.2f}{r['ocupacion'] * 100:>7.0f}%"
+                f"{fmt(r['reclamo_s']['p50']):>8}{fmt(r['reclamo_s']['p90']):>8}"
+                f"{fmt(r['publicacion_s']['p50']):>8}{fmt(r['publicacion_s']['p90']):>8}"
+                f"{fmt(r['subida_s']['p50']):>8}")
+
+    print(f"📈 Poster {report['desde'][:16]} → {report['hasta'][:16]}")
+    cabecera = (f"  {'':<14}{'n':>6}{'éxito':>7}{'pub/h':>8}{'ocup':>8}"
+                f"{'recl50':>8}{'recl90':>8}{'pub50':>8}{'pub90':>8}{'sub50':>8}")
+    print(cabecera)
+    print(linea("total", report["total"]))
+    for dimension in DIMENSIONES:
+        print(f"\n  por {dimension} (segundos)")
+        for clave, r in report[dimension].items():
+            print(linea(clave, r))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Retraso de publicación y rendimiento del poster.")
+    parser.add_argument("--days", type=float, default=7, help="Ventana hacia atrás (días).")
+    parser.add_argument("--out", default=str(DEFAULT_OUT), help="Archivo JSON del resumen.")
+    args = parser.parse_args()
+
+    from database.supabase_client import iter_finished_schedules
+
+    until = datetime.now(timezone.utc)
+    since = until - timedelta(days=args.days)
+    report = build_report(iter_finished_schedules(since.isoformat()), since, until)
+
+    out = Path(args.out)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+    print_report(report)
+    print(f"\n💾 Resumen en {out}")
+
+
+if __name__ == "__main__":
+    main()
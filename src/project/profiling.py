@@ -0,0 +1,242 @@
+"""Perfilado de las rutas calientes en producción sin tocar código.
+
+Se activa con ``PROFILE`` o en caliente con una señal:
+
+- ``PROFILE=sample`` – muestreador de pila a ``PROFILE_HZ`` (100 por defecto)
+  en un hilo aparte; escribe pilas colapsadas (``.folded``), listas para
+  ``flamegraph.pl`` o speedscope. Bajo costo: no instrumenta cada llamada.
+- ``PROFILE=cprofile`` – ``cProfile`` determinista; escribe ``.pstats``.
+- ``kill -USR2 <pid>`` – enciende/apaga el perfilado del proceso (en modo
+  ``sample`` si ``PROFILE`` no indica otro).
+
+Cada bloque perfilado (``profile("poster_cycle")`` o el decorador
+``@profiled("callback_handler")``) escribe un archivo en ``PROFILE_DIR``
+(``.runtime/profiles``); se guardan los ``PROFILE_KEEP`` más recientes por
+nombre y se omiten los bloques de menos de ``PROFILE_MIN_MS``.
+
+En funciones async el muestreador ve el hilo del event loop mientras el
+handler está activo, así que puede incluir otras tareas del mismo loop.
+
+Uso:
+    python src/project/profiling.py merge callback_handler > callback_handler.folded
+"""
+
+from __future__ import annotations
+
+import argparse
+import cProfile
+import functools
+import inspect
+import itertools
+import os
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+
+BASE_DIR = Path(__file__).resolve().parents[2]
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", str(BASE_DIR / ".runtime" / "profiles")))
+PROFILE_HZ = float(os.getenv("PROFILE_HZ", "100"))
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "200"))
+PROFILE_MIN_MS = float(os.getenv("PROFILE_MIN_MS", "50"))
+MODES = ("sample", "cprofile")
+
+_mode = os.getenv("PROFILE", "").strip().lower()
+_mode = _mode if _mode in MODES else ("sample" if _mode in ("1", "true", "yes") else "")
+_toggle_mode = _mode or "sample"
+
+_lock = threading.Lock()
+_seq = 0
+_local = threading.local()  # cProfile activo en este hilo (no admite anidarse)
+
+
+def enabled() -> bool:
+    return bool(_mode)
+
+
+def toggle(signum=None, frame=None) -> None:
+    """Enciende/apaga el perfilado (manejador de SIGUSR2)."""
+    global _mode
+    _mode = "" if _mode else _toggle_mode
+    print(f"🔬 Perfilado {'activado (' + _mode + ')' if _mode else 'desactivado'} en pid {os.getpid()}")
+
+
+def install_signal_toggle(signum: int = getattr(signal, "SIGUSR2", 0)) -> None:
+    """Registra la señal que enciende/apaga el perfilado (solo desde el hilo principal)."""
+    if signum and threading.current_thread() is threading.main_thread():
+        signal.signal(signum, toggle)
+
+
+# ---- Muestreador ----
+
+class _Sampler:
+    """Un hilo que toma la pila de los hilos con bloques activos a PROFILE_HZ."""
+
+    def __init__(self):
+        self.sessions: Dict[int, tuple] = {}  # id de sesión → (id del hilo, Counter)
+        self.thread: Optional[threading.Thread] = None
+        self._ids = itertools.count()
+
+    def start(self, thread_id: int) -> tuple:
+        counts: Counter = Counter()
+        with _lock:
+            session = next(self._ids)
+            self.sessions[session] = (thread_id, counts)
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, name="profiling-sampler", daemon=True)
+                self.thread.start()
+        return session, counts
+
+    def stop(self, session: int) -> None:
+        with _lock:
+            self.sessions.pop(session, None)
+
+    def _run(self) -> None:
+        interval = 1.0 / max(PROFILE_HZ, 1.0)
+        while True:
+            with _lock:
+                if not self.sessions:
+                    self.thread = None
+                    return
+                sessions = list(self.sessions.values())
+            frames = sys._current_frames()
+            for thread_id, counts in sessions:
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    counts[_collapse(frame)] += 1
+            del frames
+            time.sleep(interval)
+
+
+def _collapse(frame) -> str:
+    """Pila en formato colapsado: raíz;...;hoja con módulo:función."""
+    partes = []
+    while frame is not None:
+        code = frame.f_code
+        partes.append(f"{Path(code.co_filename).stem}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(partes))
+
+
+_sampler = _Sampler()
+
+
+# ---- Bloques perfilados ----
+
+def _output_path(name: str, suffix: str) -> Path:
+    global _seq
+    with _lock:
+        _seq += 1
+        seq = _seq
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    return PROFILE_DIR / f"{name}.{time.strftime('%Y%m%d-%H%M%S')}.{os.getpid()}.{seq}{suffix}"
+
+
+def _rotate(name: str) -> None:
+    """Deja solo los PROFILE_KEEP archivos más recientes de este nombre."""
+    archivos = sorted(PROFILE_DIR.glob(f"{name}.*"), key=lambda p: p.stat().st_mtime, reverse=True)
+    for viejo in archivos[PROFILE_KEEP:]:
+        try:
+            viejo.unlink()
+        except OSError:
+            pass
+
+
+@contextmanager
+def profile(name: str) -> Iterator[None]:
+    """Perfila el bloque si el perfilado está activo; si no, no cuesta casi nada."""
+    mode = _mode
+    if not mode or (mode == "cprofile" and getattr(_local, "cprofile", False)):
+        yield
+        return
+
+    inicio = time.perf_counter()
+    if mode == "sample":
+        session, counts = _sampler.start(threading.get_ident())
+        try:
+            yield
+        finally:
+            _sampler.stop(session)
+            if (time.perf_counter() - inicio) * 1000 >= PROFILE_MIN_MS and counts:
+                _write_folded(name, counts)
+        return
+
+    profiler = cProfile.Profile()
+    _local.cprofile = True
+    try:
+        profiler.enable()
+    except ValueError:  # otro perfilador ya activo en este hilo
+        _local.cprofile = False
+        yield
+        return
+    try:
+        yield
+    finally:
+        profiler.disable()
+        _local.cprofile = False
+        if (time.perf_counter() - inicio) * 1000 >= PROFILE_MIN_MS:
+            try:
+                profiler.dump_stats(str(_output_path(name, ".pstats")))
+                _rotate(name)
+            except OSError as e:
+                print(f"⚠️  No se pudo guardar el perfil de {name}: {e}")
+
+
+def _write_folded(name: str, counts: Counter) -> None:
+    try:
+        with _output_path(name, ".folded").open("w", encoding="utf-8") as f:
+            for stack, n in counts.most_common():
+                f.write(f"{stack} {n}\n")
+        _rotate(name)
+    except OSError as e:
+        print(f"⚠️  No se pudo guardar el perfil de {name}: {e}")
+
+
+def profiled(name: Optional[str] = None):
+    """Decorador de ``profile`` para funciones normales y async."""
+    def decorator(func):
+        etiqueta = name or func.__name__
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with profile(etiqueta):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with profile(etiqueta):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def merge(name: str) -> Counter:
+    """Suma los .folded guardados de un nombre (para un flame graph de todo el periodo)."""
+    total: Counter = Counter()
+    for archivo in sorted(PROFILE_DIR.glob(f"{name}.*.folded")):
+        for linea in archivo.read_text(encoding="utf-8").splitlines():
+            stack, _, n = linea.rpartition(" ")
+            if stack and n.isdigit():
+                total[stack] += int(n)
+    return total
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=f"Herramientas para los perfiles de {PROFILE_DIR}.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    merge_parser = sub.add_parser("merge", help="Une los .folded de un nombre en stdout.")
+    merge_parser.add_argument("name", help="poster_cycle, process_post, callback_handler, ...")
+    args = parser.parse_args()
+
+    if args.cmd == "merge":
+        for stack, n in merge(args.name).most_common():
+            print(f"{stack} {n}")
+
+
+if __name__ == "__main__":
+    main()
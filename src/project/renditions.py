@@ -0,0 +1,183 @@
+"""Pre-procesado de videos por plataforma (ffmpeg/ffprobe del PATH).
+
+Después de ``process_video`` se generan, en un pool de procesos local,
+versiones por plataforma junto al original:
+
+    modelos/<modelo>/<video>.mp4          original
+    modelos/<modelo>/<video>.kams.mp4     rendition para kams
+
+Si el original ya cumple los límites de la plataforma solo se re-empaqueta
+(``-c copy`` + faststart); si no, se recodifica con tope de bitrate, altura y
+tamaño. El poster sube la rendition si existe y está al día, o el original.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+RENDITION_WORKERS = int(os.getenv("RENDITION_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+AUDIO_KBPS = 128
+
+# Límites por plataforma. max_video_kbps/max_height/max_bytes = None → sin tope.
+PLATFORM_PROFILES: Dict[str, Dict] = {
+    "kams": {"max_height": 1080, "max_video_kbps": 6000, "max_bytes": 2 * 1024 ** 3},
+    "xxxfollow": {"max_height": 1080, "max_video_kbps": 4000, "max_bytes": 1024 ** 3},
+    "myclub": {"max_height": None, "max_video_kbps": None, "max_bytes": None},
+}
+DEFAULT_PROFILE = {"max_height": None, "max_video_kbps": None, "max_bytes": None}
+
+_POOL: Optional[ProcessPoolExecutor] = None
+
+
+def ffmpeg_available() -> bool:
+    return bool(shutil.which("ffmpeg") and shutil.which("ffprobe"))
+
+
+def rendition_path(video_path, plataforma: str) -> Path:
+    video_path = Path(video_path)
+    return video_path.with_name(f"{video_path.stem}.{plataforma}{video_path.suffix}")
+
+
+def is_rendition(video_path) -> bool:
+    """Las renditions llevan la plataforma en el nombre (<video>.<plataforma>.mp4); clip.v2.mp4 no lo es."""
+    stem = Path(video_path).stem
+    return "." in stem and stem.rsplit(".", 1)[1].lower() in PLATFORM_PROFILES
+
+
+def rendition_for(video_path, plataforma: str) -> Path:
+    """Ruta a subir: la rendition si existe y es más nueva que el original, o el original."""
+    video_path = Path(video_path)
+    candidate = rendition_path(video_path, plataforma)
+    try:
+        if candidate.stat().st_mtime >= video_path.stat().st_mtime:
+            return candidate
+    except FileNotFoundError:
+        pass
+    return video_path
+
+
+def probe(video_path) -> Dict:
+    """Duración, bitrate, altura y códec del video (vía ffprobe)."""
+    result = subprocess.run(
+        ["ffprobe", "-v", "error", "-print_format", "json", "-show_format", "-show_streams", str(video_path)],
+        capture_output=True, text=True, timeout=60, check=True,
+    )
+    info = json.loads(result.stdout)
+    fmt = info.get("format", {})
+    video = next((st for st in info.get("streams", []) if st.get("codec_type") == "video"), {})
+    return {
+        "duration": float(fmt.get("duration") or 0),
+        "bit_rate": int(fmt.get("bit_rate") or 0),
+        "size": int(fmt.get("size") or Path(video_path).stat().st_size),
+        "height": int(video.get("height") or 0),
+        "codec": video.get("codec_name", ""),
+    }
+
+
+def _build_command(src: Path, dst: Path, meta: Dict, profile: Dict) -> List[str]:
+    max_h = profile.get("max_height")
+    max_kbps = profile.get("max_video_kbps")
+    max_bytes = profile.get("max_bytes")
+
+    if max_bytes and meta["duration"]:
+        # Bitrate que cabe en el tope de tamaño (con 5% de margen para el contenedor)
+        fit_kbps = int(max_bytes * 8 * 0.95 / meta["duration"] / 1000) - AUDIO_KBPS
+        max_kbps = min(max_kbps, fit_kbps) if max_kbps else fit_kbps
+
+    within_limits = (
+        meta["codec"] == "h264"
+        and (not max_h or meta["height"] <= max_h)
+        and (not max_kbps or meta["bit_rate"] <= (max_kbps + AUDIO_KBPS) * 1000)
+        and (not max_bytes or meta["size"] <= max_bytes)
+    )
+    if within_limits:
+        # Solo re-empaquetar: moov al principio para que la subida/streaming arranque antes
+        return ["ffmpeg", "-y", "-v", "error", "-i", str(src), "-c", "copy", "-movflags", "+faststart",
+                "-f", "mp4", str(dst)]
+
+    cmd = ["ffmpeg", "-y", "-v", "error", "-i", str(src), "-c:v", "libx264", "-preset", "veryfast"]
+    if max_kbps:
+        max_kbps = max(300, max_kbps)
+        cmd += ["-b:v", f"{max_kbps}k", "-maxrate", f"{max_kbps}k", "-bufsize", f"{2 * max_kbps}k"]
+    else:
+        cmd += ["-crf", "23"]
+    if max_h and meta["height"] > max_h:
+        cmd += ["-vf", f"scale=-2:{max_h}"]
+    # -f explícito: el temporal acaba en .part y ffmpeg no deduce el formato
+    cmd += ["-c:a", "aac", "-b:a", f"{AUDIO_KBPS}k", "-movflags", "+faststart", "-f", "mp4", str(dst)]
+    return cmd
+
+
+def build_rendition(video_path: str, plataforma: str) -> Optional[str]:
+    """
+    Genera (o reutiliza de caché) la rendition de una plataforma.
+
+    Se ejecuta dentro del pool de procesos; escribe a un temporal y renombra.
+
+    Returns:
+        Ruta de la rendition, o None si no se pudo generar
+    """
+    src = Path(video_path)
+    dst = rendition_path(src, plataforma)
+    if rendition_for(src, plataforma) == dst:
+        return str(dst)
+    if not ffmpeg_available():
+        return None
+
+    profile = PLATFORM_PROFILES.get(plataforma, DEFAULT_PROFILE)
+    # <stem>.<plat>.mp4.part: ningún escaneo de *.mp4 lo toma por un original a medias
+    tmp = dst.with_name(dst.name + ".part")
+    try:
+        meta = probe(src)
+        subprocess.run(_build_command(src, tmp, meta, profile), check=True, capture_output=True, timeout=6 * 3600)
+        os.replace(tmp, dst)
+        return str(dst)
+    except Exception as e:
+        print(f"⚠️  No se pudo generar rendition {plataforma} de {src.name}: {e}")
+        if tmp.exists():
+            tmp.unlink()
+        return None
+
+
+def get_pool() -> ProcessPoolExecutor:
+    global _POOL
+    if _POOL is None:
+        _POOL = ProcessPoolExecutor(max_workers=RENDITION_WORKERS)
+    return _POOL
+
+
+def prepare_renditions_many(videos: Dict[str, List[str]]) -> Dict[str, Dict[str, Optional[str]]]:
+    """
+    Genera en paralelo (pool de procesos) las renditions de varios videos a la vez.
+
+    Args:
+        videos: Dict {ruta del video: plataformas}
+
+    Returns:
+        Dict {ruta del video: {plataforma: ruta de la rendition o None}}
+    """
+    if not ffmpeg_available():
+        print("⚠️  ffmpeg/ffprobe no están en el PATH; se subirá el original")
+        return {v: {p: None for p in plataformas} for v, plataformas in videos.items()}
+    pool = get_pool()
+    futures = {
+        v: {p: pool.submit(build_rendition, v, p) for p in dict.fromkeys(plataformas)}
+        for v, plataformas in videos.items()
+    }
+    return {v: {p: f.result() for p, f in fs.items()} for v, fs in futures.items()}
+
+
+def prepare_renditions(video_path: str, plataformas: List[str]) -> Dict[str, Optional[str]]:
+    """
+    Genera en paralelo (pool de procesos) las renditions de un video.
+
+    Returns:
+        Dict {plataforma: ruta de la rendition o None}
+    """
+    return prepare_renditions_many({video_path: plataformas})[video_path]
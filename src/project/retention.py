@@ -0,0 +1,344 @@
+"""Retención y limpieza de disco de los videos ya publicados.
+
+Por cada video de ``modelos/<modelo>/`` se mira si alguna fila de schedules
+lo sigue usando (``pendiente`` o ``procesando``) o si está en un trabajo
+activo del bot. Un video sin filas activas todavía puede volver a programarse
+si se reenvía (hasta ``MAX_SAME_VIDEO`` apariciones), así que solo se
+desaloja por antigüedad o por falta de disco, y primero los que ya llegaron al
+tope.
+
+Pasos de cada ejecución:
+
+1. Renditions (``<video>.<plataforma>.mp4``) de videos sin filas activas: se
+   borran; el bot las regenera si el video se vuelve a programar.
+2. Originales sin filas activas cuya última actividad supera
+   ``RETENTION_DAYS``: ``RETENTION_ACTION=delete`` borra el video, su sidecar y
+   su entrada del índice; ``compress`` lo recodifica a calidad de archivo
+   (``RETENTION_CRF``, máx. 720p) y conserva el sidecar.
+3. Si el disco sigue por encima de ``DISK_HIGH_WATER``, se desalojan más
+   originales sin filas activas (los de tope primero, luego los más antiguos)
+   hasta bajar de ``DISK_LOW_WATER``.
+4. Blobs del almacén sin enlaces y temporales (``.part``/``.tmp``) abandonados.
+
+Nada que tenga menos de ``RETENTION_GRACE_HOURS`` se toca: puede estar a mitad
+de descarga o de procesamiento, antes de tener filas. Si no se pueden leer los
+schedules de un modelo, sus videos no se tocan en esa pasada (un error de
+lectura nunca cuenta como "sin filas").
+
+Uso:
+    python src/project/retention.py --dry-run
+    python src/project/retention.py [--modelo sofia] [--action compress] [--loop 3600]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+try:
+    from . import job_queue, media_store
+    from .renditions import ffmpeg_available, is_rendition
+    from .scheduler import MAX_SAME_VIDEO, parse_dt_local
+    from .poster_report import parse_ts
+except ImportError:
+    import job_queue, media_store
+    from renditions import ffmpeg_available, is_rendition
+    from scheduler import MAX_SAME_VIDEO, parse_dt_local
+    from poster_report import parse_ts
+
+BASE_DIR = Path(__file__).resolve().parents[2]
+sys.path.append(str(BASE_DIR / "src"))
+
+MODELS_DIR = media_store.MODELS_DIR
+RETENTION_DAYS = float(os.getenv("RETENTION_DAYS", "14"))
+RETENTION_ACTION = os.getenv("RETENTION_ACTION", "delete").strip().lower()
+RETENTION_CRF = int(os.getenv("RETENTION_CRF", "30"))
+RETENTION_GRACE_HOURS = float(os.getenv("RETENTION_GRACE_HOURS", "24"))
+DISK_HIGH_WATER = float(os.getenv("DISK_HIGH_WATER", "0.85"))
+DISK_LOW_WATER = float(os.getenv("DISK_LOW_WATER", "0.75"))
+ACTIVE_STATES = ("pendiente", "procesando")
+
+
+class Candidate:
+    """Un video original de un modelo y su estado de uso."""
+
+    __slots__ = ("modelo", "path", "activos", "apariciones", "ultima", "archivado", "sin_renditions")
+
+    def __init__(self, modelo: str, path: Path):
+        self.modelo = modelo
+        self.path = path
+        self.activos = 0          # filas pendiente/procesando
+        self.apariciones = 0      # filas totales (para MAX_SAME_VIDEO)
+        self.ultima = 0.0         # última actividad (epoch): scheduled_time/finished_at o mtime
+        self.archivado = False
+        self.sin_renditions = False  # ya contadas/borradas en esta pasada
+
+    @property
+    def en_tope(self) -> bool:
+        return self.apariciones >= MAX_SAME_VIDEO
+
+    def sidecar(self) -> Path:
+        return self.path.with_suffix(".json")
+
+    def renditions(self) -> List[Path]:
+        return [p for p in self.path.parent.glob(f"{self.path.stem}.*{self.path.suffix}") if is_rendition(p)]
+
+
+def _row_time(row: Dict) -> float:
+    """Última actividad de una fila: finished_at o, si no hay, scheduled_time."""
+    finished = parse_ts(row.get("finished_at"))
+    if finished is not None:
+        return finished
+    st = (row.get("scheduled_time") or "").strip()
+    if len(st) >= 19:
+        try:
+            return parse_dt_local(st).timestamp()
+        except ValueError:
+            pass
+    return 0.0
+
+
+def _job_videos() -> Set[str]:
+    """Rutas de videos en trabajos del bot que aún no terminan."""
+    rutas = set()
+    for estado in ACTIVE_STATES:
+        for job in job_queue.list_jobs(estado, limit=100000):
+            payload = job["payload"]
+            for item in payload.get("videos") or [payload]:
+                if item.get("video_ruta"):
+                    rutas.add(str(Path(item["video_ruta"]).resolve()))
+    return rutas
+
+
+def scan_model(modelo: str) -> List[Candidate]:
+    """
+    Videos originales de un modelo con sus filas de schedules.
+
+    Propaga el error si no se pueden leer los schedules.
+    """
+    from database.supabase_client import get_all_schedules
+
+    carpeta = MODELS_DIR / modelo
+    candidatos = {
+        p.name: Candidate(modelo, p)
+        for p in carpeta.glob("*.mp4")
+        if not is_rendition(p)
+    }
+    if not candidatos:
+        return []
+    for row in get_all_schedules(modelo, raise_errors=True):
+        c = candidatos.get(row.get("video"))
+        if c is None:
+            continue
+        c.apariciones += 1
+        c.activos += row.get("estado") in ACTIVE_STATES
+        c.ultima = max(c.ultima, _row_time(row))
+    for c in candidatos.values():
+        try:
+            c.ultima = max(c.ultima, c.path.stat().st_mtime)
+            c.archivado = bool(json.loads(c.sidecar().read_text(encoding="utf-8")).get("archivado"))
+        except (OSError, json.JSONDecodeError):
+            pass
+    return list(candidatos.values())
+
+
+def _freed_if_deleted(path: Path, modelo: str) -> int:
+    """Bytes que se liberan al borrar este enlace (0 si otro modelo comparte el blob)."""
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return 0
+    digest = media_store.video_hash(modelo, path.name)
+    en_almacen = digest is not None and media_store.blob_path(digest).exists()
+    # Con almacén: el blob y este enlace (nlink == 2) se van juntos
+    return st.st_size if st.st_nlink <= (2 if en_almacen else 1) else 0
+
+
+def _unlink(path: Path, dry_run: bool) -> int:
+    try:
+        size = path.stat().st_size if path.stat().st_nlink == 1 else 0
+    except FileNotFoundError:
+        return 0
+    if not dry_run:
+        path.unlink()
+    return size
+
+
+def drop_renditions(c: Candidate, dry_run: bool) -> int:
+    if c.sin_renditions:
+        return 0
+    c.sin_renditions = True
+    return sum(_unlink(p, dry_run) for p in c.renditions())
+
+
+def delete_video(c: Candidate, dry_run: bool) -> int:
+    """Borra original, renditions y sidecar; libera el blob si nadie más lo usa."""
+    liberado = _freed_if_deleted(c.path, c.modelo) + drop_renditions(c, dry_run)
+    if dry_run:
+        return liberado
+    digest = media_store.video_hash(c.modelo, c.path.name)
+    c.path.unlink(missing_ok=True)
+    c.sidecar().unlink(missing_ok=True)
+    media_store.forget(c.modelo, c.path.name)
+    if digest:
+        media_store.release_blob(digest)
+    return liberado
+
+
+def compress_video(c: Candidate, dry_run: bool) -> int:
+    """Recodifica el original a calidad de archivo y conserva el sidecar."""
+    liberado = drop_renditions(c, dry_run)
+    if c.archivado or dry_run:
+        # En dry-run se estima la mitad: el ahorro real depende del contenido
+        return liberado + (0 if c.archivado else _freed_if_deleted(c.path, c.modelo) // 2)
+    if not ffmpeg_available():
+        print("⚠️  ffmpeg no está en el PATH; no se puede comprimir")
+        return liberado
+    antes = _freed_if_deleted(c.path, c.modelo)
+    tmp = c.path.with_name(c.path.name + ".part")
+    cmd = ["ffmpeg", "-y", "-v", "error", "-i", str(c.path), "-c:v", "libx264", "-preset", "slow",
+           "-crf", str(RETENTION_CRF), "-vf", "scale=-2:'min(720,ih)'",
+           "-c:a", "aac", "-b:a", "96k", "-movflags", "+faststart", "-f", "mp4", str(tmp)]
+    try:
+        subprocess.run(cmd, check=True, capture_output=True, timeout=6 * 3600)
+    except Exception as e:
+        print(f"⚠️  No se pudo comprimir {c.path.name}: {e}")
+        tmp.unlink(missing_ok=True)
+        return liberado
+    digest = media_store.video_hash(c.modelo, c.path.name)
+    nuevo = tmp.stat().st_size
+    os.replace(tmp, c.path)  # rompe el hardlink: el original queda solo en el almacén
+    # El archivo ya no tiene ese hash: un reenvío del original debe volver a ingerirse completo
+    media_store.forget(c.modelo, c.path.name)
+    if digest:
+        media_store.release_blob(digest)
+    try:
+        meta = json.loads(c.sidecar().read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError):
+        meta = {"video_filename": c.path.name}
+    meta["archivado"] = time.strftime("%Y-%m-%d")
+    c.sidecar().write_text(json.dumps(meta, ensure_ascii=False, indent=2), encoding="utf-8")
+    c.archivado = True
+    return liberado + max(0, antes - nuevo)
+
+
+def disk_usage() -> Tuple[int, int]:
+    """(usado, total) del sistema de archivos de modelos/."""
+    uso = shutil.disk_usage(MODELS_DIR)
+    return uso.total - uso.free, uso.total
+
+
+def _sweep_temporales(dry_run: bool, limite: float) -> int:
+    liberado = 0
+    for patron in ("*/*.part", "*/*.tmp.mp4", "*/*.mp4.tmp"):
+        for p in MODELS_DIR.glob(patron):
+            try:
+                if p.stat().st_mtime < limite:
+                    liberado += _unlink(p, dry_run)
+            except FileNotFoundError:
+                pass
+    for blob in media_store.orphan_blobs():
+        liberado += _unlink(blob, dry_run)
+    return liberado
+
+
+def run(modelos: Optional[List[str]] = None, action: str = RETENTION_ACTION, days: float = RETENTION_DAYS,
+        high_water: float = DISK_HIGH_WATER, low_water: float = DISK_LOW_WATER,
+        dry_run: bool = False) -> Dict[str, int]:
+    """
+    Una pasada de retención.
+
+    Returns:
+        Resumen {renditions, desalojados, por_disco, temporales, bytes}
+    """
+    if action not in ("delete", "compress"):
+        raise ValueError(f"RETENTION_ACTION desconocida: {action!r} (usa 'delete' o 'compress')")
+    evict = delete_video if action == "delete" else compress_video
+    verbo = "borraría" if dry_run else "borrado"
+
+    ahora = time.time()
+    gracia = ahora - RETENTION_GRACE_HOURS * 3600
+    vencido = ahora - days * 86400
+    en_trabajos = _job_videos()
+    modelos = modelos or sorted(p.name for p in MODELS_DIR.iterdir() if p.is_dir() and not p.name.startswith("."))
+
+    libres: List[Candidate] = []
+    for modelo in modelos:
+        try:
+            candidatos = scan_model(modelo)
+        except Exception as e:
+            print(f"⚠️  {modelo}: no se pudieron leer sus schedules, se omite en esta pasada ({e})")
+            continue
+        for c in candidatos:
+            if c.activos or c.ultima >= gracia or str(c.path.resolve()) in en_trabajos:
+                continue
+            libres.append(c)
+
+    resumen = {"renditions": 0, "desalojados": 0, "por_disco": 0, "temporales": 0, "bytes": 0}
+
+    # 1. Renditions de lo que ya no tiene nada pendiente
+    for c in libres:
+        liberado = drop_renditions(c, dry_run)
+        if liberado:
+            resumen["renditions"] += 1
+            resumen["bytes"] += liberado
+
+    # 2. Política de antigüedad
+    restantes = []
+    for c in libres:
+        if c.ultima < vencido and not (action == "compress" and c.archivado):
+            liberado = evict(c, dry_run)
+            resumen["desalojados"] += 1
+            resumen["bytes"] += liberado
+            print(f"🗑️  {c.modelo}/{c.path.name}: {action} ({liberado / 1e6:.0f} MB {verbo})")
+            if action == "compress":
+                restantes.append(c)
+        else:
+            restantes.append(c)
+
+    # 3. Nivel de disco: primero los que ya no se pueden reutilizar, luego los más antiguos
+    resumen["temporales"] = _sweep_temporales(dry_run, gracia)
+    resumen["bytes"] += resumen["temporales"]
+    usado, total = disk_usage()
+    usado -= resumen["bytes"] if dry_run else 0
+    if total and usado / total > high_water:
+        print(f"💽 Disco al {usado / total:.0%} (> {high_water:.0%}): desalojando hasta {low_water:.0%}")
+        for c in sorted(restantes, key=lambda c: (not c.en_tope, c.ultima)):
+            if usado / total <= low_water:
+                break
+            liberado = delete_video(c, dry_run)
+            usado -= liberado
+            resumen["por_disco"] += 1
+            resumen["bytes"] += liberado
+            print(f"🗑️  {c.modelo}/{c.path.name}: delete por disco ({liberado / 1e6:.0f} MB {verbo})")
+    return resumen
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Retención de videos publicados en modelos/.")
+    parser.add_argument("--modelo", action="append", help="Solo este modelo (repetible).")
+    parser.add_argument("--action", choices=["delete", "compress"], default=RETENTION_ACTION)
+    parser.add_argument("--days", type=float, default=RETENTION_DAYS, help="Antigüedad para desalojar.")
+    parser.add_argument("--high-water", type=float, default=DISK_HIGH_WATER, help="Uso de disco (0-1) que dispara el desalojo.")
+    parser.add_argument("--low-water", type=float, default=DISK_LOW_WATER, help="Uso de disco (0-1) al que se baja.")
+    parser.add_argument("--dry-run", action="store_true", help="Solo muestra qué se haría.")
+    parser.add_argument("--loop", type=float, default=0, help="Repetir cada N segundos (0 = una vez).")
+    args = parser.parse_args()
+
+    while True:
+        resumen = run(args.modelo, args.action, args.days, args.high_water, args.low_water, args.dry_run)
+        print(f"♻️  Retención{' (dry-run)' if args.dry_run else ''}: {resumen['bytes'] / 1e9:.2f} GB · {resumen}")
+        if not args.loop:
+            break
+        time.sleep(args.loop)
+
+
+if __name__ == "__main__":
+    main()
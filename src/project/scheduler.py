@@ -1,8 +1,12 @@
 import os
+import math
 import random
+import statistics
+import time
 import datetime as dt
+from collections import deque
 from pathlib import Path
-from typing import List, Tuple, Dict
+from typing import List, Tuple, Dict, Optional
 
 from dotenv import load_dotenv
 load_dotenv()
@@ -12,12 +16,34 @@ import sys
 sys.path.append(str(Path(__file__).resolve().parents[1]))
 
 # Importar cliente de Supabase (import absoluto)
-from database.supabase_client import get_model_config, get_all_schedules
+from database.supabase_client import get_model_config, get_all_schedules, iter_finished_schedules
+
+try:
+    from .renditions import rendition_for
+except ImportError:
+    from renditions import rendition_for
+
+BASE_DIR = Path(__file__).resolve().parents[2]
 
 MIN_GAP_MINUTES = int(os.getenv("MIN_GAP_MINUTES", "10"))
 MAX_DAYS_AHEAD = int(os.getenv("MAX_DAYS_AHEAD", "30"))
 MAX_SAME_VIDEO = int(os.getenv("MAX_SAME_VIDEO", "6"))  # tope 6 apariciones
 
+# Separación adaptativa: con subidas medidas (upload_seconds/upload_bytes,
+# migración 006) la separación de cada slot es la duración estimada de su
+# subida × UPLOAD_MARGIN, entre MIN_GAP_FLOOR_MINUTES y MAX_GAP_MINUTES.
+# Sin datos de la plataforma se usa MIN_GAP_MINUTES.
+ADAPTIVE_GAPS = os.getenv("ADAPTIVE_GAPS", "1").lower() not in ("0", "false", "no")
+MIN_GAP_FLOOR_MINUTES = int(os.getenv("MIN_GAP_FLOOR_MINUTES", "3"))
+MAX_GAP_MINUTES = int(os.getenv("MAX_GAP_MINUTES", "90"))
+UPLOAD_MARGIN = float(os.getenv("UPLOAD_MARGIN", "1.3"))
+THROUGHPUT_DAYS = float(os.getenv("THROUGHPUT_DAYS", "14"))
+THROUGHPUT_SAMPLES = int(os.getenv("THROUGHPUT_SAMPLES", "50"))  # últimas N subidas por plataforma
+THROUGHPUT_MIN_SAMPLES = 5
+THROUGHPUT_TTL = float(os.getenv("THROUGHPUT_TTL", "600"))
+
+_throughput = {"at": 0.0, "models": {}}  # plataforma → (segundos fijos, segundos por byte)
+
 def now_tz() -> dt.datetime:
     return dt.datetime.now(dt.timezone(dt.timedelta(hours=-5)))
 
@@ -30,6 +56,76 @@ def parse_dt_local(s: str) -> dt.datetime:
 def fmt_dt_local(x: dt.datetime) -> str:
     return x.strftime("%Y-%m-%d %H:%M:%S")
 
+# ---- Modelo de rendimiento por plataforma ----
+
+def _fit_upload_model(samples: List[Tuple[int, float]]) -> Tuple[float, float]:
+    """
+    Ajuste robusto (Theil-Sen) de segundos = fijo + bytes × pendiente.
+
+    El costo fijo (abrir el navegador, sesión, formulario) domina en archivos
+    pequeños y la pendiente (1 / rendimiento) en los grandes. La mediana de
+    pendientes entre pares ignora subidas atascadas o reintentos.
+    """
+    pendientes = [
+        (s2 - s1) / (b2 - b1)
+        for i, (b1, s1) in enumerate(samples)
+        for b2, s2 in samples[i + 1:]
+        if b2 != b1
+    ]
+    pendiente = max(0.0, statistics.median(pendientes)) if pendientes else 0.0
+    fijo = max(0.0, statistics.median(s - b * pendiente for b, s in samples))
+    return fijo, pendiente
+
+def _load_upload_models() -> Dict[str, Tuple[float, float]]:
+    desde = dt.datetime.now(dt.timezone.utc) - dt.timedelta(days=THROUGHPUT_DAYS)
+    muestras: Dict[str, deque] = {}
+    for row in iter_finished_schedules(desde.isoformat()):
+        segundos, nbytes = row.get("upload_seconds"), row.get("upload_bytes")
+        if row.get("estado") != "publicado" or not segundos or not nbytes:
+            continue
+        plataforma = (row.get("plataforma") or "").lower()
+        # Filas en orden de id: la deque se queda con las más recientes
+        muestras.setdefault(plataforma, deque(maxlen=THROUGHPUT_SAMPLES)).append((int(nbytes), float(segundos)))
+    return {p: _fit_upload_model(list(m)) for p, m in muestras.items() if len(m) >= THROUGHPUT_MIN_SAMPLES}
+
+def upload_models() -> Dict[str, Tuple[float, float]]:
+    """Modelos por plataforma de las últimas subidas, recalculados cada THROUGHPUT_TTL segundos."""
+    if time.monotonic() - _throughput["at"] >= THROUGHPUT_TTL:
+        try:
+            _throughput["models"] = _load_upload_models()
+        except Exception as e:
+            # Sin migración 006 o sin conexión: se conserva el último modelo (o MIN_GAP_MINUTES)
+            print(f"⚠️  No se pudo leer el rendimiento de subidas: {e}")
+        _throughput["at"] = time.monotonic()
+    return _throughput["models"]
+
+def estimate_upload_seconds(plataforma: str, nbytes: Optional[int]) -> Optional[float]:
+    """Duración estimada de la subida, o None si no hay datos suficientes."""
+    modelo = upload_models().get((plataforma or "").lower())
+    if modelo is None or nbytes is None:
+        return None
+    fijo, pendiente = modelo
+    return fijo + nbytes * pendiente
+
+def gap_minutes(plataforma: str, nbytes: Optional[int]) -> int:
+    """Minutos que ocupa un slot: la subida estimada con margen, o MIN_GAP_MINUTES."""
+    segundos = estimate_upload_seconds(plataforma, nbytes) if ADAPTIVE_GAPS else None
+    if segundos is None:
+        return MIN_GAP_MINUTES
+    return max(MIN_GAP_FLOOR_MINUTES, min(MAX_GAP_MINUTES, math.ceil(segundos * UPLOAD_MARGIN / 60)))
+
+def _video_bytes(modelo: str, video_filename: str, plataforma: str) -> Optional[int]:
+    """Bytes que subirá el poster: la rendition de la plataforma si existe, o el original."""
+    try:
+        return rendition_for(BASE_DIR / "modelos" / modelo / video_filename, plataforma).stat().st_size
+    except OSError:
+        return None
+
+def _slot_gap(modelo: Optional[str], video_filename: str, plataforma: str) -> int:
+    if not modelo or not ADAPTIVE_GAPS:
+        return MIN_GAP_MINUTES
+    return gap_minutes(plataforma, _video_bytes(modelo, video_filename, plataforma))
+
 def _get_model_config(modelo: str):
     """
     Obtiene configuración del modelo desde Supabase.
@@ -66,6 +162,10 @@ def _video_total_count(records, video_filename: str) -> int:
             cnt += 1
     return cnt
 
+def video_at_limit(modelo: str, video_filename: str) -> bool:
+    """True si el video ya alcanzó MAX_SAME_VIDEO apariciones (p. ej. un reenvío duplicado)."""
+    return _video_total_count(_get_all_records(modelo), video_filename) >= MAX_SAME_VIDEO
+
 def _distinct_videos_on_date(records, date_str: str) -> int:
     vids = set()
     for r in records:
@@ -87,17 +187,43 @@ def _occupied_on_date(records, date_str: str) -> List[dt.datetime]:
                 pass
     return sorted(occ)
 
+def _busy_on_date(records, date_str: str, modelo: Optional[str]) -> Dict[dt.datetime, int]:
+    """Minutos que ocupa cada slot ya programado ese día (según su plataforma y tamaño)."""
+    busy: Dict[dt.datetime, int] = {}
+    if not modelo or not ADAPTIVE_GAPS:
+        return busy
+    for r in records:
+        st = (r.get("scheduled_time") or "").strip()
+        if len(st) >= 19 and st[:10] == date_str:
+            try:
+                h = parse_dt_local(st)
+            except Exception:
+                continue
+            gap = _slot_gap(modelo, (r.get("video") or "").strip(), (r.get("plataforma") or "").lower())
+            busy[h] = max(busy.get(h, 0), gap)
+    return busy
+
 def _within_window(candidate: dt.datetime, start: dt.datetime, end: dt.datetime) -> bool:
     return start <= candidate <= end
 
-def _valid_gap(candidate: dt.datetime, others: List[dt.datetime], gap_min: int) -> bool:
+def _valid_gap(candidate: dt.datetime, others: List[dt.datetime], gap_min: int,
+               busy: Optional[Dict[dt.datetime, int]] = None) -> bool:
+    """
+    El candidato necesita gap_min libres después; cada slot anterior, los
+    minutos que ocupa su propia subida (busy, o gap_min si no se conoce).
+    """
+    busy = busy or {}
     for h in others:
-        if abs((candidate - h).total_seconds()) < gap_min * 60:
+        needed = busy.get(h, gap_min) if h <= candidate else gap_min
+        if abs((candidate - h).total_seconds()) < needed * 60:
             return False
     return True
 
-def _build_slots_for_day(n: int, start: dt.datetime, hours: int, occupied: List[dt.datetime]) -> List[dt.datetime]:
-    gap = MIN_GAP_MINUTES
+def _build_slots_for_day(n: int, start: dt.datetime, hours: int, occupied: List[dt.datetime],
+                         gap: Optional[int] = None,
+                         busy: Optional[Dict[dt.datetime, int]] = None) -> List[dt.datetime]:
+    gap = gap or MIN_GAP_MINUTES
+    _valid = lambda c: _valid_gap(c, occupied + proposals, gap, busy)
     end = start + dt.timedelta(hours=hours)
 
     proposals: List[dt.datetime] = []
@@ -106,21 +232,21 @@ def _build_slots_for_day(n: int, start: dt.datetime, hours: int, occupied: List[
     if n >= 1:
         jitter = dt.timedelta(minutes=random.randint(0, 5))
         c = (start + jitter).replace(second=0, microsecond=0)
-        if _within_window(c, start, end) and _valid_gap(c, occupied + proposals, gap) and c >= now_local:
+        if _within_window(c, start, end) and _valid(c) and c >= now_local:
             proposals.append(c)
 
     # 2) segundo slot cerca de fin
     if n >= 2:
         jitter = dt.timedelta(minutes=random.randint(0, 5))
         c = (end - jitter).replace(second=0, microsecond=0)
-        if _within_window(c, start, end) and _valid_gap(c, occupied + proposals, gap) and c >= now_local:
+        if _within_window(c, start, end) and _valid(c) and c >= now_local:
             proposals.append(c)
 
     # 3) midpoint entre 1 y 2
     if n >= 3 and len(proposals) >= 2:
         a, b = sorted(proposals)[0], sorted(proposals)[-1]
         c = (a + (b - a) / 2).replace(second=0, microsecond=0)
-        if _within_window(c, start, end) and _valid_gap(c, occupied + proposals, gap) and c >= now_local:
+        if _within_window(c, start, end) and _valid(c) and c >= now_local:
             proposals.append(c)
 
     # 4) midpoints válidos entre ocupados + propuestos (≥ 2×gap)
@@ -132,7 +258,7 @@ def _build_slots_for_day(n: int, start: dt.datetime, hours: int, occupied: List[
             a, b = timeline[i], timeline[i + 1]
             if (b - a) >= dt.timedelta(minutes=2 * gap):
                 c = (a + (b - a) / 2).replace(second=0, microsecond=0)
-                if _within_window(c, start, end) and _valid_gap(c, occupied + proposals, gap) and c >= now_local:
+                if _within_window(c, start, end) and _valid(c) and c >= now_local:
                     proposals.append(c)
                     made += 1
                     if len(proposals) >= n:
@@ -146,7 +272,7 @@ def _build_slots_for_day(n: int, start: dt.datetime, hours: int, occupied: List[
     t = start
     while len(proposals) < n:
         t = t.replace(second=0, microsecond=0)
-        if _within_window(t, start, end) and _valid_gap(t, occupied + proposals, gap) and t >= now_local:
+        if _within_window(t, start, end) and _valid(t) and t >= now_local:
             proposals.append(t)
         t += dt.timedelta(minutes=gap)
         if t > end:
@@ -154,23 +280,22 @@ def _build_slots_for_day(n: int, start: dt.datetime, hours: int, occupied: List[
 
     return sorted(proposals)[:n]
 
-def plan(modelo: str, video_filename: str) -> List[Tuple[str, str]]:
-    """
-    Devuelve lista [(plataforma, "YYYY-MM-DD HH:MM:SS")] siguiendo las reglas.
-    Ahora usa Supabase en lugar de Google Sheets.
+def _plan_on_records(plataformas: List[str], hora_inicio_str: str, ventana_horas: int,
+                     records: List[Dict], video_filename: str,
+                     modelo: Optional[str] = None) -> List[Tuple[str, str]]:
     """
-    # Obtener configuración del modelo desde Supabase
-    plataformas, hora_inicio_str, ventana_horas = _get_model_config(modelo)
-    if not plataformas:
-        raise ValueError("sin_plataformas")
-
-    # Obtener registros existentes desde Supabase
-    records = _get_all_records(modelo)
+    Núcleo de plan(): asigna horarios usando registros ya cargados en memoria.
 
+    Con `modelo` la separación sale del modelo de rendimiento por plataforma
+    (archivos pesados más separados, livianos más juntos); sin él, MIN_GAP_MINUTES.
+    """
     # Tope del mismo video
     if _video_total_count(records, video_filename) >= MAX_SAME_VIDEO:
         raise ValueError("tope_video")
 
+    # El orden plataforma → slot se decide al final: se reserva la subida más larga
+    gap = max(_slot_gap(modelo, video_filename, p) for p in plataformas)
+
     # Hora inicio base
     H, M = [int(x) for x in hora_inicio_str.split(":")]
     tz = dt.timezone(dt.timedelta(hours=-5))
@@ -197,10 +322,77 @@ def plan(modelo: str, video_filename: str) -> List[Tuple[str, str]]:
             # si ya pasó inicio, simplemente ocupamos considerando now en validación (hecho en _build_slots_for_day)
 
         occupied = _occupied_on_date(records, date_str)
-        times = _build_slots_for_day(len(plataformas), start, ventana_horas, occupied)
+        busy = _busy_on_date(records, date_str, modelo)
+        times = _build_slots_for_day(len(plataformas), start, ventana_horas, occupied, gap, busy)
 
         if len(times) == len(plataformas):
             # Éxito: mapea en orden
             return [(plataformas[i], fmt_dt_local(times[i])) for i in range(len(plataformas))]
 
     raise ValueError("sin_espacio")
+
+def plan(modelo: str, video_filename: str) -> List[Tuple[str, str]]:
+    """
+    Devuelve lista [(plataforma, "YYYY-MM-DD HH:MM:SS")] siguiendo las reglas.
+    Ahora usa Supabase en lugar de Google Sheets.
+    """
+    # Obtener configuración del modelo desde Supabase
+    plataformas, hora_inicio_str, ventana_horas = _get_model_config(modelo)
+    if not plataformas:
+        raise ValueError("sin_plataformas")
+
+    # Obtener registros existentes desde Supabase
+    records = _get_all_records(modelo)
+
+    return _plan_on_records(plataformas, hora_inicio_str, ventana_horas, records, video_filename, modelo)
+
+def schedule_rows(video_filename: str, caption: str, tags: List[str],
+                  slots: List[Tuple[str, str]], trace_id: Optional[str] = None) -> List[Dict]:
+    """Filas listas para upsert_schedules: una por (plataforma, scheduled_time)."""
+    rows = [
+        {
+            "video": video_filename,
+            "caption": caption,
+            "tags": ",".join(tags),
+            "plataforma": plataforma,
+            "estado": "pendiente",
+            "scheduled_time": scheduled_time,
+        }
+        for plataforma, scheduled_time in slots
+    ]
+    if trace_id:
+        # Correlación con tracing.py (requiere migrations/004_schedules_trace_id.sql)
+        for row in rows:
+            row["trace_id"] = trace_id
+    return rows
+
+def plan_many(modelo: str, video_filenames: List[str]) -> Dict[str, object]:
+    """
+    Planifica varios videos en una sola pasada (una lectura de config y registros).
+
+    Cada video planificado se agrega a los registros en memoria, de modo que los
+    siguientes respetan sus horarios, la capacidad diaria y el tope por video.
+
+    Returns:
+        Dict {video: [(plataforma, "YYYY-MM-DD HH:MM:SS")]} o {video: ValueError}
+        cuando ese video no se pudo planificar (tope_video, sin_espacio).
+    """
+    plataformas, hora_inicio_str, ventana_horas = _get_model_config(modelo)
+    if not plataformas:
+        raise ValueError("sin_plataformas")
+
+    records = list(_get_all_records(modelo))
+    result: Dict[str, object] = {}
+
+    for video_filename in video_filenames:
+        try:
+            slots = _plan_on_records(plataformas, hora_inicio_str, ventana_horas, records, video_filename, modelo)
+        except ValueError as e:
+            result[video_filename] = e
+            continue
+        result[video_filename] = slots
+        for plataforma, scheduled_time in slots:
+            records.append({"video": video_filename, "plataforma": plataforma,
+                            "scheduled_time": scheduled_time, "estado": "pendiente"})
+
+    return result
@@ -0,0 +1,216 @@
+"""Validación anticipada de las sesiones de los workers de subida.
+
+Cada ``SESSION_CHECK_INTERVAL`` segundos el poster revisa, para sus modelos,
+las parejas modelo/plataforma con posts pendientes en las próximas
+``SESSION_CHECK_HOURS`` horas y ejecuta ``workers/check_session.js``:
+
+- sesión válida: se vuelve a guardar ``modelos/<modelo>/.auth/user.json`` con
+  las cookies y tokens renovados, así la subida arranca con la sesión fresca;
+- sesión vencida: la pareja queda marcada, el poster no reclama sus posts
+  (siguen ``pendiente`` en vez de quemarse como ``fallido``) y se avisa a
+  ``ADMIN_ID`` por el bot. Al repetir el login el siguiente chequeo la libera;
+- fallo de red o timeout: no es concluyente, no cambia nada.
+
+Además se precargan en la caché del sistema los videos que salen antes del
+próximo chequeo (``posix_fadvise``), para que la subida no espere al disco.
+
+Uso:
+    python src/project/session_check.py [--model yic] [--hours 3]
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+BASE_DIR = Path(__file__).resolve().parents[2]
+sys.path.append(str(BASE_DIR / "src"))
+from database.supabase_client import get_all_models, get_pending_schedules
+
+try:
+    from . import platforms
+    from .renditions import rendition_for
+    from .scheduler import fmt_dt_local, now_tz
+except ImportError:
+    import platforms
+    from renditions import rendition_for
+    from scheduler import fmt_dt_local, now_tz
+
+SESSION_CHECK = os.getenv("SESSION_CHECK", "1").lower() not in ("0", "false", "no")
+SESSION_CHECK_HOURS = float(os.getenv("SESSION_CHECK_HOURS", "3"))
+SESSION_CHECK_INTERVAL = float(os.getenv("SESSION_CHECK_INTERVAL", "900"))
+SESSION_CHECK_TIMEOUT = float(os.getenv("SESSION_CHECK_TIMEOUT", "120"))
+CHECK_SCRIPT = BASE_DIR / "workers" / "check_session.js"
+
+# Plataforma de schedules (nombre o alias) → plataforma del chequeo (PLATFORMS en check_session.js)
+CHECK_PLATFORMS = {nombre: p.name for nombre, p in platforms.with_capability("session_check").items()}
+
+TOKEN = os.getenv("TELEGRAM_TOKEN")
+ADMIN_ID = os.getenv("ADMIN_ID")
+TELEGRAM_BASE_URL = os.getenv("TELEGRAM_BASE_URL", "") or "https://api.telegram.org/bot"
+
+_lock = threading.Lock()
+# (modelo, plataforma del chequeo) → {"ok": bool, "checked_at": epoch, "detalle": str}
+_sessions: Dict[Tuple[str, str], Dict] = {}
+
+
+def due_posts(modelos: Iterable[str], horas: float = SESSION_CHECK_HOURS) -> List[Dict]:
+    """Posts pendientes con plataforma verificable programados hasta ahora + horas."""
+    hasta = fmt_dt_local(now_tz() + dt.timedelta(hours=horas))
+    posts = []
+    for modelo in modelos:
+        for row in get_pending_schedules(modelo):
+            st = (row.get("scheduled_time") or "").strip()
+            plataforma = (row.get("plataforma") or "").lower()
+            # Los ya vencidos también: siguen 'pendiente' si su sesión está marcada
+            if st and st <= hasta and plataforma in CHECK_PLATFORMS:
+                posts.append({**row, "modelo": row.get("modelo") or modelo})
+    return posts
+
+
+def check_session(modelo: str, plataforma: str) -> Tuple[Optional[bool], str]:
+    """
+    Ejecuta check_session.js para una pareja.
+
+    Returns:
+        (True, "") válida, (False, motivo) vencida o (None, detalle) si no es concluyente
+    """
+    if not platforms.auth_file(modelo).exists():
+        return False, "sin credenciales guardadas"
+    env = {**os.environ, "MODEL_NAME": modelo, "PLATFORM": plataforma}
+    try:
+        result = subprocess.run(["npx", "playwright", "test", str(CHECK_SCRIPT)], env=env,
+                                capture_output=True, text=True, cwd=str(BASE_DIR),
+                                timeout=SESSION_CHECK_TIMEOUT)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        return None, str(e)
+    for linea in result.stdout.splitlines():
+        linea = linea.strip()
+        if linea.startswith("SESSION_STALE"):
+            return False, linea[len("SESSION_STALE"):].strip() or "sesión vencida"
+        if linea == "SESSION_OK" and result.returncode == 0:
+            return True, ""
+    return None, (result.stderr or result.stdout)[-300:].strip() or f"returncode {result.returncode}"
+
+
+def is_stale(modelo: str, plataforma: str) -> bool:
+    """True si el último chequeo concluyente de la pareja encontró la sesión vencida."""
+    clave = (modelo, CHECK_PLATFORMS.get((plataforma or "").lower(), ""))
+    with _lock:
+        estado = _sessions.get(clave)
+    return estado is not None and not estado["ok"]
+
+
+def stale_pairs() -> Set[Tuple[str, str]]:
+    with _lock:
+        return {clave for clave, estado in _sessions.items() if not estado["ok"]}
+
+
+def alert_admin(texto: str) -> None:
+    """Mensaje a ADMIN_ID por la Bot API (el bot central puede estar en otro proceso)."""
+    if not TOKEN or not ADMIN_ID:
+        print(f"⚠️  Sin TELEGRAM_TOKEN/ADMIN_ID para avisar: {texto}")
+        return
+    data = json.dumps({"chat_id": ADMIN_ID, "text": texto}).encode("utf-8")
+    request = urllib.request.Request(f"{TELEGRAM_BASE_URL}{TOKEN}/sendMessage", data=data,
+                                     headers={"Content-Type": "application/json"}, method="POST")
+    try:
+        urllib.request.urlopen(request, timeout=10).close()
+    except Exception as e:
+        print(f"⚠️  No se pudo avisar al admin: {e}")
+
+
+def _warm_file(path: Path) -> None:
+    """Pide al sistema que cargue el archivo en la caché de páginas (no bloquea)."""
+    if not hasattr(os, "posix_fadvise"):
+        return
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def run_checks(modelos: Iterable[str], horas: float = SESSION_CHECK_HOURS) -> Dict[Tuple[str, str], Dict]:
+    """Verifica las parejas con posts próximos; avisa solo cuando una sesión pasa a vencida."""
+    posts = due_posts(modelos, horas)
+    parejas: Dict[Tuple[str, str], int] = {}
+    limite_warm = fmt_dt_local(now_tz() + dt.timedelta(seconds=SESSION_CHECK_INTERVAL))
+    for post in posts:
+        clave = (post["modelo"], CHECK_PLATFORMS[post["plataforma"].lower()])
+        parejas[clave] = parejas.get(clave, 0) + 1
+        if post["scheduled_time"] <= limite_warm:
+            video = BASE_DIR / "modelos" / post["modelo"] / post["video"]
+            _warm_file(rendition_for(video, post["plataforma"].lower()))
+
+    resultados = {}
+    for (modelo, plataforma), n in sorted(parejas.items()):
+        ok, detalle = check_session(modelo, plataforma)
+        if ok is None:
+            print(f"⚠️  Sesión {modelo}/{plataforma}: chequeo no concluyente ({detalle})")
+            continue
+        with _lock:
+            anterior = _sessions.get((modelo, plataforma))
+            _sessions[(modelo, plataforma)] = {"ok": ok, "checked_at": time.time(), "detalle": detalle}
+        resultados[(modelo, plataforma)] = _sessions[(modelo, plataforma)]
+        if ok:
+            print(f"🔐 Sesión {modelo}/{plataforma} válida ({n} posts próximos)")
+            if anterior is not None and not anterior["ok"]:
+                alert_admin(f"✅ Sesión de {modelo} en {plataforma} renovada; se reanudan sus posts.")
+        else:
+            print(f"❌ Sesión {modelo}/{plataforma} vencida: {detalle}")
+            if anterior is None or anterior["ok"]:
+                alert_admin(
+                    f"🔐 La sesión de {modelo} en {plataforma} está vencida ({detalle}). "
+                    f"{n} posts en las próximas {horas:g} h quedan en espera.\n"
+                    f"Repite el login: MODEL_NAME={modelo} npx playwright test workers/login_{plataforma}.js --headed"
+                )
+    return resultados
+
+
+def start_background(get_modelos, stop: threading.Event) -> Optional[threading.Thread]:
+    """Hilo del poster que repite run_checks cada SESSION_CHECK_INTERVAL hasta `stop`."""
+    if not SESSION_CHECK:
+        return None
+
+    def loop():
+        while not stop.is_set():
+            try:
+                run_checks(get_modelos())
+            except Exception as e:
+                print(f"⚠️  Error en el chequeo de sesiones: {e}")
+            stop.wait(SESSION_CHECK_INTERVAL)
+
+    thread = threading.Thread(target=loop, name="session-check", daemon=True)
+    thread.start()
+    return thread
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Verifica y refresca las sesiones de los workers.")
+    parser.add_argument("--model", action="append", help="Modelo a verificar (repetible); por defecto todos.")
+    parser.add_argument("--hours", type=float, default=SESSION_CHECK_HOURS, help="Horizonte de posts (horas).")
+    args = parser.parse_args()
+
+    resultados = run_checks(args.model or get_all_models(), args.hours)
+    if not resultados:
+        print("ℹ️  Ninguna sesión verificada (sin posts próximos o chequeos no concluyentes)")
+    sys.exit(1 if any(not r["ok"] for r in resultados.values()) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""Sustituto local de la API de Telegram para probar el modo webhook.
+
+Dos subcomandos:
+
+- ``serve``: servidor HTTP que imita los métodos de la Bot API que usa el bot
+  (getMe, setWebhook, sendMessage, editMessageText, ...) y muestra cada llamada.
+  Se arranca el bot con ``TELEGRAM_BASE_URL=http://127.0.0.1:8081/bot``.
+- ``send``: envía updates falsos al webhook del bot (``/start``, un botón o un
+  video) con la cabecera del secreto, como lo haría Telegram.
+
+Uso:
+    python src/project/telegram_standin.py serve --port 8081
+    BOT_MODE=webhook WEBHOOK_URL=http://127.0.0.1:8443/telegram \\
+        TELEGRAM_BASE_URL=http://127.0.0.1:8081/bot python src/project/bot_central.py
+    python src/project/telegram_standin.py send start --user 1001
+    python src/project/telegram_standin.py send callback --user 1001 --data qv_done
+"""
+
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import os
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+_IDS = itertools.count(1)
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "StandIn", "username": "standin_bot"}
+
+
+def _message(chat_id: int, text: str = "", message_id: int = None) -> dict:
+    return {
+        "message_id": message_id or next(_IDS),
+        "date": int(time.time()),
+        "chat": {"id": chat_id, "type": "private"},
+        "from": BOT_USER,
+        "text": text,
+    }
+
+
+class _BotApiHandler(BaseHTTPRequestHandler):
+    """Responde a /bot<token>/<método> con un resultado plausible."""
+
+    def _params(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        ctype = self.headers.get("Content-Type", "")
+        if "application/json" in ctype:
+            return json.loads(body or b"{}")
+        if "application/x-www-form-urlencoded" in ctype:
+            return {k: v[-1] for k, v in parse_qs(body.decode()).items()}
+        # multipart/form-data u otros: solo lo necesario para registrar la llamada
+        return {"_raw_bytes": len(body)}
+
+    def do_POST(self):
+        method = urlparse(self.path).path.rsplit("/", 1)[-1]
+        params = self._params()
+        print(f"📨 {method} {json.dumps(params, ensure_ascii=False)[:300]}")
+
+        chat_id = int(params.get("chat_id") or 0)
+        if method == "getMe":
+            result = BOT_USER
+        elif method in ("sendMessage", "editMessageText"):
+            result = _message(chat_id, params.get("text", ""), int(params.get("message_id") or 0) or None)
+        elif method == "getFile":
+            file_id = params.get("file_id", "")
+            result = {"file_id": file_id, "file_unique_id": file_id, "file_size": 0,
+                      "file_path": f"videos/{file_id}.mp4"}
+        else:
+            # setWebhook, deleteWebhook, answerCallbackQuery, setMyCommands, ...
+            result = True
+
+        data = json.dumps({"ok": True, "result": result}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    do_GET = do_POST
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(host: str, port: int) -> None:
+    server = ThreadingHTTPServer((host, port), _BotApiHandler)
+    print(f"🧪 Bot API simulada en http://{host}:{port}/bot  (Ctrl+C para salir)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+def build_update(kind: str, user_id: int, data: str = "", file_id: str = "") -> dict:
+    """Construye un update de Telegram mínimo del tipo pedido."""
+    user = {"id": user_id, "is_bot": False, "first_name": f"user{user_id}"}
+    update = {"update_id": int(time.time() * 1000) % 2_000_000_000}
+    if kind == "start":
+        message = _message(user_id, "/start")
+        message["from"] = user
+        message["entities"] = [{"type": "bot_command", "offset": 0, "length": 6}]
+        update["message"] = message
+    elif kind == "callback":
+        message = _message(user_id, "menú")
+        update["callback_query"] = {
+            "id": str(next(_IDS)), "from": user, "chat_instance": str(user_id),
+            "message": message, "data": data,
+        }
+    elif kind == "video":
+        message = _message(user_id)
+        message["from"] = user
+        message.pop("text")
+        file_id = file_id or f"standin{next(_IDS)}"
+        message["video"] = {
+            "file_id": file_id, "file_unique_id": file_id, "width": 1280, "height": 720,
+            "duration": 10, "file_name": f"{file_id}.mp4", "mime_type": "video/mp4", "file_size": 0,
+        }
+        update["message"] = message
+    else:
+        raise ValueError(f"Tipo de update desconocido: {kind}")
+    return update
+
+
+def send(url: str, secret: str, update: dict) -> None:
+    request = urllib.request.Request(url, data=json.dumps(update).encode(), method="POST")
+    request.add_header("Content-Type", "application/json")
+    if secret:
+        request.add_header("X-Telegram-Bot-Api-Secret-Token", secret)
+    with urllib.request.urlopen(request, timeout=10) as response:
+        print(f"✅ {response.status} update {update['update_id']} enviado")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Sustituto local de Telegram para probar el webhook.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    serve_parser = sub.add_parser("serve", help="Simula la Bot API.")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8081)
+
+    send_parser = sub.add_parser("send", help="Envía un update falso al webhook del bot.")
+    send_parser.add_argument("kind", choices=["start", "callback", "video"])
+    send_parser.add_argument("--user", type=int, default=1001)
+    send_parser.add_argument("--data", default="", help="callback_data del botón")
+    send_parser.add_argument("--file-id", default="", help="file_id del video")
+    send_parser.add_argument(
+        "--url", default=os.getenv("STANDIN_WEBHOOK", "http://127.0.0.1:8443/telegram"),
+        help="URL del webhook del bot",
+    )
+    send_parser.add_argument("--secret", default=os.getenv("WEBHOOK_SECRET", ""))
+    args = parser.parse_args()
+
+    if args.cmd == "serve":
+        serve(args.host, args.port)
+    elif args.cmd == "send":
+        send(args.url, args.secret, build_update(args.kind, args.user, args.data, args.file_id))
+
+
+if __name__ == "__main__":
+    main()
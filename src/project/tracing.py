@@ -0,0 +1,297 @@
+"""Trazas de extremo a extremo: de la subida en Telegram a la publicación.
+
+Cada vídeo recibe un ``trace_id`` en ``video_handler`` que viaja en el
+sidecar ``.json``, en el payload del trabajo, en las filas de ``schedules`` y
+en el entorno del worker de Playwright (``TRACE_ID``). Cada etapa emite un
+span con su duración.
+
+Los spans se escriben en ``TRACE_FILE`` (por defecto ``.runtime/traces.jsonl``)
+en el formato OTLP/JSON del exportador de archivos de OpenTelemetry (una
+``ExportTraceServiceRequest`` por línea), así que el archivo se puede cargar
+en un collector. Con ``TRACE_OTLP_ENDPOINT`` (ej: ``http://127.0.0.1:4318``)
+también se envían a ``/v1/traces`` de un collector OTLP/HTTP.
+
+``record_span`` solo encola el span: un hilo de fondo los agrupa y hace la
+escritura y el POST, así el event loop del bot nunca espera al disco ni al
+collector. Al salir del proceso se vacía la cola (``TRACE_FLUSH_TIMEOUT``).
+
+Uso:
+    python src/project/tracing.py show <trace_id>
+    python src/project/tracing.py stats [--hours 24]
+"""
+
+from __future__ import annotations
+
+import argparse
+import atexit
+import json
+import os
+import queue
+import secrets
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+BASE_DIR = Path(__file__).resolve().parents[2]
+TRACE_FILE = Path(os.getenv("TRACE_FILE", str(BASE_DIR / ".runtime" / "traces.jsonl")))
+TRACE_OTLP_ENDPOINT = os.getenv("TRACE_OTLP_ENDPOINT", "").rstrip("/")
+TRACING_ENABLED = os.getenv("TRACING", "1").lower() not in ("0", "false", "no")
+SERVICE_NAME = os.getenv("TRACE_SERVICE", "trafico")
+TRACE_QUEUE_MAX = int(os.getenv("TRACE_QUEUE_MAX", "10000"))
+TRACE_BATCH = 512
+TRACE_FLUSH_TIMEOUT = float(os.getenv("TRACE_FLUSH_TIMEOUT", "5"))
+
+_queue: "queue.Queue[Optional[Dict]]" = queue.Queue(maxsize=TRACE_QUEUE_MAX)
+_exporter_lock = threading.Lock()
+_exporter: Optional[threading.Thread] = None
+_exporter_pid: Optional[int] = None
+_dropped = 0
+
+
+def new_trace_id() -> str:
+    return secrets.token_hex(16)
+
+
+def new_span_id() -> str:
+    return secrets.token_hex(8)
+
+
+def _attributes(attrs: Dict) -> List[Dict]:
+    out = []
+    for key, value in attrs.items():
+        if value is None:
+            continue
+        if isinstance(value, bool):
+            out.append({"key": key, "value": {"boolValue": value}})
+        elif isinstance(value, int):
+            out.append({"key": key, "value": {"intValue": str(value)}})
+        elif isinstance(value, float):
+            out.append({"key": key, "value": {"doubleValue": value}})
+        else:
+            out.append({"key": key, "value": {"stringValue": str(value)}})
+    return out
+
+
+def record_span(name: str, trace_id: Optional[str], start_ns: int, end_ns: Optional[int] = None,
+                parent_id: Optional[str] = None, error: Optional[str] = None,
+                span_id: Optional[str] = None, **attrs) -> Optional[str]:
+    """
+    Emite un span ya medido (útil cuando inicio y fin ocurren en sitios distintos).
+
+    Returns:
+        span_id del span emitido, o None si no hay trace_id o el trazado está apagado
+    """
+    if not trace_id or not TRACING_ENABLED:
+        return None
+    span_id = span_id or new_span_id()
+    span = {
+        "traceId": trace_id,
+        "spanId": span_id,
+        "name": name,
+        "kind": 1,  # SPAN_KIND_INTERNAL
+        "startTimeUnixNano": str(start_ns),
+        "endTimeUnixNano": str(end_ns or time.time_ns()),
+        "attributes": _attributes(attrs),
+        "status": {"code": 2, "message": error} if error else {"code": 1},
+    }
+    if parent_id:
+        span["parentSpanId"] = parent_id
+    _export([span])
+    return span_id
+
+
+@contextmanager
+def span(name: str, trace_id: Optional[str], parent_id: Optional[str] = None, **attrs) -> Iterator[Dict]:
+    """
+    Mide el bloque como un span. El dict que se entrega permite agregar
+    atributos (``attrs``) o marcar un error (``error``) dentro del bloque, y
+    trae el ``span_id`` para colgar hijos.
+    """
+    info = {"span_id": new_span_id(), "attrs": dict(attrs), "error": None}
+    start_ns = time.time_ns()
+    try:
+        yield info
+    except BaseException as e:
+        record_span(name, trace_id, start_ns, parent_id=parent_id, error=f"{type(e).__name__}: {e}",
+                    span_id=info["span_id"], **info["attrs"])
+        raise
+    record_span(name, trace_id, start_ns, parent_id=parent_id, error=info["error"],
+                span_id=info["span_id"], **info["attrs"])
+
+
+def _export(spans: List[Dict]) -> None:
+    """Encola los spans para el hilo exportador; nunca bloquea (si la cola está llena, se descartan)."""
+    global _dropped
+    _ensure_exporter()
+    for item in spans:
+        try:
+            _queue.put_nowait(item)
+        except queue.Full:
+            _dropped += 1
+
+
+def _ensure_exporter() -> None:
+    """Arranca el hilo exportador (otra vez en un hijo de fork: el hilo no se hereda)."""
+    global _exporter, _exporter_pid, _queue
+    if _exporter_pid == os.getpid() and _exporter is not None and _exporter.is_alive():
+        return
+    with _exporter_lock:
+        if _exporter_pid == os.getpid() and _exporter is not None and _exporter.is_alive():
+            return
+        if _exporter_pid is not None and _exporter_pid != os.getpid():
+            # Cola heredada del padre: sus spans ya los exporta el padre
+            _queue = queue.Queue(maxsize=TRACE_QUEUE_MAX)
+        _exporter_pid = os.getpid()
+        _exporter = threading.Thread(target=_export_loop, name="trace-export", daemon=True)
+        _exporter.start()
+
+
+def _export_loop() -> None:
+    """Toma lotes de hasta TRACE_BATCH spans y los escribe/envía juntos; None termina."""
+    while True:
+        lote = [_queue.get()]
+        while lote[-1] is not None and len(lote) < TRACE_BATCH:
+            try:
+                lote.append(_queue.get_nowait())
+            except queue.Empty:
+                break
+        fin = lote[-1] is None
+        spans = [item for item in lote if item is not None]
+        if spans:
+            _write_batch(spans)
+        for _ in lote:
+            _queue.task_done()
+        if fin:
+            return
+
+
+def _write_batch(spans: List[Dict]) -> None:
+    global _dropped
+    request = {
+        "resourceSpans": [{
+            "resource": {"attributes": _attributes({"service.name": SERVICE_NAME, "process.pid": os.getpid()})},
+            "scopeSpans": [{"scope": {"name": "trafico.tracing"}, "spans": spans}],
+        }]
+    }
+    line = json.dumps(request, ensure_ascii=False, separators=(",", ":"))
+    try:
+        TRACE_FILE.parent.mkdir(parents=True, exist_ok=True)
+        with TRACE_FILE.open("a", encoding="utf-8") as f:
+            f.write(line + "\n")
+    except OSError as e:
+        print(f"⚠️  No se pudo escribir la traza: {e}")
+    if TRACE_OTLP_ENDPOINT:
+        try:
+            http = urllib.request.Request(
+                f"{TRACE_OTLP_ENDPOINT}/v1/traces", data=line.encode("utf-8"),
+                headers={"Content-Type": "application/json"}, method="POST",
+            )
+            urllib.request.urlopen(http, timeout=2).close()
+        except Exception as e:
+            print(f"⚠️  Collector OTLP no disponible: {e}")
+    if _dropped:
+        print(f"⚠️  {_dropped} spans descartados (cola de trazas llena)")
+        _dropped = 0
+
+
+def flush(timeout: float = TRACE_FLUSH_TIMEOUT) -> None:
+    """Espera (hasta `timeout`) a que el hilo exporte los spans encolados y lo detiene."""
+    if _exporter is None or _exporter_pid != os.getpid() or not _exporter.is_alive():
+        return
+    try:
+        _queue.put(None, timeout=timeout)
+    except queue.Full:
+        return
+    _exporter.join(timeout)
+
+
+atexit.register(flush)
+
+
+# ---- Lectura del archivo ----
+
+def _value(v: Dict):
+    for key in ("stringValue", "doubleValue", "boolValue"):
+        if key in v:
+            return v[key]
+    return int(v["intValue"]) if "intValue" in v else None
+
+
+def read_spans(since_ns: int = 0) -> List[Dict]:
+    """Spans del archivo, aplanados: {trace_id, span_id, parent_id, name, start, end, ms, attrs, error}."""
+    spans = []
+    if not TRACE_FILE.exists():
+        return spans
+    with TRACE_FILE.open(encoding="utf-8") as f:
+        for line in f:
+            try:
+                request = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            for rs in request.get("resourceSpans", []):
+                for ss in rs.get("scopeSpans", []):
+                    for s in ss.get("spans", []):
+                        start, end = int(s["startTimeUnixNano"]), int(s["endTimeUnixNano"])
+                        if start < since_ns:
+                            continue
+                        spans.append({
+                            "trace_id": s["traceId"], "span_id": s["spanId"], "parent_id": s.get("parentSpanId"),
+                            "name": s["name"], "start": start, "end": end, "ms": (end - start) / 1e6,
+                            "attrs": {a["key"]: _value(a["value"]) for a in s.get("attributes", [])},
+                            "error": s.get("status", {}).get("message") if s.get("status", {}).get("code") == 2 else None,
+                        })
+    return spans
+
+
+def show(trace_id: str) -> None:
+    """Cascada de un trace: cada span con su desfase desde el inicio y su duración."""
+    spans = sorted((s for s in read_spans() if s["trace_id"] == trace_id), key=lambda s: s["start"])
+    if not spans:
+        print(f"❌ No hay spans para {trace_id} en {TRACE_FILE}")
+        return
+    t0 = spans[0]["start"]
+    total = (max(s["end"] for s in spans) - t0) / 1e9
+    print(f"🧵 {trace_id} · {len(spans)} spans · {total:.1f}s de principio a fin")
+    for s in spans:
+        extra = " ".join(f"{k}={v}" for k, v in s["attrs"].items())
+        marca = f" ❌ {s['error']}" if s["error"] else ""
+        print(f"  +{(s['start'] - t0) / 1e9:>9.1f}s  {s['ms'] / 1000:>9.2f}s  {s['name']:<24} {extra}{marca}")
+
+
+def stats(hours: float = 24) -> None:
+    """p50/p95/máx por nombre de span: dónde se va el tiempo."""
+    since = time.time_ns() - int(hours * 3600 * 1e9)
+    por_nombre: Dict[str, List[float]] = {}
+    for s in read_spans(since):
+        por_nombre.setdefault(s["name"], []).append(s["ms"])
+    if not por_nombre:
+        print(f"ℹ️  Sin spans en las últimas {hours:g} h")
+        return
+    print(f"{'span':<26}{'n':>6}{'p50 s':>10}{'p95 s':>10}{'máx s':>10}")
+    for nombre, valores in sorted(por_nombre.items(), key=lambda kv: -sorted(kv[1])[len(kv[1]) // 2]):
+        valores.sort()
+        p50 = valores[len(valores) // 2]
+        p95 = valores[min(len(valores) - 1, int(len(valores) * 0.95))]
+        print(f"{nombre:<26}{len(valores):>6}{p50 / 1000:>10.2f}{p95 / 1000:>10.2f}{valores[-1] / 1000:>10.2f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=f"Consulta las trazas de {TRACE_FILE}.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    show_parser = sub.add_parser("show", help="Cascada de spans de un trace_id.")
+    show_parser.add_argument("trace_id")
+    stats_parser = sub.add_parser("stats", help="Percentiles de duración por span.")
+    stats_parser.add_argument("--hours", type=float, default=24)
+    args = parser.parse_args()
+
+    if args.cmd == "show":
+        show(args.trace_id)
+    elif args.cmd == "stats":
+        stats(args.hours)
+
+
+if __name__ == "__main__":
+    main()
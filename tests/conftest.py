@@ -0,0 +1,47 @@
+"""Configuración común: todo corre sobre DB_BACKEND=sqlite en un directorio temporal.
+
+Las variables se fijan antes de importar los módulos del proyecto, que leen
+el entorno al importarse.
+"""
+
+import os
+import sys
+import tempfile
+import uuid
+from pathlib import Path
+
+import pytest
+
+_TMP = Path(tempfile.mkdtemp(prefix="trafico-tests-"))
+os.environ.update({
+    "DB_BACKEND": "sqlite",
+    "SQLITE_DB": str(_TMP / "trafico.sqlite3"),
+    "JOB_QUEUE_DB": str(_TMP / "jobs.sqlite3"),
+    "TRACING": "0",
+    "TRACE_FILE": str(_TMP / "traces.jsonl"),
+    "SESSION_CHECK": "0",
+})
+
+ROOT = Path(__file__).resolve().parents[1]
+for ruta in (ROOT / "src", ROOT / "src" / "project"):
+    if str(ruta) not in sys.path:
+        sys.path.insert(0, str(ruta))
+
+
+@pytest.fixture
+def db():
+    from database import supabase_client
+    return supabase_client
+
+
+@pytest.fixture
+def modelo(db):
+    """Modelo nuevo por test (las filas de otros tests no interfieren)."""
+    nombre = f"m{uuid.uuid4().hex[:8]}"
+    assert db.create_model_config(nombre, "kams,xxxfollow")
+    return nombre
+
+
+def schedule_row(video, plataforma="kams", estado="pendiente", scheduled_time="2020-01-01 10:00:00"):
+    return {"video": video, "caption": "c", "tags": "", "plataforma": plataforma,
+            "estado": estado, "scheduled_time": scheduled_time}
@@ -0,0 +1,37 @@
+"""API asíncrona de base de datos (database/async_client.py)."""
+
+import asyncio
+
+import pytest
+
+from database import async_client
+from conftest import schedule_row
+
+
+def test_contrapartes_de_todo_el_backend(db):
+    for nombre in db.BACKEND_API:
+        assert callable(getattr(async_client, "a" + nombre)), nombre
+
+
+def test_consultas_solapadas(db, modelo):
+    db.upsert_schedules(modelo, [schedule_row("a.mp4"), schedule_row("b.mp4", plataforma="xxxfollow")])
+
+    async def leer():
+        return await asyncio.gather(
+            async_client.aget_model_config(modelo),
+            async_client.aget_all_schedules(modelo),
+            async_client.aget_pending_schedules(modelo, "kams"),
+        )
+
+    config, todas, kams = asyncio.run(leer())
+    assert config["modelo"] == modelo
+    assert len(todas) == 2 and [r["video"] for r in kams] == ["a.mp4"]
+
+
+def test_run_sync_desde_su_propio_loop_falla(db):
+    async def anidada():
+        return async_client.run_sync(async_client.aget_all_models())
+
+    assert isinstance(async_client.run_sync(async_client.aget_all_models()), list)
+    with pytest.raises(RuntimeError):
+        async_client.run_sync(anidada())
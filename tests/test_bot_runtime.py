@@ -0,0 +1,58 @@
+"""Orden por usuario y concurrencia entre usuarios (bot_runtime.PerUserUpdateProcessor)."""
+
+import asyncio
+
+from bot_runtime import PerUserUpdateProcessor
+
+
+class _Processor(PerUserUpdateProcessor):
+    # En los tests el "update" es directamente el id del usuario
+    @staticmethod
+    def _key(update):
+        return update
+
+
+def test_rafaga_de_un_usuario_no_acapara_los_huecos():
+    async def escenario():
+        processor = _Processor(max_concurrent_updates=2)
+        soltar = asyncio.Event()
+        orden = []
+
+        async def lento(n):
+            await soltar.wait()
+            orden.append(("a", n))
+
+        async def rapido():
+            orden.append(("b", 0))
+
+        rafaga = [asyncio.create_task(processor.process_update(1, lento(n))) for n in range(10)]
+        await asyncio.sleep(0)
+        # Los 9 encolados ya devolvieron su hueco: el otro usuario entra sin esperar
+        await asyncio.wait_for(processor.process_update(2, rapido()), timeout=1)
+        assert orden == [("b", 0)]
+        assert processor.current_concurrent_updates == 1
+
+        soltar.set()
+        await asyncio.gather(*rafaga)
+        return orden
+
+    orden = asyncio.run(escenario())
+    assert orden[1:] == [("a", n) for n in range(10)]
+
+
+def test_error_en_un_update_no_frena_los_siguientes():
+    async def escenario():
+        processor = _Processor(max_concurrent_updates=1)
+        hechos = []
+
+        async def falla():
+            raise RuntimeError("boom")
+
+        async def ok(n):
+            hechos.append(n)
+
+        await asyncio.gather(processor.process_update(1, falla()), processor.process_update(1, ok(1)),
+                             processor.process_update(1, ok(2)))
+        return hechos
+
+    assert asyncio.run(escenario()) == [1, 2]
@@ -0,0 +1,78 @@
+"""Reclamo atómico de schedules vencidos (claim_due_schedules)."""
+
+import threading
+
+from conftest import schedule_row
+
+AHORA = "2030-01-01 00:00:00"
+
+
+def test_reclamo_cambia_estado_y_deja_los_futuros(db, modelo):
+    db.upsert_schedules(modelo, [
+        schedule_row("a.mp4"),
+        schedule_row("b.mp4", plataforma="xxxfollow"),
+        schedule_row("c.mp4", scheduled_time="2031-01-01 10:00:00"),
+        schedule_row("d.mp4", estado="publicado"),
+    ])
+
+    reclamados = db.claim_due_schedules(AHORA, 10, modelos=[modelo])
+
+    assert sorted(r["video"] for r in reclamados) == ["a.mp4", "b.mp4"]
+    estados = {r["video"]: r for r in db.get_all_schedules(modelo)}
+    assert estados["a.mp4"]["estado"] == estados["b.mp4"]["estado"] == "procesando"
+    assert estados["a.mp4"]["claimed_at"]
+    assert estados["c.mp4"]["estado"] == "pendiente"
+    assert estados["d.mp4"]["estado"] == "publicado"
+    assert db.claim_due_schedules(AHORA, 10, modelos=[modelo]) == []
+
+
+def test_reclamo_filtra_plataformas(db, modelo):
+    db.upsert_schedules(modelo, [schedule_row("a.mp4"), schedule_row("b.mp4", plataforma="xxxfollow")])
+
+    reclamados = db.claim_due_schedules(AHORA, 10, modelos=[modelo], plataformas=["xxxfollow"])
+
+    assert [r["video"] for r in reclamados] == ["b.mp4"]
+
+
+def test_reclamo_exclusivo_entre_hilos(db, modelo):
+    db.upsert_schedules(modelo, [
+        schedule_row(f"v{i}.mp4", scheduled_time=f"2020-01-01 10:{i:02d}:00") for i in range(40)
+    ])
+    barrera = threading.Barrier(4)
+    resultados = []
+
+    def reclamar():
+        barrera.wait()
+        while True:
+            lote = db.claim_due_schedules(AHORA, 3, modelos=[modelo])
+            if not lote:
+                return
+            resultados.extend(r["id"] for r in lote)
+
+    hilos = [threading.Thread(target=reclamar) for _ in range(4)]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+
+    assert len(resultados) == 40
+    assert len(set(resultados)) == 40
+
+
+def test_lease_vencido_se_reclama_de_nuevo(db, modelo):
+    db.upsert_schedules(modelo, [schedule_row("a.mp4")])
+    [fila] = db.claim_due_schedules(AHORA, 10, modelos=[modelo])
+
+    # Dentro del lease nadie más la toma
+    assert db.claim_due_schedules(AHORA, 10, modelos=[modelo]) == []
+    # Su poster murió: pasado el lease se retoma
+    [retomada] = db.claim_due_schedules(AHORA, 10, modelos=[modelo], lease_seconds=0)
+    assert retomada["id"] == fila["id"]
+    assert retomada["estado"] == "procesando"
+
+
+def test_procesando_sin_claimed_at_no_se_retoma(db, modelo):
+    # Fila reclamada por un poster anterior al lease (sin claimed_at): puede seguir subiéndose
+    db.upsert_schedules(modelo, [schedule_row("a.mp4", estado="procesando")])
+
+    assert db.claim_due_schedules(AHORA, 10, modelos=[modelo], lease_seconds=0) == []
@@ -0,0 +1,31 @@
+"""Circuit breaker de Gemini y elección del motor en modo auto."""
+
+import pytest
+
+import caption
+import gemini_guard
+
+
+@pytest.fixture
+def guard(monkeypatch, tmp_path):
+    monkeypatch.setattr(gemini_guard, "DB_PATH", tmp_path / "gemini_guard.sqlite3")
+    monkeypatch.setattr(caption, "GEMINI_API_KEY", "clave")
+    monkeypatch.setattr(caption, "CAPTION_ENGINE", "")
+    for _ in range(gemini_guard.BREAKER_FAILURES):
+        gemini_guard.record_failure(100, "caído")
+    return gemini_guard
+
+
+def test_auto_usa_local_con_el_circuito_abierto(guard):
+    assert guard.get_stats()["breaker_state"] == "open"
+    assert caption.select_caption_engine({}) == "local"
+
+
+def test_auto_deja_pasar_la_prueba_tras_el_cooldown(guard, monkeypatch):
+    monkeypatch.setattr(guard, "BREAKER_COOLDOWN", 0)
+
+    assert caption.select_caption_engine({}) == "gemini"
+    assert guard.breaker_allows()
+    assert guard.get_stats()["breaker_state"] == "half_open"
+    guard.record_success(100)
+    assert caption.select_caption_engine({}) == "gemini"
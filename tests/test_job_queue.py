@@ -0,0 +1,85 @@
+"""Cola persistente de trabajos del bot (job_queue.py)."""
+
+import uuid
+
+import pytest
+
+import job_queue
+
+
+@pytest.fixture
+def kind():
+    """Tipo de trabajo propio del test (los de otros tests no interfieren)."""
+    return f"test_{uuid.uuid4().hex[:8]}"
+
+
+def test_reclama_en_orden_y_guarda_la_etapa(kind):
+    primero = job_queue.enqueue(kind, {"n": 1})
+    segundo = job_queue.enqueue(kind, {"n": 2})
+
+    job = job_queue.claim_next(kind)
+    assert job["id"] == primero and job["estado"] == "procesando" and job["attempts"] == 1
+
+    job_queue.set_stage(primero, "caption", {"n": 1, "caption": "hola"}, claim=job["claim"])
+    [guardado] = [j for j in job_queue.list_jobs("procesando", limit=1000) if j["id"] == primero]
+    assert guardado["stage"] == "caption"
+    assert guardado["payload"]["caption"] == "hola"
+
+    job_queue.complete(primero, claim=job["claim"])
+    job = job_queue.claim_next(kind)
+    assert job["id"] == segundo
+    job_queue.complete(segundo, claim=job["claim"])
+    assert job_queue.claim_next(kind) is None
+
+
+def test_fallo_reintenta_hasta_max_attempts(kind):
+    job_id = job_queue.enqueue(kind, {})
+    for intento in range(1, job_queue.MAX_ATTEMPTS + 1):
+        job = job_queue.claim_next(kind)
+        assert job["id"] == job_id and job["attempts"] == intento
+        reintenta = job_queue.fail(job_id, "error", claim=job["claim"])
+        assert reintenta == (intento < job_queue.MAX_ATTEMPTS)
+
+    assert job_queue.claim_next(kind) is None
+    [fallido] = [j for j in job_queue.list_jobs("fallido", limit=1000) if j["id"] == job_id]
+    assert fallido["error"] == "error"
+
+
+def test_trabajo_en_curso_no_se_roba(kind):
+    job_id = job_queue.enqueue(kind, {"n": 1})
+    job = job_queue.claim_next(kind, owner="a")
+
+    assert job_queue.claim_next(kind, owner="b") is None
+    assert job_queue.requeue_expired() == 0
+    assert job_queue.heartbeat(job_id, job["claim"])
+    assert job_queue.complete(job_id, claim=job["claim"])
+
+
+def test_lease_vencido_invalida_el_reclamo_anterior(kind, monkeypatch):
+    job_id = job_queue.enqueue(kind, {"n": 1})
+    monkeypatch.setattr(job_queue, "JOB_LEASE_SECONDS", -1)
+    viejo = job_queue.claim_next(kind)
+
+    # Lo retoma otro worker del mismo proceso (mismo WORKER_ID)
+    nuevo = job_queue.claim_next(kind)
+
+    assert nuevo["id"] == job_id and nuevo["attempts"] == 2
+    assert nuevo["claim"] != viejo["claim"]
+    assert not job_queue.heartbeat(job_id, viejo["claim"])
+    assert not job_queue.set_stage(job_id, "metadata", {"n": 2}, claim=viejo["claim"])
+    assert not job_queue.fail(job_id, "error", claim=viejo["claim"])
+    assert not job_queue.complete(job_id, claim=viejo["claim"])
+    assert job_queue.complete(job_id, claim=nuevo["claim"])
+    # Ya terminado: el token tampoco sirve para volver a escribir
+    assert not job_queue.set_stage(job_id, "caption", claim=nuevo["claim"])
+
+
+def test_release_devuelve_los_del_dueño(kind):
+    job_id = job_queue.enqueue(kind, {"n": 1})
+    job_queue.claim_next(kind, owner="a")
+
+    assert job_queue.release(owner="b") == 0
+    assert job_queue.release(owner="a") == 1
+    job = job_queue.claim_next(kind, owner="b")
+    assert job["id"] == job_id
+    job_queue.complete(job_id, claim=job["claim"])
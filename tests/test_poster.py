@@ -0,0 +1,72 @@
+"""Rondas de reclamo del poster (poster.dispatch)."""
+
+import asyncio
+
+import poster
+
+
+class _Plataforma:
+    def __init__(self, name):
+        self.name, self.aliases = name, []
+        self.active, self.concurrency = 0, 2
+
+    def capacity(self):
+        return self.concurrency - self.active
+
+    def next_turn(self):
+        return 0
+
+    def try_start(self):
+        self.active += 1
+        return True
+
+
+class _Pool:
+    def __init__(self):
+        self.lanzados = []
+
+    def submit(self, funcion, platform, post):
+        self.lanzados.append((platform.name, post["id"]))
+
+
+def test_modelos_del_shard_una_vez_por_ronda(monkeypatch):
+    lecturas = []
+    reclamos = {}
+
+    def get_all_models():
+        lecturas.append(1)
+        return ["ana", "bea", "eva"]
+
+    async def claim(now_str, limit, modelos, plataformas, lease_seconds):
+        reclamos[plataformas[0]] = modelos
+        # Ambos reclamos están en vuelo antes de que responda ninguno
+        await asyncio.sleep(0)
+        return [{"id": {"kams": 1, "xxxfollow": 2}[plataformas[0]]}]
+
+    monkeypatch.setattr(poster, "get_all_models", get_all_models)
+    monkeypatch.setattr(poster, "aclaim_due_schedules", claim)
+    monkeypatch.setattr(poster.session_check, "stale_pairs", lambda: {("bea", "kams")})
+    monkeypatch.setattr(poster.platforms, "unique", lambda: [_Plataforma("kams"), _Plataforma("xxxfollow")])
+    pool = _Pool()
+
+    lanzados, _ = poster.dispatch(pool, en_curso=0)
+
+    assert lecturas == [1]
+    assert reclamos == {"kams": ["ana", "eva"], "xxxfollow": ["ana", "bea", "eva"]}
+    assert lanzados == 2 and pool.lanzados == [("kams", 1), ("xxxfollow", 2)]
+
+
+def test_reparte_los_hilos_libres_antes_de_reclamar(monkeypatch):
+    pedidos = {}
+
+    async def claim(now_str, limit, modelos, plataformas, lease_seconds):
+        pedidos[plataformas[0]] = limit
+        return []
+
+    monkeypatch.setattr(poster, "POSTER_WORKERS", 3)
+    monkeypatch.setattr(poster, "aclaim_due_schedules", claim)
+    monkeypatch.setattr(poster.session_check, "stale_pairs", set)
+    monkeypatch.setattr(poster.platforms, "unique", lambda: [_Plataforma("kams"), _Plataforma("xxxfollow")])
+
+    assert poster.dispatch(_Pool(), en_curso=0) == (0, None)
+    assert pedidos == {"kams": 2, "xxxfollow": 1}
@@ -0,0 +1,30 @@
+"""Generación de renditions (renditions.py)."""
+
+import bulk_import
+import renditions
+
+
+def test_temporal_no_parece_un_original(monkeypatch, tmp_path):
+    carpeta = tmp_path / "modelo"
+    carpeta.mkdir()
+    video = carpeta / "video.mp4"
+    video.write_bytes(b"\0" * 1024)
+    vistos = []
+
+    def ffmpeg(cmd, **kwargs):
+        with open(cmd[-1], "wb") as f:
+            f.write(b"\1" * 512)
+        # A mitad de la codificación, el escaneo de la carpeta solo ve el original
+        vistos.extend(p.name for p in bulk_import.discover_videos("modelo")[1])
+
+    monkeypatch.setattr(bulk_import, "MODELS_DIR", tmp_path)
+    monkeypatch.setattr(renditions, "ffmpeg_available", lambda: True)
+    monkeypatch.setattr(renditions, "probe", lambda src: {"codec": "hevc", "height": 1080, "bit_rate": 0,
+                                                          "size": 1024, "duration": 10.0})
+    monkeypatch.setattr(renditions.subprocess, "run", ffmpeg)
+
+    ruta = renditions.build_rendition(str(video), "kams")
+
+    assert vistos == ["video.mp4"]
+    assert ruta == str(renditions.rendition_path(video, "kams"))
+    assert not list(carpeta.glob("*.part"))
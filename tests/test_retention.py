@@ -0,0 +1,109 @@
+"""Decisión de conservar o desalojar videos (retention.py)."""
+
+import os
+import time
+
+import pytest
+
+import job_queue
+import media_store
+import retention
+from conftest import schedule_row
+
+VIEJO = time.time() - 60 * 86400
+
+
+@pytest.fixture
+def carpeta(monkeypatch, tmp_path, modelo):
+    """modelos/ y el almacén en un directorio temporal."""
+    modelos_dir = tmp_path / "modelos"
+    store = modelos_dir / ".store"
+    monkeypatch.setattr(retention, "MODELS_DIR", modelos_dir)
+    monkeypatch.setattr(media_store, "MODELS_DIR", modelos_dir)
+    monkeypatch.setattr(media_store, "STORE_DIR", store)
+    monkeypatch.setattr(media_store, "INDEX_PATH", store / "index.sqlite3")
+    carpeta = modelos_dir / modelo
+    carpeta.mkdir(parents=True)
+    return carpeta
+
+
+def _video(carpeta, nombre, mtime=VIEJO):
+    path = carpeta / nombre
+    path.write_bytes(b"\0" * 1024)
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def _run(modelo):
+    # high_water=1.0: solo la política de antigüedad, nunca la de disco
+    return retention.run([modelo], action="delete", days=14, high_water=1.0, low_water=1.0)
+
+
+def test_conserva_activos_recientes_y_en_trabajos(db, modelo, carpeta):
+    pendiente = _video(carpeta, "pendiente.mp4")
+    procesando = _video(carpeta, "procesando.mp4")
+    reciente = _video(carpeta, "reciente.mp4", mtime=time.time())
+    en_trabajo = _video(carpeta, "trabajo.mp4")
+    publicado = _video(carpeta, "publicado.mp4")
+    rendition = _video(carpeta, "publicado.kams.mp4")
+    db.upsert_schedules(modelo, [
+        schedule_row("pendiente.mp4"),
+        schedule_row("procesando.mp4", estado="procesando"),
+        schedule_row("reciente.mp4", estado="publicado"),
+        schedule_row("trabajo.mp4", estado="publicado"),
+        schedule_row("publicado.mp4", estado="publicado"),
+    ])
+    job_id = job_queue.enqueue("process_video", {"videos": [{"video_ruta": str(en_trabajo)}]})
+
+    try:
+        resumen = _run(modelo)
+    finally:
+        job = job_queue.claim_next("process_video")
+        job_queue.complete(job_id, claim=job["claim"])
+
+    assert pendiente.exists() and procesando.exists() and reciente.exists() and en_trabajo.exists()
+    assert not publicado.exists() and not rendition.exists()
+    assert resumen["desalojados"] == 1
+
+
+def test_sin_filas_y_viejo_se_desaloja(db, modelo, carpeta):
+    huerfano = _video(carpeta, "huerfano.mp4")
+    sidecar = carpeta / "huerfano.json"
+    sidecar.write_text("{}", encoding="utf-8")
+
+    _run(modelo)
+
+    assert not huerfano.exists() and not sidecar.exists()
+
+
+def test_error_leyendo_schedules_no_borra(db, modelo, carpeta, monkeypatch):
+    video = _video(carpeta, "pendiente.mp4")
+    db.upsert_schedules(modelo, [schedule_row("pendiente.mp4")])
+
+    def falla(*args, **kwargs):
+        raise RuntimeError("sin conexión")
+
+    monkeypatch.setattr(db, "get_all_schedules", falla)
+    resumen = _run(modelo)
+
+    assert video.exists()
+    assert resumen["desalojados"] == 0
+
+
+def test_comprimir_saca_el_original_del_indice(db, modelo, carpeta, monkeypatch):
+    origen = carpeta.parent / "recibido.mp4"
+    origen.write_bytes(b"\1" * 4096)
+    digest, _ = media_store.hash_file(origen)
+    ruta, _ = media_store.ingest_local(modelo, str(origen), str(carpeta / "video.mp4"), move=True)
+
+    def ffmpeg(cmd, **kwargs):
+        with open(cmd[-1], "wb") as f:
+            f.write(b"\2" * 1024)
+
+    monkeypatch.setattr(retention, "ffmpeg_available", lambda: True)
+    monkeypatch.setattr(retention.subprocess, "run", ffmpeg)
+    retention.compress_video(retention.Candidate(modelo, carpeta / "video.mp4"), dry_run=False)
+
+    assert os.path.getsize(ruta) == 1024
+    assert media_store.find_video(modelo, digest) is None
+    assert not media_store.blob_path(digest).exists()
@@ -0,0 +1,83 @@
+"""Planificación e idempotencia al escribir los horarios."""
+
+import asyncio
+from datetime import datetime, timezone
+
+import bot_central
+import scheduler
+from conftest import schedule_row
+from scheduler import plan_many, schedule_rows
+
+
+def test_plan_many_replay_no_duplica(db, modelo):
+    planificados = plan_many(modelo, ["a.mp4", "b.mp4"])
+    rows = []
+    for video, slots in planificados.items():
+        assert not isinstance(slots, Exception)
+        rows += schedule_rows(video, "caption", ["t1", "t2"], slots)
+
+    assert db.upsert_schedules(modelo, rows)
+    assert db.upsert_schedules(modelo, rows)  # reintento con los mismos slots
+
+    guardadas = db.get_all_schedules(modelo)
+    assert len(guardadas) == len(rows)
+    claves = {(r["video"], r["plataforma"], r["scheduled_time"]) for r in guardadas}
+    assert claves == {(r["video"], r["plataforma"], r["scheduled_time"]) for r in rows}
+
+
+def test_plan_many_respeta_lo_ya_programado(db, modelo):
+    primero = plan_many(modelo, ["a.mp4"])["a.mp4"]
+    db.upsert_schedules(modelo, schedule_rows("a.mp4", "c", [], primero))
+
+    segundo = plan_many(modelo, ["b.mp4"])["b.mp4"]
+    assert not set(t for _, t in primero) & set(t for _, t in segundo)
+
+
+def test_etapas_plan_y_schedule_reintento(db, modelo, tmp_path):
+    payload = {"modelo": modelo, "videos": [
+        {"video_ruta": str(tmp_path / f"{v}.mp4"), "caption": "c", "tags": ["x"]} for v in ("a", "b")
+    ]}
+    asyncio.run(bot_central._stage_plan(payload))
+    slots = {item["video_ruta"]: item["slots"] for item in payload["videos"]}
+    assert all(slots.values())
+
+    # Cae después de escribir y se reintenta desde el payload guardado
+    asyncio.run(bot_central._stage_schedule(payload))
+    asyncio.run(bot_central._stage_schedule(payload))
+
+    guardadas = db.get_all_schedules(modelo)
+    assert len(guardadas) == sum(len(s) for s in slots.values())
+    assert {item["video_ruta"]: item["slots"] for item in payload["videos"]} == slots
+
+
+def test_ajuste_de_subidas_ignora_atascos():
+    muestras = [(n * 10_000_000, 30 + n * 10_000_000 * 2e-6) for n in range(1, 8)]
+    muestras.append((40_000_000, 3000.0))  # subida atascada
+
+    fijo, pendiente = scheduler._fit_upload_model(muestras)
+
+    assert abs(fijo - 30) < 1
+    assert abs(pendiente - 2e-6) < 1e-8
+
+
+def test_separacion_adaptativa_por_plataforma(db, modelo, monkeypatch):
+    plataforma = f"lenta_{modelo}"
+    db.upsert_schedules(modelo, [
+        {**schedule_row(f"v{n}.mp4", plataforma=plataforma), "estado": "procesando"} for n in range(1, 7)
+    ])
+    terminado = datetime.now(timezone.utc).isoformat()
+    for fila in db.get_all_schedules(modelo):
+        n = int(fila["video"][1])
+        # 60 s fijos + 1 s por MB
+        db.set_schedule_estado(fila["id"], "publicado", {
+            "finished_at": terminado, "upload_bytes": n * 1_000_000, "upload_seconds": 60 + n,
+        })
+    monkeypatch.setattr(scheduler, "_throughput", {"at": 0.0, "models": {}})
+    monkeypatch.setattr(scheduler, "ADAPTIVE_GAPS", True)
+
+    # 60 s + 600 s por 600 MB, × UPLOAD_MARGIN
+    esperado = -(-(660 * scheduler.UPLOAD_MARGIN) // 60)
+    assert scheduler.gap_minutes(plataforma, 600_000_000) == esperado
+    assert scheduler.gap_minutes(plataforma, 10**12) == scheduler.MAX_GAP_MINUTES
+    assert scheduler.gap_minutes(plataforma, 0) == scheduler.MIN_GAP_FLOOR_MINUTES
+    assert scheduler.gap_minutes("sin_datos", 600_000_000) == scheduler.MIN_GAP_MINUTES
@@ -0,0 +1,28 @@
+"""Errores de sqlite3 con el mismo contrato que el backend de Supabase."""
+
+import sqlite3
+
+import pytest
+
+from database import sqlite_backend
+
+
+class _Rota:
+    def execute(self, *args, **kwargs):
+        raise sqlite3.OperationalError("database is locked")
+
+
+@pytest.fixture
+def rota(monkeypatch):
+    monkeypatch.setattr(sqlite_backend, "_connect", lambda: _Rota())
+
+
+def test_get_all_schedules_respeta_raise_errors(rota):
+    assert sqlite_backend.get_all_schedules("m") == []
+    with pytest.raises(sqlite3.Error):
+        sqlite_backend.get_all_schedules("m", raise_errors=True)
+
+
+def test_escrituras_devuelven_false(rota):
+    assert sqlite_backend.update_schedule_time("m", "a.mp4", "kams", "2020-01-01 10:00:00") is False
+    assert sqlite_backend.set_schedule_estado(1, "publicado", {"finished_at": "2020-01-01"}) is False
@@ -0,0 +1,71 @@
+const { test } = require('@playwright/test');
+const path = require('path');
+const fs = require('fs');
+
+// ==========================================
+// Verificación de sesión (src/project/session_check.py)
+// ==========================================
+// Abre la página de subida con la sesión guardada, confirma que sigue
+// iniciada y vuelve a guardar el storageState (cookies y tokens renovados).
+// Salida para el poster:
+//   SESSION_OK              sesión válida (storageState refrescado)
+//   SESSION_STALE <motivo>  hay que repetir el login (login_kams.js)
+// Cualquier otro fallo (red, timeout) no es concluyente.
+const MODEL_NAME = process.env.MODEL_NAME;
+const PLATFORM = (process.env.PLATFORM || 'kams').toLowerCase();
+
+if (!MODEL_NAME) {
+  throw new Error('❌ ERROR: Debes especificar el modelo. Ejemplo: MODEL_NAME=yic PLATFORM=kams npx playwright test ...');
+}
+
+// Página con la sesión y prueba de login por plataforma
+const PLATFORMS = {
+  kams: { url: 'https://kams.com/upload', loginPath: '/login', tokenKey: /token|auth/i },
+};
+
+const authFile = path.join(__dirname, `../modelos/${MODEL_NAME}/.auth/user.json`);
+
+test(`Sesión de ${PLATFORM} para ${MODEL_NAME}`, async ({ browser }) => {
+  const platform = PLATFORMS[PLATFORM];
+  if (!platform) {
+    throw new Error(`❌ Plataforma sin verificación de sesión: ${PLATFORM}`);
+  }
+  if (!fs.existsSync(authFile)) {
+    console.log('SESSION_STALE sin credenciales guardadas');
+    return;
+  }
+
+  const context = await browser.newContext({ storageState: authFile });
+  const page = await context.newPage();
+  await page.goto(platform.url);
+  await page.waitForLoadState('networkidle');
+
+  if (new URL(page.url()).pathname.startsWith(platform.loginPath)) {
+    console.log(`SESSION_STALE redirigido a ${page.url()}`);
+    await context.close();
+    return;
+  }
+
+  const hasToken = await page.evaluate((pattern) => {
+    const re = new RegExp(pattern, 'i');
+    for (let i = 0; i < localStorage.length; i++) {
+      const key = localStorage.key(i);
+      if (re.test(key) && localStorage.getItem(key)) return true;
+    }
+    return false;
+  }, platform.tokenKey.source);
+
+  if (!hasToken) {
+    console.log('SESSION_STALE sin token en localStorage');
+    await context.close();
+    return;
+  }
+
+  // Guardar en un temporal y renombrar: un worker que arranca nunca lee un archivo a medias
+  const tmpFile = `${authFile}.${process.pid}.tmp`;
+  await context.storageState({ path: tmpFile });
+  fs.renameSync(tmpFile, authFile);
+  console.log('SESSION_OK');
+
+  await context.close();
+});
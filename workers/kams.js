@@ -19,6 +19,9 @@ console.log(`🔐 Usando archivo de autenticación para ${MODEL_NAME}: ${authFil
 const VIDEO_PATH = process.env.VIDEO_PATH;
 const VIDEO_TITLE = process.env.VIDEO_TITLE || 'Default Title';
 const VIDEO_TAGS = process.env.VIDEO_TAGS || 'tag1,tag2';
+// Correlación con las trazas del poster (src/project/tracing.py)
+const TRACE_ID = process.env.TRACE_ID || '';
+if (TRACE_ID) console.log(`🧵 trace_id=${TRACE_ID}`);
 
 test.describe('Automatización API Kams', () => {
 
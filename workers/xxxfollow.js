@@ -1,12 +1,28 @@
 const { chromium } = require('playwright');
 const path = require('path');
 const fs = require('fs');
-const userDataDir = path.join(__dirname, 'browser-profile');
+
+// ==========================================
+// CONFIGURACIÓN (mismo contrato que kams.js, lo lanza src/project/platforms.py)
+// ==========================================
+const MODEL_NAME = process.env.MODEL_NAME;
+const VIDEO_PATH = process.env.VIDEO_PATH;
+const VIDEO_TITLE = process.env.VIDEO_TITLE || '';
+const VIDEO_TAGS = (process.env.VIDEO_TAGS || '').split(',').map(t => t.trim()).filter(Boolean);
+const HEADLESS = ['1', 'true', 'yes'].includes((process.env.HEADLESS || '').toLowerCase());
+// Correlación con las trazas del poster (src/project/tracing.py)
+const TRACE_ID = process.env.TRACE_ID || '';
+if (TRACE_ID) console.log(`🧵 trace_id=${TRACE_ID}`);
+
+// Perfil persistente por modelo: Trafico/modelos/{modelo}/.auth/xxxfollow-profile
+const userDataDir = MODEL_NAME
+  ? path.join(__dirname, `../modelos/${MODEL_NAME}/.auth/xxxfollow-profile`)
+  : path.join(__dirname, 'browser-profile');
 
 async function automateXxxFollow() {
   const browser = await chromium.launchPersistentContext(userDataDir, {
-    headless: false,
-    slowMo: 500,
+    headless: HEADLESS,
+    slowMo: HEADLESS ? 0 : 500,
     viewport: { width: 1920, height: 1080 }
   });
   const pages = browser.pages();
@@ -14,7 +30,7 @@ async function automateXxxFollow() {
   try {
     console.log('🚀 Iniciando automatización de xxxfollow.com...\n');
     // Preparar el video
-    const videoPath = path.join(__dirname, 'test2.mp4');
+    const videoPath = VIDEO_PATH || path.join(__dirname, 'test2.mp4');
     if (!fs.existsSync(videoPath)) {
       throw new Error(`Video no encontrado: ${videoPath}`);
     }
@@ -93,25 +109,25 @@ async function automateXxxFollow() {
     // Paso 5: Cargar el video en el fileChooser (equivalente a seleccionar el archivo)
     console.log('\n📍 Paso 5: Seleccionando video en el explorador...');
     await fileChooser.setFiles(videoPath);
-    console.log('✅ Video seleccionado: test_lips.mp4');
+    console.log(`✅ Video seleccionado: ${path.basename(videoPath)}`);
     console.log(' (Esto es equivalente a seleccionar el archivo y dar OK)');
     // Paso 6: Esperar a que el video se procese
     console.log('\n📍 Paso 6: Esperando a que el video se procese...');
     await page.waitForTimeout(8000); // Dar tiempo generoso para que se cargue
     // Verificar que el video se cargó
     console.log('\n🔍 Verificando si el video se cargó...');
-    const verification = await page.evaluate(() => {
+    const verification = await page.evaluate((fileName) => {
       return {
         hasVideo: !!document.querySelector('video'),
         hasVideoSrc: !!document.querySelector('video[src]'),
         hasPreview: !!document.querySelector('[class*="preview" i]'),
         hasThumbnail: !!document.querySelector('[class*="thumbnail" i]'),
         hasProgress: !!document.querySelector('[class*="progress" i]'),
-        hasFileName: document.body.textContent.includes('test_lips') || document.body.textContent.includes('.mp4'),
+        hasFileName: document.body.textContent.includes(fileName) || document.body.textContent.includes('.mp4'),
         videoCount: document.querySelectorAll('video').length,
         allText: document.body.textContent
       };
-    });
+    }, path.basename(videoPath));
     console.log('📊 Resultados:');
     console.log(` - Video tag presente: ${verification.hasVideo ? '✅' : '❌'}`);
     console.log(` - Video con src: ${verification.hasVideoSrc ? '✅' : '❌'}`);
@@ -171,7 +187,7 @@ async function automateXxxFollow() {
         const isVisible = await field.isVisible({ timeout: 2000 }).catch(() => false);
         if (isVisible) {
           await field.clear();
-          await field.fill('Do u like my lips?');
+          await field.fill(VIDEO_TITLE);
           console.log(' ✅ Caption escrito');
           captionFilled = true;
           break;
@@ -195,8 +211,7 @@ async function automateXxxFollow() {
         const field = page.locator(selector).first();
         const isVisible = await field.isVisible({ timeout: 2000 }).catch(() => false);
         if (isVisible) {
-          const tags = ['lips', 'sensual'];
-          for (const tag of tags) {
+          for (const tag of VIDEO_TAGS) {
             await field.type(tag, { delay: 100 });
             await field.press('Enter');
             await page.waitForTimeout(500);
@@ -230,8 +245,7 @@ async function automateXxxFollow() {
       } catch (e) { continue; }
     }
     if (!posted) {
-      console.log('⚠️ No se encontró botón de publicación');
-      console.log(' Revisa manualmente en el navegador');
+      throw new Error('No se encontró botón de publicación');
     }
 
     // Espera a que cambie la URL tras publicar
@@ -244,15 +258,22 @@ async function automateXxxFollow() {
     // console.log('📸 Screenshot final: final-screenshot.png');
   } catch (error) {
     console.error('\n❌ ERROR:', error.message);
+    process.exitCode = 1; // el poster marca el post como 'fallido'
+
     // console.log('\n📸 Tomando screenshot de error...');
     // await page.screenshot({ path: 'error-screenshot.png', fullPage: true });
     // console.log('✅ Screenshot guardado: error-screenshot.png');
     console.log('\n💡 Revisa el screenshot para ver qué pasó');
   } finally {
-    console.log('\n⏳ Manteniendo navegador abierto 15 segundos para revisión...');
-    console.log(' Verifica si el video se publicó correctamente');
-    await page.waitForTimeout(15000);
+    if (!HEADLESS) {
+      console.log('\n⏳ Manteniendo navegador abierto 15 segundos para revisión...');
+      console.log(' Verifica si el video se publicó correctamente');
+      await page.waitForTimeout(15000);
+    }
     await browser.close();
   }
 }
-automateXxxFollow().catch(console.error);
\ No newline at end of file
+automateXxxFollow().catch((error) => {
+  console.error(error);
+  process.exitCode = 1;
+});
\ No newline at end of file